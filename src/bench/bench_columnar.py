@@ -0,0 +1,154 @@
+"""
+bench_columnar.py — Eval summary cost: JSONL + compute_summary() vs. columnar.
+
+Builds a large eval results file by repeating logs/eval_results_v2.jsonl
+--copies times, exports it to Parquet (src.eval.columnar), and computes
+the summary three ways, each in a fresh process:
+
+  - load-all: json.loads every line into a list, then compute_summary()
+  - jsonl-stream: columnar_summary over the JSONL, in NumPy batches
+  - parquet: columnar_summary over the Parquet export (summary columns only)
+
+and reports wall time and peak RSS growth for each, plus the JSONL and
+Parquet sizes. Also exports the query log (repeated the same way) and
+reports its size. Repeated rows compress far better than a real log, so
+the Parquet sizes here are a lower bound. Exits 1 if any summary differs
+from compute_summary(). Needs the optional pyarrow package.
+
+Usage:
+    python -m src.bench.bench_columnar
+    python -m src.bench.bench_columnar --copies 200 --batch-size 10000
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(_PROJECT_ROOT))
+
+from src.eval.columnar import export_parquet
+from src.eval.columnar_summary import summarize
+
+
+def repeat_jsonl(source: Path, target: Path, copies: int) -> int:
+    """Write source's lines copies times to target; return the line count."""
+    with open(source, encoding="utf-8") as f:
+        lines = [line if line.endswith("\n") else line + "\n" for line in f if line.strip()]
+    with open(target, "w", encoding="utf-8") as f:
+        for _ in range(copies):
+            f.writelines(lines)
+    return len(lines) * copies
+
+
+def _dir_bytes(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _peak_rss_mb() -> float:
+    # VmHWM is reset by exec, unlike ru_maxrss, which a spawned child
+    # inherits from the parent
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_method(method: str, path: str, batch_size: int, out):
+    start_rss = _peak_rss_mb()
+    start = time.perf_counter()
+    if method == "load-all":
+        from src.eval.score_completeness import compute_summary
+
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        summary = compute_summary(records)
+    else:
+        summary = summarize(path, batch_size=batch_size)
+    out.put((time.perf_counter() - start, _peak_rss_mb() - start_rss, summary))
+
+
+def run_method(method: str, path: Path, batch_size: int) -> tuple[float, float, dict]:
+    """Run one summary method in a fresh process: (seconds, peak RSS MB, summary)."""
+    ctx = multiprocessing.get_context("spawn")
+    out = ctx.Queue()
+    proc = ctx.Process(target=_run_method, args=(method, str(path), batch_size, out))
+    proc.start()
+    result = out.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark eval summaries over JSONL vs. a Parquet export"
+    )
+    parser.add_argument("--eval-results", default="logs/eval_results_v2.jsonl",
+                        help="Eval results to repeat (default: logs/eval_results_v2.jsonl)")
+    parser.add_argument("--query-log", default="logs/rag_queries.jsonl",
+                        help="Query log to repeat (default: logs/rag_queries.jsonl)")
+    parser.add_argument("--copies", type=int, default=100,
+                        help="Times each input is repeated (default: 100)")
+    parser.add_argument("--batch-size", type=int, default=10_000,
+                        help="Rows per batch for export and columnar summaries "
+                             "(default: 10000)")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="bench_columnar_"))
+    try:
+        eval_path = tmp / "eval_results.jsonl"
+        n_records = repeat_jsonl(Path(args.eval_results), eval_path, args.copies)
+
+        start = time.perf_counter()
+        export = export_parquet(eval_path, tmp / "eval", kind="eval", batch_size=args.batch_size)
+        export_seconds = time.perf_counter() - start
+
+        print(f"\nEval results: {n_records} records, JSONL {eval_path.stat().st_size / 1e6:.1f} MB, "
+              f"Parquet {export['bytes'] / 1e6:.1f} MB in {export['files']} file(s) "
+              f"(export {export_seconds:.2f}s)")
+        print(f"  {'method':<14s} {'seconds':>8s} {'peak RSS MB':>12s} {'matches':>8s}")
+
+        reference = None
+        ok = True
+        for method, path in (
+            ("load-all", eval_path),
+            ("jsonl-stream", eval_path),
+            ("parquet", tmp / "eval"),
+        ):
+            seconds, rss_mb, summary = run_method(method, path, args.batch_size)
+            if reference is None:
+                reference = summary
+            matches = summary == reference
+            ok = ok and matches
+            print(f"  {method:<14s} {seconds:>8.2f} {rss_mb:>12.1f} {'yes' if matches else 'NO':>8s}")
+
+        query_path = tmp / "rag_queries.jsonl"
+        if Path(args.query_log).exists():
+            n_entries = repeat_jsonl(Path(args.query_log), query_path, args.copies)
+            start = time.perf_counter()
+            export = export_parquet(query_path, tmp / "queries", kind="query",
+                                    batch_size=args.batch_size)
+            print(f"\nQuery log: {n_entries} entries, JSONL {query_path.stat().st_size / 1e6:.1f} MB, "
+                  f"Parquet {_dir_bytes(tmp / 'queries') / 1e6:.1f} MB in {export['files']} "
+                  f"file(s) (export {time.perf_counter() - start:.2f}s)")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if not ok:
+        print("\nFAIL: a columnar summary differs from compute_summary()")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
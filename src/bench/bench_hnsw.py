@@ -0,0 +1,229 @@
+"""
+bench_hnsw.py — HNSW recall against exact search, latency and index memory.
+
+Reads every stored embedding from the collection, embeds the queries in
+src/eval/queries.json, and computes the exact cosine top-k for each with
+NumPy brute force (the ground truth). Then, for every (M,
+construction_ef, search_ef) in the grid, builds a fresh HNSW collection
+over the same embeddings in a temporary ChromaDB and runs each query one
+at a time. ChromaDB applies search_ef when it loads an index, so every
+search_ef gets its own build rather than a modify() of a loaded one.
+Reported per setting:
+
+  - recall@k: share of the exact top-k chunk ids the index returned,
+    averaged over queries
+  - p50/p95 search latency per query (ChromaDB query() with a
+    precomputed embedding, so the embedding model is not timed)
+  - index memory: estimated from hnswlib's layout (vectors, level-0
+    links with 2*M neighbours, and the expected 1/(M-1) upper-level link
+    lists per element), plus build time
+
+The first rows are the NumPy exact search itself and the live collection
+with its current parameters, i.e. the recall retrieval gets today.
+
+Usage:
+    python -m src.bench.bench_hnsw
+    python -m src.bench.bench_hnsw --m 8 16 32 --construction-ef 100 200 \
+        --search-ef 10 20 50 100 --k 10 20 --output logs/bench_hnsw.json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import chromadb
+import numpy as np
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(_PROJECT_ROOT))
+
+from src.eval.run_eval import load_queries
+from src.rag.embedding_cache import CachedSentenceTransformerEmbeddingFunction
+from src.rag.hnsw import hnsw_configuration, hnsw_params
+from src.rag.retriever import get_collection
+
+
+def load_embeddings(collection, page_size: int = 1000) -> tuple[list[str], np.ndarray]:
+    """All ids and embeddings stored in a collection."""
+    ids, vectors = [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+        offset += len(page["ids"])
+    return ids, np.vstack(vectors)
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+def exact_top_k(queries: np.ndarray, corpus: np.ndarray, k: int) -> tuple[np.ndarray, list[float]]:
+    """Exact cosine top-k row indices per query, and per-query search seconds."""
+    corpus = _normalize(corpus)
+    top, seconds = [], []
+    for q in _normalize(queries):
+        start = time.perf_counter()
+        sims = corpus @ q
+        idx = np.argpartition(-sims, k - 1)[:k]
+        top.append(idx[np.argsort(-sims[idx], kind="stable")])
+        seconds.append(time.perf_counter() - start)
+    return np.array(top), seconds
+
+
+def ann_search(collection, queries: np.ndarray, k: int) -> tuple[list[list[str]], list[float]]:
+    """Top-k ids per query from the collection's HNSW index, one query per call.
+
+    One untimed query first, so loading the index is not counted.
+    """
+    collection.query(query_embeddings=[queries[0].tolist()], n_results=k, include=[])
+    results, seconds = [], []
+    for q in queries:
+        start = time.perf_counter()
+        got = collection.query(query_embeddings=[q.tolist()], n_results=k, include=[])
+        seconds.append(time.perf_counter() - start)
+        results.append(got["ids"][0])
+    return results, seconds
+
+
+def recall_at(exact_ids: list[list[str]], ann_ids: list[list[str]], k: int) -> float:
+    """Mean share of each query's exact top-k found in its ANN top-k."""
+    return float(np.mean([
+        len(set(e[:k]) & set(a[:k])) / k for e, a in zip(exact_ids, ann_ids)
+    ]))
+
+
+def hnsw_memory_bytes(n: int, dim: int, m: int) -> int:
+    """Estimated hnswlib memory for n float32 vectors of dim with degree m."""
+    level0 = n * (4 * dim + 4 + 2 * m * 4 + 8)  # vector, link count + 2M links, label
+    upper = n / max(m - 1, 1) * (4 + m * 4)  # expected upper-level link lists
+    bookkeeping = n * (4 + 8)  # element level + link list pointer
+    return int(level0 + upper + bookkeeping)
+
+
+def build_index(client, name: str, ids: list[str], vectors: np.ndarray,
+                m: int, construction_ef: int, search_ef: int):
+    """Fresh cosine HNSW collection over precomputed embeddings."""
+    collection = client.create_collection(
+        name=name,
+        configuration=hnsw_configuration(
+            m=m, construction_ef=construction_ef, search_ef=search_ef
+        ),
+        embedding_function=None,
+    )
+    batch = client.get_max_batch_size()
+    for start in range(0, len(ids), batch):
+        collection.add(ids=ids[start:start + batch], embeddings=vectors[start:start + batch])
+    return collection
+
+
+def _row(label: str, search_ef, build_s, memory, ks, exact_ids, ann_ids, seconds) -> dict:
+    ms = np.array(seconds) * 1000
+    p50, p95 = np.percentile(ms, [50, 95])
+    return {
+        "index": label,
+        "search_ef": search_ef,
+        "build_seconds": build_s,
+        "index_mb": memory / 1e6 if memory is not None else None,
+        "recall": {k: recall_at(exact_ids, ann_ids, k) for k in ks},
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+    }
+
+
+def _print_row(row: dict, ks: list[int]):
+    build = f"{row['build_seconds']:.2f}" if row["build_seconds"] is not None else "-"
+    memory = f"{row['index_mb']:.1f}" if row["index_mb"] is not None else "-"
+    ef = str(row["search_ef"]) if row["search_ef"] is not None else "-"
+    recalls = " ".join(f"{row['recall'][k]:>9.3f}" for k in ks)
+    print(f"  {row['index']:<22s} {build:>7s} {memory:>8s} {ef:>9s} {recalls} "
+          f"{row['p50_ms']:>7.2f} {row['p95_ms']:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="HNSW recall vs. exact search, latency and memory over a parameter grid"
+    )
+    parser.add_argument("--queries", default="src/eval/queries.json",
+                        help="Path to evaluation queries JSON")
+    parser.add_argument("--db-path", default="data/chromadb",
+                        help="Path to ChromaDB database")
+    parser.add_argument("--collection", default="space_debris_rag",
+                        help="ChromaDB collection name")
+    parser.add_argument("--model", default="all-mpnet-base-v2",
+                        help="Embedding model used at ingest")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32],
+                        help="HNSW M values (default: 8 16 32)")
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200],
+                        help="HNSW construction_ef values (default: 100 200)")
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 20, 50, 100],
+                        help="HNSW search_ef values (default: 10 20 50 100)")
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 20],
+                        help="Recall cutoffs (default: 10 20; 20 is the retrieval pool)")
+    parser.add_argument("--output", default=None,
+                        help="Also write the results as JSON to this path")
+    args = parser.parse_args()
+
+    ks = sorted(args.k)
+    k_max = ks[-1]
+
+    ef = CachedSentenceTransformerEmbeddingFunction(model_name=args.model)
+    live = get_collection(args.db_path, args.collection, embedding_function=ef)
+    ids, vectors = load_embeddings(live)
+    queries = load_queries(args.queries)
+    query_vectors = np.asarray(ef([q["query"] for q in queries]), dtype=np.float32)
+    n, dim = vectors.shape
+
+    exact_idx, exact_seconds = exact_top_k(query_vectors, vectors, k_max)
+    exact_ids = [[ids[i] for i in row] for row in exact_idx]
+
+    print(f"\nHNSW vs. exact top-{k_max}: {len(queries)} queries over {n} chunks ({dim}-d)")
+    recall_header = " ".join(f"{f'recall@{k}':>9s}" for k in ks)
+    print(f"  {'index':<22s} {'build s':>7s} {'index MB':>8s} {'search_ef':>9s} "
+          f"{recall_header} {'p50 ms':>7s} {'p95 ms':>7s}")
+
+    rows = [_row("exact (NumPy)", None, None, vectors.nbytes, ks,
+                 exact_ids, exact_ids, exact_seconds)]
+    _print_row(rows[-1], ks)
+
+    params = hnsw_params(live)
+    ann_ids, seconds = ann_search(live, query_vectors, k_max)
+    rows.append(_row(
+        f"live M={params['M']} cef={params['construction_ef']}", params["search_ef"], None,
+        hnsw_memory_bytes(n, dim, params["M"] or 16), ks, exact_ids, ann_ids, seconds,
+    ))
+    _print_row(rows[-1], ks)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client = chromadb.PersistentClient(path=tmp)
+        for m in args.m:
+            memory = hnsw_memory_bytes(n, dim, m)
+            for construction_ef in args.construction_ef:
+                for search_ef in args.search_ef:
+                    name = f"bench_m{m}_cef{construction_ef}_ef{search_ef}"
+                    start = time.perf_counter()
+                    collection = build_index(client, name, ids, vectors,
+                                             m, construction_ef, search_ef)
+                    build_s = time.perf_counter() - start
+                    ann_ids, seconds = ann_search(collection, query_vectors, k_max)
+                    rows.append(_row(f"M={m} cef={construction_ef}", search_ef, build_s,
+                                     memory, ks, exact_ids, ann_ids, seconds))
+                    _print_row(rows[-1], ks)
+                    client.delete_collection(name)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"n_chunks": n, "dim": dim, "n_queries": len(queries), "rows": rows},
+                      f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+bench_hybrid.py — Candidate-pool recall for dense vs. hybrid retrieval.
+
+For each candidate pool size, retrieves every query in src/eval/queries.json
+in dense mode and in hybrid (BM25 + dense, RRF-fused) mode and scores the
+pool with compute_retrieval_recall() from score_completeness.py. A smaller
+pool that reaches the same recall means fewer cross-encoder pairs per query.
+
+Usage:
+    python -m src.bench.bench_hybrid
+    python -m src.bench.bench_hybrid --pool-sizes 5 10 15 20 30
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(_PROJECT_ROOT))
+
+from src.eval.run_eval import load_queries
+from src.eval.score_completeness import compute_retrieval_recall
+from src.rag.embedding_cache import CachedSentenceTransformerEmbeddingFunction
+from src.rag.lexical import BM25Index, get_lexical_index_path
+from src.rag.retriever import get_collection, retrieve_many
+
+
+def mean_recall(queries: list[dict], results: list[list[dict]]) -> float | None:
+    """Mean compute_retrieval_recall() over queries with expected sources."""
+    recalls = [
+        compute_retrieval_recall({
+            "expected_sources": q.get("expected_sources", []),
+            "retrieved_chunks": chunks,
+        })
+        for q, chunks in zip(queries, results)
+    ]
+    recalls = [r for r in recalls if r is not None]
+    return statistics.mean(recalls) if recalls else None
+
+
+def _fmt_recall(recall: Optional[float]) -> str:
+    return "-" if recall is None else f"{recall:.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare dense vs. hybrid recall across candidate pool sizes"
+    )
+    parser.add_argument("--queries", default="src/eval/queries.json",
+                        help="Path to evaluation queries JSON")
+    parser.add_argument("--db-path", default="data/chromadb",
+                        help="Path to ChromaDB database")
+    parser.add_argument("--collection", default="space_debris_rag",
+                        help="ChromaDB collection name")
+    parser.add_argument("--model", default="all-mpnet-base-v2",
+                        help="Embedding model used at ingest")
+    parser.add_argument("--pool-sizes", type=int, nargs="+",
+                        default=[5, 10, 15, 20],
+                        help="Candidate pool sizes to evaluate (default: 5 10 15 20)")
+    args = parser.parse_args()
+
+    pool_sizes = sorted(set(args.pool_sizes))
+    queries = load_queries(args.queries)
+    texts = [q["query"] for q in queries]
+
+    ef = CachedSentenceTransformerEmbeddingFunction(model_name=args.model)
+    collection = get_collection(args.db_path, args.collection, embedding_function=ef)
+
+    start = time.perf_counter()
+    index = BM25Index.load(get_lexical_index_path(args.db_path, args.collection))
+    print(f"Loaded BM25 index ({len(index)} chunks, {len(index.terms)} terms) "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    # Embed once up front so the timings below are search-only.
+    ef(texts)
+
+    print(f"\nRecall over {len(queries)} queries (compute_retrieval_recall)")
+    print(f"  {'pool':>5}  {'dense':>7}  {'hybrid':>7}  {'dense ms/q':>10}  {'hybrid ms/q':>11}")
+    rows = []
+    for k in pool_sizes:
+        row = {"pool": k}
+        for mode in ("dense", "hybrid"):
+            start = time.perf_counter()
+            results = retrieve_many(
+                texts, collection, n_results=k, embedding_function=ef,
+                mode=mode, lexical_index=index,
+            )
+            row[f"{mode}_ms"] = (time.perf_counter() - start) / len(texts) * 1000
+            row[mode] = mean_recall(queries, results)
+        rows.append(row)
+        print(f"  {k:>5}  {_fmt_recall(row['dense']):>7}  {_fmt_recall(row['hybrid']):>7}  "
+              f"{row['dense_ms']:>10.1f}  {row['hybrid_ms']:>11.1f}")
+
+    # Smallest hybrid pool that matches dense recall at the largest pool size.
+    largest = rows[-1]
+    target = largest["dense"]
+    if target is None:
+        print("\nNo query has expected sources, so recall is undefined")
+        return
+    matching = [r for r in rows if r["hybrid"] is not None and r["hybrid"] >= target]
+    if matching:
+        best = matching[0]
+        print(f"\nHybrid pool of {best['pool']} reaches dense@{largest['pool']} "
+              f"recall ({target:.3f}): {best['pool']} vs {largest['pool']} "
+              f"cross-encoder pairs per query")
+    else:
+        print(f"\nNo hybrid pool size reached dense@{largest['pool']} recall ({target:.3f})")
+
+
+if __name__ == "__main__":
+    main()
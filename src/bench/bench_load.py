@@ -0,0 +1,134 @@
+"""
+bench_load.py — Latency under concurrent load for AsyncRAGPipeline.
+
+Runs closed-loop clients against one AsyncRAGPipeline: each client sends
+a query, waits for the answer, then sends the next, cycling through the
+queries in src/eval/queries.json. Reports p50/p95/p99 latency, throughput
+and the mean micro-batch size at each concurrency level.
+
+By default only retrieval + reranking is timed, so no API key is needed.
+Pass --generate to include the async Anthropic call; point it at the local
+stub to measure scheduling without API cost:
+
+    python -m src.bench.stub_messages_api --port 8765 --latency 1.0
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=stub \\
+        python -m src.bench.bench_load --generate
+
+Usage:
+    python -m src.bench.bench_load
+    python -m src.bench.bench_load --clients 1 8 32 --requests-per-client 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(_PROJECT_ROOT))
+
+from dotenv import load_dotenv
+load_dotenv(_PROJECT_ROOT / ".env", override=True)
+load_dotenv(_PROJECT_ROOT / "grader.env", override=True)
+
+from src.eval.run_eval import load_queries
+from src.rag.async_pipeline import AsyncRAGPipeline
+
+
+async def run_level(
+    pipeline: AsyncRAGPipeline,
+    queries: list[str],
+    n_clients: int,
+    requests_per_client: int,
+    generate: bool,
+    log_path: str,
+) -> tuple[list[float], float]:
+    """Run n_clients closed-loop clients; return per-request latencies and wall time."""
+    latencies: list[float] = []
+
+    async def client(idx: int):
+        for i in range(requests_per_client):
+            q = queries[(idx * requests_per_client + i) % len(queries)]
+            start = time.perf_counter()
+            if generate:
+                await pipeline.query(q, log_path=log_path)
+            else:
+                await pipeline.retrieve_and_rerank(q)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(n_clients)))
+    return latencies, time.perf_counter() - start
+
+
+async def run(args):
+    queries = [q["query"] for q in load_queries(args.queries)]
+    pipeline = AsyncRAGPipeline(
+        db_path=args.db_path,
+        collection_name=args.collection,
+        max_workers=args.max_workers,
+        batch_window_ms=args.batch_window_ms,
+        max_batch_size=args.max_batch_size,
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        await pipeline.warmup(client=args.generate)
+
+    stages = "retrieve+rerank+generate+log" if args.generate else "retrieve+rerank"
+    print(f"\nAsyncRAGPipeline load test ({stages}, window={args.batch_window_ms} ms, "
+          f"workers={args.max_workers})")
+    print(f"  {'clients':>7s} {'reqs':>5s} {'p50 ms':>9s} {'p95 ms':>9s} "
+          f"{'p99 ms':>9s} {'req/s':>7s} {'batch':>6s}")
+
+    for n_clients in args.clients:
+        # Fresh counters per level; the models and caches stay warm
+        pipeline.batcher.reset_stats()
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies, wall = await run_level(
+                pipeline, queries, n_clients, args.requests_per_client,
+                args.generate, args.log_path,
+            )
+        ms = np.array(latencies) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        stats = pipeline.batcher.stats()
+        print(f"  {n_clients:>7d} {len(ms):>5d} {p50:>9.1f} {p95:>9.1f} {p99:>9.1f} "
+              f"{len(ms) / wall:>7.1f} {stats['mean_batch_size']:>6.1f}")
+
+    pipeline.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test AsyncRAGPipeline at several concurrency levels"
+    )
+    parser.add_argument("--queries", default="src/eval/queries.json",
+                        help="Path to evaluation queries JSON")
+    parser.add_argument("--db-path", default="data/chromadb",
+                        help="Path to ChromaDB database")
+    parser.add_argument("--collection", default="space_debris_rag",
+                        help="ChromaDB collection name")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32],
+                        help="Concurrent client counts (default: 1 8 32)")
+    parser.add_argument("--requests-per-client", type=int, default=8,
+                        help="Requests each client sends per level (default: 8)")
+    parser.add_argument("--max-workers", type=int, default=2,
+                        help="Executor threads for embedding/reranking (default: 2)")
+    parser.add_argument("--batch-window-ms", type=float, default=5.0,
+                        help="Micro-batching window in ms (default: 5)")
+    parser.add_argument("--max-batch-size", type=int, default=32,
+                        help="Maximum queries per embedding/rerank batch (default: 32)")
+    parser.add_argument("--generate", action="store_true",
+                        help="Include generation (async Anthropic API call) in timings")
+    parser.add_argument("--log-path", default="logs/bench_queries.jsonl",
+                        help="Log path used when --generate is set")
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+bench_log_sink.py — Query-log write cost: per-entry appends vs. LogSink.
+
+Writes --entries log entries per thread from --threads threads, three ways:
+
+  - open-append: open / append / close per entry (the original log_query)
+  - locked-append: append_lines() per entry (one locked O_APPEND write)
+  - sink: LogSink.write_line() (queued; batched by the writer thread)
+
+and reports entries/s plus p50/p99 of the time each caller spends per
+entry. Entries are copies of the last line of logs/rag_queries.jsonl (a
+realistic size) with a unique id.
+
+Then checks safety: --processes processes write through their own LogSink
+to one shared log with small size-based rotation and gzip compression,
+and every entry must be read back exactly once by iter_log_entries().
+Exits 1 on a missing, duplicated or corrupt entry.
+
+Usage:
+    python -m src.bench.bench_log_sink
+    python -m src.bench.bench_log_sink --threads 1 8 32 --entries 500 --processes 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(_PROJECT_ROOT))
+
+from src.rag.log_sink import LogSink, append_lines, iter_log_entries, rotated_segments
+
+
+def sample_line(log_path: Path) -> dict:
+    """Last entry of the query log, or a synthetic one of similar size."""
+    if log_path.exists():
+        last = None
+        with open(log_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    last = line
+        if last:
+            return json.loads(last)
+    return {"query": "q", "reranking": {"chunks": [{"text": "x" * 1500}] * 10}}
+
+
+def _open_append(path: Path, line: str):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def run_writers(write, n_threads: int, n_entries: int, entry: dict) -> tuple[list[float], float]:
+    """Run n_threads writers; return per-call latencies and wall time."""
+    latencies: list[float] = []
+    lock = threading.Lock()
+
+    def worker(t: int):
+        local = []
+        for i in range(n_entries):
+            line = json.dumps({**entry, "bench_id": f"{t}-{i}"}, ensure_ascii=False)
+            start = time.perf_counter()
+            write(line)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+    start = time.perf_counter()
+    for th in threads:
+        th.start()
+    for th in threads:
+        th.join()
+    return latencies, time.perf_counter() - start
+
+
+def _process_writer(path: str, proc: int, n_entries: int, rotate_bytes: int):
+    sink = LogSink(path, rotate_bytes=rotate_bytes, compression="gzip", max_batch=64)
+    for i in range(n_entries):
+        sink.write({"bench_id": f"p{proc}-{i}", "padding": "x" * 500})
+    sink.close()
+
+
+def check_multiprocess(n_processes: int, n_entries: int) -> bool:
+    """Shared log + rotation across processes; True if every entry is read back once."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "queries.jsonl"
+        rotate_bytes = 64 * 1024
+        procs = [
+            multiprocessing.Process(
+                target=_process_writer, args=(str(path), p, n_entries, rotate_bytes)
+            )
+            for p in range(n_processes)
+        ]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+
+        seen: dict[str, int] = {}
+        corrupt = 0
+        try:
+            for entry in iter_log_entries(path):
+                seen[entry["bench_id"]] = seen.get(entry["bench_id"], 0) + 1
+        except (json.JSONDecodeError, KeyError):
+            corrupt += 1
+        expected = n_processes * n_entries
+        duplicated = sum(1 for n in seen.values() if n > 1)
+        segments = rotated_segments(path)
+
+        print(f"\nMulti-process check ({n_processes} processes x {n_entries} entries, "
+              f"rotate at {rotate_bytes // 1024} KB, gzip)")
+        print(f"  entries read back: {sum(seen.values())} / {expected}  "
+              f"(unique {len(seen)}, duplicated {duplicated}, corrupt {corrupt})")
+        print(f"  rotated segments: {len(segments)} "
+              f"({sum(1 for s in segments if s.suffix == '.gz')} compressed)")
+        return len(seen) == expected and not duplicated and not corrupt
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark query-log writes and check multi-process safety"
+    )
+    parser.add_argument("--log-path", default="logs/rag_queries.jsonl",
+                        help="Log whose last entry is used as the sample (default: "
+                             "logs/rag_queries.jsonl)")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32],
+                        help="Writer thread counts (default: 1 8 32)")
+    parser.add_argument("--entries", type=int, default=300,
+                        help="Entries per thread (default: 300)")
+    parser.add_argument("--processes", type=int, default=4,
+                        help="Processes in the multi-process check (default: 4)")
+    args = parser.parse_args()
+
+    entry = sample_line(Path(args.log_path))
+    print(f"\nLog writes ({len(json.dumps(entry)) / 1024:.1f} KB per entry, "
+          f"{args.entries} entries per thread)")
+    print(f"  {'method':<14s} {'threads':>7s} {'entries/s':>10s} "
+          f"{'p50 us':>8s} {'p99 us':>9s}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_threads in args.threads:
+            for method in ("open-append", "locked-append", "sink"):
+                path = Path(tmp) / f"{method}-{n_threads}.jsonl"
+                sink = None
+                if method == "open-append":
+                    write = lambda line: _open_append(path, line)
+                elif method == "locked-append":
+                    write = lambda line: append_lines(path, [line])
+                else:
+                    sink = LogSink(path)
+                    write = sink.write_line
+                latencies, wall = run_writers(write, n_threads, args.entries, entry)
+                if sink is not None:
+                    # Count the time until everything is on disk
+                    start = time.perf_counter()
+                    sink.close()
+                    wall += time.perf_counter() - start
+                us = np.array(latencies) * 1e6
+                p50, p99 = np.percentile(us, [50, 99])
+                print(f"  {method:<14s} {n_threads:>7d} {len(us) / wall:>10.0f} "
+                      f"{p50:>8.1f} {p99:>9.1f}")
+
+    if not check_multiprocess(args.processes, args.entries):
+        print("\nFAIL")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
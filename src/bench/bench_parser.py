@@ -0,0 +1,150 @@
+"""
+bench_parser.py — Single-pass parser vs. the previous two-pass regex parser.
+
+The previous implementation (kept below as _legacy_* for comparison)
+read each file twice — once for chunks, once for header metadata — and
+ran uncompiled re.match calls on every line plus a second regex per
+chunk id. This script times both over data/processed and checks that
+the new parser returns exactly the same chunks and header metadata.
+
+Exits with status 1 if any file's output differs (parity check).
+
+Usage:
+    python -m src.bench.bench_parser
+    python -m src.bench.bench_parser --repeats 20
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(_PROJECT_ROOT))
+
+from src.ingest.parser import parse_chunked_document
+
+
+def _legacy_parse_chunked_file(filepath: Path) -> list[dict]:
+    """Previous parse_chunked_file implementation (reference for parity)."""
+    text = filepath.read_text(encoding="utf-8")
+    lines = text.split("\n")
+
+    header_match = re.match(r"^#\s+(\S+)\s+--\s+(.+)", lines[0])
+    if not header_match:
+        raise ValueError(f"Could not parse header in {filepath}: {lines[0]}")
+    source_id = header_match.group(1)
+
+    chunks = []
+    current_section_title = None
+
+    for line in lines:
+        sec_match = re.match(r"^#{2,3}\s+(sec[\d.]+)\s+--\s+(.+)", line)
+        if sec_match:
+            current_section_title = sec_match.group(2).strip()
+            continue
+
+        chunk_match = re.match(r"^\[(sec[\d.]+_p\d+(?:_\d+)?)\]\s+(.+)", line)
+        if chunk_match:
+            chunk_id = chunk_match.group(1)
+            section_from_chunk = re.match(r"(sec[\d.]+)_p", chunk_id).group(1)
+            chunks.append({
+                "source_id": source_id,
+                "chunk_id": chunk_id,
+                "text": chunk_match.group(2).strip(),
+                "section_id": section_from_chunk,
+                "section_title": current_section_title or "Unknown",
+            })
+
+    return chunks
+
+
+def _legacy_parse_header_metadata(filepath: Path) -> dict:
+    """Previous parse_header_metadata implementation (reference for parity)."""
+    lines = filepath.read_text(encoding="utf-8").split("\n")
+    metadata = {}
+
+    header_match = re.match(r"^#\s+(\S+)\s+--\s+(.+)", lines[0])
+    if header_match:
+        metadata["source_id"] = header_match.group(1)
+        metadata["title"] = header_match.group(2).strip()
+
+    for line in lines[1:20]:
+        kv_match = re.match(r"^\*\*(.+?):\*\*\s+(.+)", line)
+        if kv_match:
+            key = kv_match.group(1).strip().lower()
+            value = kv_match.group(2).strip()
+            if key == "authors":
+                metadata["authors"] = value
+            elif key == "venue":
+                metadata["venue"] = value
+            elif key in ("url", "doi"):
+                metadata["url_or_doi"] = value
+        if line.startswith("## "):
+            break
+
+    return metadata
+
+
+def _time(fn, files: list[Path], repeats: int) -> float:
+    """Median seconds for one pass of fn over all files."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for fp in files:
+            fn(fp)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark and parity-check the chunked markdown parser"
+    )
+    parser.add_argument("--chunks-dir", default="data/processed",
+                        help="Directory containing *_chunked.md files")
+    parser.add_argument("--repeats", type=int, default=10,
+                        help="Timed passes over the corpus (default: 10)")
+    args = parser.parse_args()
+
+    files = sorted(Path(args.chunks_dir).glob("*_chunked.md"))
+    if not files:
+        print(f"No chunked files found in {args.chunks_dir}")
+        sys.exit(1)
+
+    # Parity check: chunks and header metadata must match exactly.
+    mismatches = 0
+    n_chunks = 0
+    for fp in files:
+        doc = parse_chunked_document(fp)
+        n_chunks += len(doc["chunks"])
+        if doc["chunks"] != _legacy_parse_chunked_file(fp):
+            print(f"  MISMATCH (chunks): {fp.name}")
+            mismatches += 1
+        if doc["metadata"] != _legacy_parse_header_metadata(fp):
+            print(f"  MISMATCH (metadata): {fp.name}")
+            mismatches += 1
+        for line_no, line in doc["malformed"]:
+            print(f"  malformed: {fp.name}:{line_no}: {line[:80]}")
+
+    legacy = _time(
+        lambda fp: (_legacy_parse_chunked_file(fp), _legacy_parse_header_metadata(fp)),
+        files, args.repeats,
+    )
+    single = _time(parse_chunked_document, files, args.repeats)
+
+    print(f"\nParser over {len(files)} files / {n_chunks} chunks "
+          f"(median of {args.repeats} passes, chunks + header metadata)")
+    print(f"  legacy (two reads, uncompiled regex): {legacy * 1000:8.2f} ms")
+    print(f"  parse_chunked_document (one pass):    {single * 1000:8.2f} ms")
+    print(f"  speedup: {legacy / single:.2f}x")
+    print(f"  parity: {'OK' if mismatches == 0 else f'{mismatches} mismatches'}")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+bench_pipeline.py — Cold-start vs. warm per-query latency for the RAG pipeline.
+
+Cold: a fresh RAGPipeline is built for every query, which is what
+run_query() used to do (new ChromaDB client, embedding function,
+cross-encoder handle and API client each time).
+Warm: one RAGPipeline is warmed up once and reused for every query.
+The shared query-embedding cache is cleared before each phase, so
+neither phase is timed on embeddings a previous one already computed.
+
+By default only retrieval + reranking is timed, so no API key is needed.
+Pass --generate to include the Anthropic call (costs tokens).
+
+Usage:
+    python -m src.bench.bench_pipeline
+    python -m src.bench.bench_pipeline --n-queries 5 --generate
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(_PROJECT_ROOT))
+
+from dotenv import load_dotenv
+load_dotenv(_PROJECT_ROOT / ".env", override=True)
+load_dotenv(_PROJECT_ROOT / "grader.env", override=True)
+
+from src.eval.run_eval import load_queries
+from src.rag.embedding_cache import clear_embedding_caches
+from src.rag.pipeline import RAGPipeline
+
+
+def _run_once(pipeline: RAGPipeline, query: str, generate: bool, log_path: str):
+    """Run one query through the pipeline with its progress output silenced."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        if generate:
+            pipeline.query(query, log_path=log_path)
+        else:
+            pipeline.retrieve_and_rerank(query)
+
+
+def _fmt(label: str, timings: list[float]) -> str:
+    """Format mean / p50 / max latency in milliseconds."""
+    ms = [t * 1000 for t in timings]
+    return (
+        f"  {label:<22s} n={len(ms):<3d} mean={statistics.mean(ms):8.1f} ms  "
+        f"p50={statistics.median(ms):8.1f} ms  max={max(ms):8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark cold-start vs. warm RAG pipeline latency"
+    )
+    parser.add_argument("--queries", default="src/eval/queries.json",
+                        help="Path to evaluation queries JSON")
+    parser.add_argument("--n-queries", type=int, default=10,
+                        help="Number of queries to time (default: 10)")
+    parser.add_argument("--db-path", default="data/chromadb",
+                        help="Path to ChromaDB database")
+    parser.add_argument("--collection", default="space_debris_rag",
+                        help="ChromaDB collection name")
+    parser.add_argument("--generate", action="store_true",
+                        help="Include generation (Anthropic API call) in timings")
+    parser.add_argument("--log-path", default="logs/bench_queries.jsonl",
+                        help="Log path used when --generate is set")
+    args = parser.parse_args()
+
+    queries = [q["query"] for q in load_queries(args.queries)][: args.n_queries]
+
+    def new_pipeline() -> RAGPipeline:
+        return RAGPipeline(db_path=args.db_path, collection_name=args.collection)
+
+    # First query in this process: includes model downloads/loads.
+    start = time.perf_counter()
+    first = new_pipeline()
+    _run_once(first, queries[0], args.generate, args.log_path)
+    first_query = time.perf_counter() - start
+
+    # Cold: rebuild the pipeline per query.
+    clear_embedding_caches()
+    cold = []
+    for q in queries:
+        start = time.perf_counter()
+        _run_once(new_pipeline(), q, args.generate, args.log_path)
+        cold.append(time.perf_counter() - start)
+
+    # Warm: one pipeline, warmed once, reused. Clearing the embedding cache
+    # keeps the cold phase's query embeddings from turning into cache hits.
+    clear_embedding_caches()
+    pipeline = new_pipeline()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        pipeline.warmup(client=args.generate)
+    warmup = time.perf_counter() - start
+
+    warm = []
+    for q in queries:
+        start = time.perf_counter()
+        _run_once(pipeline, q, args.generate, args.log_path)
+        warm.append(time.perf_counter() - start)
+
+    stages = "retrieve+rerank+generate+log" if args.generate else "retrieve+rerank"
+    print(f"\nPipeline latency ({stages}, {len(queries)} queries)")
+    print(f"  first query in process: {first_query * 1000:8.1f} ms")
+    print(f"  warmup():               {warmup * 1000:8.1f} ms")
+    print(_fmt("cold (per-query init)", cold))
+    print(_fmt("warm (shared pipeline)", warm))
+    print(f"  speedup (mean): {statistics.mean(cold) / statistics.mean(warm):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
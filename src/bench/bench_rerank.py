@@ -0,0 +1,89 @@
+"""
+bench_rerank.py — CPU cross-encoder throughput: per-query rerank() vs. rerank_many().
+
+For 1, 8 and 32 concurrent queries, each with --n-candidates chunks,
+reports pairs/second when every query gets its own predict() call versus
+one flattened rerank_many() call. Candidates are drawn from the chunked
+corpus in data/processed, so no ChromaDB index or API key is needed.
+
+Usage:
+    python -m src.bench.bench_rerank
+    python -m src.bench.bench_rerank --batch-size 128 --concurrency 1 8 32 64
+"""
+
+import argparse
+import copy
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(_PROJECT_ROOT))
+
+from src.eval.run_eval import load_queries
+from src.ingest.parser import parse_chunked_file
+from src.rag.reranker import get_reranker, rerank, rerank_many
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark batched cross-encoder reranking throughput"
+    )
+    parser.add_argument("--queries", default="src/eval/queries.json",
+                        help="Path to evaluation queries JSON")
+    parser.add_argument("--chunks-dir", default="data/processed",
+                        help="Directory containing *_chunked.md files")
+    parser.add_argument("--n-candidates", type=int, default=20,
+                        help="Candidate chunks per query (default: 20)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32],
+                        help="Numbers of concurrent queries to test (default: 1 8 32)")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="predict() batch size for rerank_many (default: 64)")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Timed repetitions per setting (default: 3)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    query_texts = [q["query"] for q in load_queries(args.queries)]
+    corpus = []
+    for fp in sorted(Path(args.chunks_dir).glob("*_chunked.md")):
+        corpus.extend(parse_chunked_file(fp))
+    print(f"Loaded {len(corpus)} corpus chunks")
+
+    reranker = get_reranker()
+    reranker.predict([("warmup", "warmup")])
+
+    print(f"\nCross-encoder throughput ({args.n_candidates} candidates/query, "
+          f"median of {args.repeats})")
+    print(f"  {'queries':>7s} {'pairs':>6s} {'per-query (pairs/s)':>20s} "
+          f"{'rerank_many (pairs/s)':>22s} {'speedup':>8s}")
+
+    for n in args.concurrency:
+        queries = [query_texts[i % len(query_texts)] for i in range(n)]
+        chunk_lists = [rng.sample(corpus, args.n_candidates) for _ in range(n)]
+        n_pairs = n * args.n_candidates
+
+        loop_times, batch_times = [], []
+        for _ in range(args.repeats):
+            lists = copy.deepcopy(chunk_lists)
+            start = time.perf_counter()
+            for q, chunks in zip(queries, lists):
+                rerank(q, chunks, reranker=reranker)
+            loop_times.append(time.perf_counter() - start)
+
+            lists = copy.deepcopy(chunk_lists)
+            start = time.perf_counter()
+            rerank_many(queries, lists, reranker=reranker, batch_size=args.batch_size)
+            batch_times.append(time.perf_counter() - start)
+
+        loop_pps = n_pairs / statistics.median(loop_times)
+        batch_pps = n_pairs / statistics.median(batch_times)
+        print(f"  {n:>7d} {n_pairs:>6d} {loop_pps:>20.1f} "
+              f"{batch_pps:>22.1f} {batch_pps / loop_pps:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
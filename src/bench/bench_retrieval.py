@@ -0,0 +1,77 @@
+"""
+bench_retrieval.py — Per-query retrieve() loop vs. batched retrieve_many().
+
+Runs every query in src/eval/queries.json through ChromaDB both ways on
+one warm collection and reports wall time, per-query latency, and
+whether both paths returned the same chunk ids.
+
+Usage:
+    python -m src.bench.bench_retrieval
+    python -m src.bench.bench_retrieval --n-retrieve 20 --repeats 5
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(_PROJECT_ROOT))
+
+from src.eval.run_eval import load_queries
+from src.rag.retriever import get_collection, retrieve, retrieve_many
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark batched vs. per-query ChromaDB retrieval"
+    )
+    parser.add_argument("--queries", default="src/eval/queries.json",
+                        help="Path to evaluation queries JSON")
+    parser.add_argument("--db-path", default="data/chromadb",
+                        help="Path to ChromaDB database")
+    parser.add_argument("--collection", default="space_debris_rag",
+                        help="ChromaDB collection name")
+    parser.add_argument("--n-retrieve", type=int, default=20,
+                        help="Chunks retrieved per query (default: 20)")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="Timed repetitions of each path (default: 3)")
+    args = parser.parse_args()
+
+    queries = [q["query"] for q in load_queries(args.queries)]
+    collection = get_collection(args.db_path, args.collection)
+
+    # Warm the embedding model and index before timing anything.
+    retrieve(queries[0], collection, n_results=args.n_retrieve)
+
+    loop_times, batch_times = [], []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        looped = [retrieve(q, collection, n_results=args.n_retrieve) for q in queries]
+        loop_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        batched = retrieve_many(queries, collection, n_results=args.n_retrieve)
+        batch_times.append(time.perf_counter() - start)
+
+    same = all(
+        [c["id"] for c in a] == [c["id"] for c in b]
+        for a, b in zip(looped, batched)
+    )
+
+    n = len(queries)
+    loop_s = statistics.median(loop_times)
+    batch_s = statistics.median(batch_times)
+    print(f"\nRetrieval over {n} queries (n_retrieve={args.n_retrieve}, "
+          f"median of {args.repeats})")
+    print(f"  retrieve() loop:  {loop_s * 1000:8.1f} ms total  "
+          f"{loop_s / n * 1000:6.1f} ms/query")
+    print(f"  retrieve_many():  {batch_s * 1000:8.1f} ms total  "
+          f"{batch_s / n * 1000:6.1f} ms/query")
+    print(f"  speedup: {loop_s / batch_s:.2f}x")
+    print(f"  identical results: {same}")
+
+
+if __name__ == "__main__":
+    main()
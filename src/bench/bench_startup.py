@@ -0,0 +1,151 @@
+"""
+bench_startup.py — CLI startup cost, with a regression threshold.
+
+Measures, in fresh interpreters:
+  - import time of the CLI entry point (src.rag.query) from
+    python -X importtime, plus the slowest modules it pulls in
+  - wall time of python -m src.rag.query --help
+  - that importing the CLI and pipeline modules loads none of the heavy
+    libraries (chromadb, sentence-transformers, torch, anthropic), and
+    that a skip_rerank stage does not import the cross-encoder stack
+
+Exits with status 1 if the import time exceeds --max-import-ms or a heavy
+library is imported eagerly, so it can gate changes to the import graph.
+
+Usage:
+    python -m src.bench.bench_startup
+    python -m src.bench.bench_startup --max-import-ms 300 --runs 7
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Libraries that must only load on first use
+HEAVY_MODULES = ("chromadb", "sentence_transformers", "torch", "transformers", "anthropic")
+
+ENTRY_MODULE = "src.rag.query"
+
+# Modules whose import must not load HEAVY_MODULES
+LIGHT_MODULES = ("src.rag.query", "src.rag.pipeline", "src.rag.reranker", "src.rag.generator")
+
+# Pipeline stage that must work without the cross-encoder stack (--no-rerank)
+NO_RERANK_CHECK = """
+import sys
+from src.rag.pipeline import RAGPipeline
+RAGPipeline().rerank("q", [{"text": "t"}], n_rerank=1, skip_rerank=True)
+print("loaded:" + ",".join(m for m in ("sentence_transformers", "torch") if m in sys.modules))
+"""
+
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=_PROJECT_ROOT, capture_output=True, text=True
+    )
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """Parse -X importtime output into (module, self_us, cumulative_us, depth)."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        # Nesting is shown as two spaces per level after the leading space
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def import_time_ms(module: str) -> tuple[float, list[tuple[str, int, int, int]]]:
+    """Cumulative import time of module in a fresh interpreter, and all rows."""
+    proc = _python("-X", "importtime", "-c", f"import {module}")
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = parse_importtime(proc.stderr)
+    total = next(c for name, _, c, depth in rows if name == module and depth == 0)
+    return total / 1000, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark CLI import/startup time and fail on regressions"
+    )
+    parser.add_argument("--runs", type=int, default=5,
+                        help="Fresh interpreters per measurement (median reported; default: 5)")
+    parser.add_argument("--max-import-ms", type=float, default=500.0,
+                        help=f"Fail if importing {ENTRY_MODULE} takes longer (default: 500)")
+    parser.add_argument("--top", type=int, default=10,
+                        help="Slowest modules to list (default: 10)")
+    args = parser.parse_args()
+
+    failures = []
+
+    # 1. Import time of the entry point
+    timings = []
+    rows = []
+    for _ in range(args.runs):
+        ms, rows = import_time_ms(ENTRY_MODULE)
+        timings.append(ms)
+    import_ms = statistics.median(timings)
+
+    # 2. Wall time of --help (interpreter startup included)
+    help_times = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        proc = _python("-m", ENTRY_MODULE, "--help")
+        help_times.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            failures.append(f"{ENTRY_MODULE} --help exited with {proc.returncode}")
+            break
+    help_ms = statistics.median(help_times) * 1000
+
+    print(f"\nStartup ({args.runs} fresh interpreters, median)")
+    print(f"  import {ENTRY_MODULE}: {import_ms:8.1f} ms  (limit {args.max_import_ms:.0f} ms)")
+    print(f"  {ENTRY_MODULE} --help: {help_ms:8.1f} ms  (wall, incl. interpreter)")
+
+    print("\n  Slowest modules by self time (last run):")
+    for name, self_us, cumulative_us, _ in sorted(rows, key=lambda r: -r[1])[: args.top]:
+        print(f"    {self_us / 1000:7.1f} ms self {cumulative_us / 1000:8.1f} ms cum  {name}")
+
+    if import_ms > args.max_import_ms:
+        failures.append(
+            f"import {ENTRY_MODULE} took {import_ms:.1f} ms (> {args.max_import_ms:.0f} ms)"
+        )
+
+    # 3. Heavy libraries must stay lazy
+    print("\n  Eager heavy imports:")
+    for module in LIGHT_MODULES:
+        proc = _python("-c", f"import sys, {module}; "
+                             f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+        loaded = proc.stdout.strip() if proc.returncode == 0 else f"error: {proc.stderr[-300:]}"
+        print(f"    {module:<22s} {loaded or 'none'}")
+        if loaded:
+            failures.append(f"import {module} loads {loaded}")
+
+    proc = _python("-c", NO_RERANK_CHECK)
+    # The stage prints its own progress line first; the marker line is last
+    loaded = (
+        proc.stdout.strip().splitlines()[-1].removeprefix("loaded:")
+        if proc.returncode == 0 else f"error: {proc.stderr[-300:]}"
+    )
+    print(f"    {'skip_rerank stage':<22s} {loaded or 'none'}")
+    if loaded:
+        failures.append(f"skip_rerank stage loads {loaded}")
+
+    if failures:
+        print("\nFAIL")
+        for failure in failures:
+            print(f"  - {failure}")
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+stub_messages_api.py — Local stand-in for the Anthropic Messages API.
+
+Serves POST /v1/messages with a fixed response after a configurable delay,
+and can inject errors (429 rate limited and 529 overloaded by default,
+any statuses with --error-status), so the concurrent eval runner can be
+exercised without network access or cost.
+The response text is a valid judge JSON object (groundedness, citation and
+completeness fields), so generation and both judges succeed against it.
+
+Requests with "stream": true are answered as server-sent events: the
+response text arrives in several text deltas, the first after --latency
+seconds and the rest --token-interval seconds apart.
+
+Requests with a cache_control marker get prompt-cache usage: the first
+request with a given prefix reports it as cache_creation_input_tokens,
+later ones as cache_read_input_tokens (token counts approximated as
+characters / 4, no minimum prefix length).
+
+Also serves the Message Batches endpoints (create, retrieve, results); a
+batch reports "ended" --batch-delay seconds after it is created, for
+exercising --judge-batch and score_completeness --batch.
+
+Usage:
+    python -m src.bench.stub_messages_api --port 8765 --latency 0.5 --error-rate 0.1
+
+    # In another shell, point the SDK at the stub:
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=stub \\
+        python -m src.eval.run_eval --concurrency 8
+
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=stub \\
+        python -m src.eval.run_eval --judge-batch --poll-interval 1
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+STUB_TEXT = json.dumps({
+    "groundedness_score": 4,
+    "groundedness_rationale": "Stub response.",
+    "citation_score": 4,
+    "citation_rationale": "Stub response.",
+    "failure_tags": [],
+    "completeness_score": 3,
+    "completeness_rationale": "Stub response.",
+})
+
+
+class StubState:
+    """Shared counters and settings for the request handler."""
+
+    def __init__(self, latency: float, error_rate: float, seed: int,
+                 batch_delay: float = 2.0, token_interval: float = 0.02,
+                 error_statuses: tuple[int, ...] = (429, 529)):
+        self.latency = latency
+        self.token_interval = token_interval
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.batch_delay = batch_delay
+        self.batches: dict[str, dict] = {}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cached_prefixes: set[str] = set()
+        self.cache_reads = 0
+
+
+def cached_prefix(request: dict) -> str:
+    """Text of the request up to and including the last cache_control block."""
+    blocks = []
+    system = request.get("system")
+    if isinstance(system, list):
+        blocks.extend(system)
+    elif system:
+        blocks.append({"type": "text", "text": system})
+    for message in request.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, list):
+            blocks.extend(content)
+        else:
+            blocks.append({"type": "text", "text": content or ""})
+    marked = [i for i, b in enumerate(blocks) if b.get("cache_control")]
+    if not marked:
+        return ""
+    return "".join(b.get("text", "") for b in blocks[:marked[-1] + 1])
+
+
+def make_handler(state: StubState):
+    """Build a request handler class bound to one StubState."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: dict, headers: dict | None = None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _usage(self, request: dict) -> dict:
+            usage = {"input_tokens": 100, "output_tokens": 20,
+                     "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0}
+            prefix = cached_prefix(request)
+            if prefix:
+                digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()
+                field = "cache_creation_input_tokens"
+                with state.lock:
+                    if digest in state.cached_prefixes:
+                        field = "cache_read_input_tokens"
+                        state.cache_reads += 1
+                    state.cached_prefixes.add(digest)
+                usage[field] = len(prefix) // 4
+            return usage
+
+        def _message(self, request: dict) -> dict:
+            return {
+                "id": f"msg_stub_{uuid.uuid4().hex[:12]}",
+                "type": "message",
+                "role": "assistant",
+                "model": request.get("model", "stub"),
+                "content": [{"type": "text", "text": STUB_TEXT}],
+                "stop_reason": "end_turn",
+                "stop_sequence": None,
+                "usage": self._usage(request),
+            }
+
+        def _stream(self, request: dict):
+            """Send the stub message as a server-sent event stream."""
+            message = self._message(request)
+            usage = message["usage"]
+            text = STUB_TEXT
+            step = max(1, len(text) // 8)
+            deltas = [text[i:i + step] for i in range(0, len(text), step)]
+
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("cache-control", "no-cache")
+            self.end_headers()
+
+            def event(name: str, data: dict):
+                self.wfile.write(
+                    f"event: {name}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+                )
+                self.wfile.flush()
+
+            event("message_start", {"type": "message_start", "message": {
+                **message, "content": [], "stop_reason": None,
+                "usage": {**usage, "output_tokens": 1},
+            }})
+            event("content_block_start", {"type": "content_block_start", "index": 0,
+                                          "content_block": {"type": "text", "text": ""}})
+            time.sleep(state.latency)
+            for i, delta in enumerate(deltas):
+                if i:
+                    time.sleep(state.token_interval)
+                event("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                              "delta": {"type": "text_delta", "text": delta}})
+            event("content_block_stop", {"type": "content_block_stop", "index": 0})
+            event("message_delta", {"type": "message_delta",
+                                    "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                                    "usage": {"output_tokens": usage["output_tokens"]}})
+            event("message_stop", {"type": "message_stop"})
+
+        def _batch(self, batch_id: str) -> dict:
+            batch = state.batches[batch_id]
+            ended = time.time() - batch["created"] >= state.batch_delay
+            n = len(batch["requests"])
+            created = datetime.fromtimestamp(batch["created"], timezone.utc)
+            host = self.headers.get("host", "127.0.0.1")
+            return {
+                "id": batch_id,
+                "type": "message_batch",
+                "processing_status": "ended" if ended else "in_progress",
+                "request_counts": {
+                    "processing": 0 if ended else n,
+                    "succeeded": n if ended else 0,
+                    "errored": 0,
+                    "canceled": 0,
+                    "expired": 0,
+                },
+                "created_at": created.isoformat(),
+                "expires_at": (created + timedelta(days=1)).isoformat(),
+                "ended_at": datetime.now(timezone.utc).isoformat() if ended else None,
+                "archived_at": None,
+                "cancel_initiated_at": None,
+                "results_url": (
+                    f"http://{host}/v1/messages/batches/{batch_id}/results"
+                    if ended else None
+                ),
+            }
+
+        def _batch_results(self, batch_id: str):
+            lines = [
+                json.dumps({
+                    "custom_id": req["custom_id"],
+                    "result": {
+                        "type": "succeeded",
+                        "message": self._message(req["params"]),
+                    },
+                })
+                for req in state.batches[batch_id]["requests"]
+            ]
+            payload = ("\n".join(lines) + "\n").encode("utf-8")
+            self.send_response(200)
+            self.send_header("content-type", "application/binary")
+            self.send_header("content-length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path.startswith("/v1/messages/batches/"):
+                parts = path.split("/")
+                batch_id = parts[4]
+                if batch_id not in state.batches:
+                    self._send(404, {"type": "error", "error": {
+                        "type": "not_found_error", "message": batch_id}})
+                elif len(parts) > 5 and parts[5] == "results":
+                    self._batch_results(batch_id)
+                else:
+                    self._send(200, self._batch(batch_id))
+                return
+            with state.lock:
+                stats = {
+                    "requests": state.requests,
+                    "errors": state.errors,
+                    "max_in_flight": state.max_in_flight,
+                    "cached_prefixes": len(state.cached_prefixes),
+                    "cache_reads": state.cache_reads,
+                }
+            self._send(200, stats)
+
+        def do_POST(self):
+            length = int(self.headers.get("content-length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            if self.path.split("?", 1)[0].rstrip("/") == "/v1/messages/batches":
+                batch_id = f"msgbatch_stub_{uuid.uuid4().hex[:12]}"
+                with state.lock:
+                    state.requests += 1
+                    state.batches[batch_id] = {
+                        "created": time.time(),
+                        "requests": request.get("requests", []),
+                    }
+                self._send(200, self._batch(batch_id))
+                return
+
+            with state.lock:
+                state.requests += 1
+                state.in_flight += 1
+                state.max_in_flight = max(state.max_in_flight, state.in_flight)
+                fail = state.rng.random() < state.error_rate
+                status = state.rng.choice(state.error_statuses) if fail else 200
+                if fail:
+                    state.errors += 1
+            try:
+                if status == 200 and request.get("stream"):
+                    self._stream(request)
+                    return
+                time.sleep(state.latency)
+                if status != 200:
+                    error_type = {
+                        429: "rate_limit_error", 529: "overloaded_error",
+                    }.get(status, "api_error")
+                    self._send(status, {
+                        "type": "error",
+                        "error": {"type": error_type, "message": "stub error"},
+                    }, headers={"retry-after": "0.2"})
+                    return
+                self._send(200, self._message(request))
+            finally:
+                with state.lock:
+                    state.in_flight -= 1
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a local stub of the Anthropic Messages API"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8765, help="Port (default: 8765)")
+    parser.add_argument("--latency", type=float, default=0.5,
+                        help="Seconds to wait before each response (default: 0.5)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with an error (default: 0)")
+    parser.add_argument("--error-status", type=int, nargs="+", default=[429, 529],
+                        help="Statuses injected errors are drawn from (default: 429 529)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for error injection")
+    parser.add_argument("--batch-delay", type=float, default=2.0,
+                        help="Seconds until a message batch reports ended (default: 2)")
+    parser.add_argument("--token-interval", type=float, default=0.02,
+                        help="Seconds between streamed text deltas (default: 0.02)")
+    args = parser.parse_args()
+
+    state = StubState(args.latency, args.error_rate, args.seed, args.batch_delay,
+                      args.token_interval, tuple(args.error_status))
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Stub Messages API on http://{args.host}:{args.port} "
+          f"(latency={args.latency}s, error_rate={args.error_rate}); "
+          f"GET / for counters")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
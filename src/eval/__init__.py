@@ -5,4 +5,10 @@ Modules:
     queries.json  — 25 evaluation queries (direct, synthesis, edge-case)
     scorer.py     — LLM-as-judge scoring (groundedness + citation correctness)
     run_eval.py   — Orchestrates evaluation runs and saves results
+    concurrency.py — Rate limiter, retrying client and ordered thread-pool scheduler
+    result_store.py — Content-addressed eval record store (resume, dedup)
+    judge_cache.py — Judge verdict cache and Message Batch submission
+    stage_report.py — Per-stage latency percentiles from the query log traces
+    columnar.py   — Partitioned Parquet export of eval results and query logs
+    columnar_summary.py — Streamed, vectorized compute_summary() over JSONL or Parquet
 """
@@ -0,0 +1,400 @@
+"""
+columnar.py — Partitioned Parquet export of eval results and query logs.
+
+Converts run_eval / score_completeness records and rag_queries.jsonl
+entries into Parquet datasets with an explicit schema, so months of logs
+can be scanned column by column instead of re-parsed as JSON:
+
+  - Scores, failure tags, timings and token usage become flat columns
+    (e.g. groundedness_score, input_tokens, total_seconds, generate_ms).
+  - Chunk lists become nested list<struct> columns (retrieved_chunks,
+    reranked_chunks), and trace spans a list<struct> "spans" column.
+  - Rows are partitioned Hive-style by UTC date (date=YYYY-MM-DD/) unless
+    --partition-by says otherwise.
+
+Input is streamed: lines are converted and written in record batches of
+--batch-size rows, so memory does not grow with the log. Query logs are
+read together with their rotated (and compressed) LogSink segments.
+Compact chunk references (src.rag.chunk_store) are kept as they are, with
+their text_hash / preview_hash columns set and the text columns null.
+
+Needs the optional pyarrow package (pip install pyarrow).
+
+Usage:
+    python -m src.eval.columnar --input logs/eval_results_v2.jsonl --output logs/parquet/eval
+    python -m src.eval.columnar --input logs/rag_queries.jsonl --output logs/parquet/queries
+
+    # Partition eval results by mode as well as date
+    python -m src.eval.columnar --input logs/eval_results_v2.jsonl \
+        --output logs/parquet/eval --partition-by date mode
+
+Reading back:
+    import pyarrow.dataset as ds
+    from src.eval.columnar import open_dataset
+    table = open_dataset("logs/parquet/eval", "eval").to_table(
+        columns=["mode", "category", "groundedness_score"],
+        filter=ds.field("date") >= "2026-02-01",
+    )
+"""
+
+import argparse
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from src.rag.log_sink import iter_log_entries
+from src.rag.tracing import STAGES, stage_durations
+
+KINDS = ("eval", "query")
+
+DEFAULT_BATCH_SIZE = 10_000
+
+# Usage keys of a generation; eval records keep them under generation_tokens
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
+JUDGE_TOKEN_FIELDS = ("input", "output", "cache_write", "cache_read")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "Parquet export needs the optional pyarrow package: pip install pyarrow"
+        ) from e
+    return pyarrow
+
+
+def eval_schema():
+    """Arrow schema of an exported eval record."""
+    pa = _require_pyarrow()
+    chunk = pa.struct([
+        ("source_id", pa.string()),
+        ("chunk_id", pa.string()),
+        ("section_title", pa.string()),
+        ("text_preview", pa.string()),
+        ("preview_hash", pa.string()),
+        ("distance", pa.float64()),
+        ("rerank_score", pa.float64()),
+    ])
+    return pa.schema([
+        ("date", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("run_key", pa.string()),
+        ("query_id", pa.string()),
+        ("category", pa.string()),
+        ("sub_question", pa.int32()),
+        ("query", pa.string()),
+        ("expected_sources", pa.list_(pa.string())),
+        ("notes", pa.string()),
+        ("mode", pa.string()),
+        ("use_reranker", pa.bool_()),
+        ("model", pa.string()),
+        ("prompt_version", pa.string()),
+        ("judge_model", pa.string()),
+        ("corpus_hash", pa.string()),
+        ("retrieval_mode", pa.string()),
+        ("n_retrieve", pa.int32()),
+        ("n_rerank", pa.int32()),
+        ("chunk_format", pa.string()),
+        ("answer", pa.string()),
+        ("retrieved_chunks", pa.list_(chunk)),
+        ("reranked_chunks", pa.list_(chunk)),
+        *[(f"generation_{f}", pa.int64()) for f in USAGE_FIELDS],
+        ("generation_cache_status", pa.string()),
+        ("elapsed_seconds", pa.float64()),
+        ("groundedness_score", pa.int32()),
+        ("groundedness_rationale", pa.string()),
+        ("citation_score", pa.int32()),
+        ("citation_rationale", pa.string()),
+        ("failure_tags", pa.list_(pa.string())),
+        *[(f"judge_{f}_tokens", pa.int64()) for f in JUDGE_TOKEN_FIELDS],
+        ("retrieval_recall", pa.float64()),
+        ("context_utilization", pa.float64()),
+        ("completeness_score", pa.int32()),
+        ("completeness_rationale", pa.string()),
+        ("error", pa.string()),
+    ])
+
+
+def query_schema():
+    """Arrow schema of an exported query log entry."""
+    pa = _require_pyarrow()
+    retrieved_chunk = pa.struct([
+        ("id", pa.string()),
+        ("source_id", pa.string()),
+        ("chunk_id", pa.string()),
+        ("section_title", pa.string()),
+        ("distance", pa.float64()),
+        ("rerank_score", pa.float64()),
+    ])
+    reranked_chunk = pa.struct([
+        ("id", pa.string()),
+        ("source_id", pa.string()),
+        ("chunk_id", pa.string()),
+        ("section_title", pa.string()),
+        ("year", pa.int32()),
+        ("authors", pa.string()),
+        ("distance", pa.float64()),
+        ("rerank_score", pa.float64()),
+        ("text", pa.string()),
+        ("text_hash", pa.string()),
+    ])
+    span = pa.struct([
+        ("name", pa.string()),
+        ("start_ms", pa.float64()),
+        ("duration_ms", pa.float64()),
+    ])
+    return pa.schema([
+        ("date", pa.string()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("query", pa.string()),
+        ("model", pa.string()),
+        ("prompt_version", pa.string()),
+        ("corpus_hash", pa.string()),
+        ("chunk_format", pa.string()),
+        ("n_retrieved", pa.int32()),
+        ("n_reranked", pa.int32()),
+        ("retrieved_chunks", pa.list_(retrieved_chunk)),
+        ("reranked_chunks", pa.list_(reranked_chunk)),
+        ("answer", pa.string()),
+        *[(f, pa.int64()) for f in USAGE_FIELDS],
+        ("response_cache_status", pa.string()),
+        ("response_cache_age_seconds", pa.float64()),
+        ("time_to_first_token_seconds", pa.float64()),
+        ("total_seconds", pa.float64()),
+        ("streamed", pa.bool_()),
+        ("trace_id", pa.string()),
+        *[(f"{stage}_ms", pa.float64()) for stage in STAGES],
+        ("spans", pa.list_(span)),
+        ("metadata", pa.string()),
+    ])
+
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def _int_or_none(value) -> Optional[int]:
+    # sub_question is "" when queries.json has none; scores are ints or None
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
+def eval_row(record: dict) -> dict:
+    """Flatten one eval record into a row of eval_schema()."""
+    usage = record.get("generation_tokens") or {}
+    judge = record.get("judge_tokens") or {}
+    return {
+        "date": (record.get("timestamp") or "")[:10] or None,
+        "timestamp": _timestamp(record.get("timestamp")),
+        "run_key": record.get("run_key"),
+        "query_id": record.get("query_id"),
+        "category": record.get("category"),
+        "sub_question": _int_or_none(record.get("sub_question")),
+        "query": record.get("query"),
+        "expected_sources": record.get("expected_sources"),
+        "notes": record.get("notes"),
+        "mode": "rerank" if record.get("use_reranker") else "baseline",
+        "use_reranker": record.get("use_reranker"),
+        "model": record.get("model"),
+        "prompt_version": record.get("prompt_version"),
+        "judge_model": record.get("judge_model"),
+        "corpus_hash": record.get("corpus_hash"),
+        "retrieval_mode": record.get("retrieval_mode"),
+        "n_retrieve": record.get("n_retrieve"),
+        "n_rerank": record.get("n_rerank"),
+        "chunk_format": record.get("chunk_format"),
+        "answer": record.get("answer"),
+        "retrieved_chunks": record.get("retrieved_chunks"),
+        "reranked_chunks": record.get("reranked_chunks"),
+        **{f"generation_{f}": usage.get(f) for f in USAGE_FIELDS},
+        "generation_cache_status": (record.get("generation_cache") or {}).get("status"),
+        "elapsed_seconds": record.get("elapsed_seconds"),
+        "groundedness_score": _int_or_none(record.get("groundedness_score")),
+        "groundedness_rationale": record.get("groundedness_rationale"),
+        "citation_score": _int_or_none(record.get("citation_score")),
+        "citation_rationale": record.get("citation_rationale"),
+        "failure_tags": record.get("failure_tags"),
+        **{f"judge_{f}_tokens": judge.get(f) for f in JUDGE_TOKEN_FIELDS},
+        "retrieval_recall": record.get("retrieval_recall"),
+        "context_utilization": record.get("context_utilization"),
+        "completeness_score": _int_or_none(record.get("completeness_score")),
+        "completeness_rationale": record.get("completeness_rationale"),
+        "error": record.get("error"),
+    }
+
+
+def query_row(entry: dict) -> dict:
+    """Flatten one query log entry into a row of query_schema()."""
+    generation = entry.get("generation", {})
+    usage = generation.get("usage") or {}
+    cache = generation.get("cache") or {}
+    timing = entry.get("timing") or {}
+    trace = entry.get("trace")
+    stages = stage_durations(trace) if trace else {}
+    return {
+        "date": (entry.get("timestamp") or "")[:10] or None,
+        "timestamp": _timestamp(entry.get("timestamp")),
+        "query": entry.get("query"),
+        "model": generation.get("model"),
+        "prompt_version": generation.get("prompt_version"),
+        "corpus_hash": entry.get("corpus_hash"),
+        "chunk_format": entry.get("chunk_format"),
+        "n_retrieved": entry.get("retrieval", {}).get("n_retrieved"),
+        "n_reranked": entry.get("reranking", {}).get("n_reranked"),
+        "retrieved_chunks": entry.get("retrieval", {}).get("chunks"),
+        "reranked_chunks": entry.get("reranking", {}).get("chunks"),
+        "answer": generation.get("answer"),
+        **{f: usage.get(f) for f in USAGE_FIELDS},
+        "response_cache_status": cache.get("status"),
+        "response_cache_age_seconds": cache.get("age_seconds"),
+        "time_to_first_token_seconds": timing.get("time_to_first_token_seconds"),
+        "total_seconds": timing.get("total_seconds"),
+        "streamed": timing.get("streamed"),
+        "trace_id": trace.get("trace_id") if trace else None,
+        **{f"{stage}_ms": stages.get(stage) for stage in STAGES},
+        "spans": trace.get("spans") if trace else None,
+        "metadata": json.dumps(entry["metadata"]) if entry.get("metadata") else None,
+    }
+
+
+def iter_jsonl(path: str | Path) -> Iterator[dict]:
+    """Records of a JSONL file, one at a time."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def detect_kind(path: str | Path) -> str:
+    """"eval" if the first line of a log is an eval record, else "query"."""
+    for item in iter_log_entries(path):
+        return "eval" if "query_id" in item else "query"
+    return "query"
+
+
+def iter_batches(items: Iterable[dict], kind: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Arrow RecordBatches of up to batch_size rows from records or log entries."""
+    pa = _require_pyarrow()
+    schema = eval_schema() if kind == "eval" else query_schema()
+    to_row = eval_row if kind == "eval" else query_row
+    rows = []
+    for item in items:
+        rows.append(to_row(item))
+        if len(rows) >= batch_size:
+            yield pa.RecordBatch.from_pylist(rows, schema=schema)
+            rows = []
+    if rows:
+        yield pa.RecordBatch.from_pylist(rows, schema=schema)
+
+
+def export_parquet(
+    input_path: str | Path,
+    output_dir: str | Path,
+    kind: Optional[str] = None,
+    partition_by: Iterable[str] = ("date",),
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict:
+    """Convert a JSONL eval results file or query log to a Parquet dataset.
+
+    Partitions that receive rows are replaced, so re-exporting a log is
+    idempotent; other partitions already in output_dir are kept.
+
+    Args:
+        input_path: eval results JSONL, or the live query log (rotated
+                    segments are included).
+        output_dir: Dataset directory (Hive-style partition subdirectories).
+        kind: "eval" or "query"; detected from the first line if None.
+        partition_by: Partition columns (default: date).
+        batch_size: Rows converted and written per record batch.
+
+    Returns:
+        Dict with kind, rows, files and bytes written.
+    """
+    _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    kind = kind or detect_kind(input_path)
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind {kind!r}; expected one of {KINDS}")
+    schema = eval_schema() if kind == "eval" else query_schema()
+    partition_by = list(partition_by)
+    unknown = [c for c in partition_by if c not in schema.names]
+    if unknown:
+        raise ValueError(f"Unknown partition column(s) {unknown} for {kind} records")
+
+    items = iter_jsonl(input_path) if kind == "eval" else iter_log_entries(input_path)
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        for batch in iter_batches(items, kind, batch_size):
+            rows += batch.num_rows
+            yield batch
+
+    written = []
+    ds.write_dataset(
+        counted(),
+        output_dir,
+        schema=schema,
+        format="parquet",
+        partitioning=partition_by or None,
+        partitioning_flavor="hive",
+        existing_data_behavior="delete_matching",
+        basename_template=f"{kind}-{{i}}.parquet",
+        file_visitor=lambda f: written.append(f.path),
+    )
+    return {
+        "kind": kind,
+        "rows": rows,
+        "files": len(written),
+        "bytes": sum(Path(p).stat().st_size for p in written),
+    }
+
+
+def open_dataset(path: str | Path, kind: str, partition_by: Iterable[str] = ("date",)):
+    """pyarrow Dataset over an export, with partition columns typed by the schema."""
+    pa = _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    schema = eval_schema() if kind == "eval" else query_schema()
+    partitioning = ds.partitioning(
+        schema=pa.schema([schema.field(c) for c in partition_by]),
+        flavor="hive",
+    )
+    return ds.dataset(path, schema=schema, format="parquet", partitioning=partitioning)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export eval results or a query log to partitioned Parquet"
+    )
+    parser.add_argument("--input", required=True,
+                        help="Eval results JSONL or query log (rotated segments included)")
+    parser.add_argument("--output", required=True,
+                        help="Parquet dataset directory")
+    parser.add_argument("--kind", choices=KINDS, default=None,
+                        help="Record kind (default: detected from the first line)")
+    parser.add_argument("--partition-by", nargs="*", default=["date"],
+                        help="Partition columns (default: date; none for a flat dataset)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Rows per record batch (default: {DEFAULT_BATCH_SIZE})")
+    args = parser.parse_args()
+
+    stats = export_parquet(
+        args.input, args.output, kind=args.kind,
+        partition_by=args.partition_by, batch_size=args.batch_size,
+    )
+    source_bytes = Path(args.input).stat().st_size
+    print(f"Exported {stats['rows']} {stats['kind']} rows from {args.input} "
+          f"({source_bytes / 1e6:.2f} MB) to {args.output}: {stats['files']} files, "
+          f"{stats['bytes'] / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
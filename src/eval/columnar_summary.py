@@ -0,0 +1,282 @@
+"""
+columnar_summary.py — compute_summary() statistics, streamed and vectorized.
+
+score_completeness.compute_summary() needs every record in memory as a
+dict and aggregates with Python loops per mode and category. This module
+computes the same summary dict from a stream of column batches:
+
+  - Parquet datasets written by src.eval.columnar are scanned with
+    pyarrow.dataset, reading only the seven columns the summary uses.
+  - Eval results JSONL is read line by line and converted to NumPy
+    arrays batch_size records at a time (no pyarrow needed).
+
+Each batch is reduced with np.bincount over a (mode, category) group
+index, into running per-group counts and sums, so memory is bounded by
+the batch size rather than the input size. Null scores (e.g. error
+records, unscored runs) are left out of the averages they would enter.
+
+The same accumulator also takes single records (add_record) and
+round-trips through JSON (state / from_state); score_completeness
+--stream uses it to checkpoint its running summary.
+
+Usage:
+    python -m src.eval.columnar_summary --input logs/eval_results_v2.jsonl
+    python -m src.eval.columnar_summary --input logs/parquet/eval --output summary.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+from src.eval.columnar import DEFAULT_BATCH_SIZE, iter_jsonl, open_dataset
+
+# Categories reported in by_category, in compute_summary() order
+CATEGORIES = ("direct", "synthesis", "edge_case")
+
+# (record field, summary key)
+METRICS = (
+    ("groundedness_score", "avg_groundedness"),
+    ("citation_score", "avg_citation"),
+    ("retrieval_recall", "avg_retrieval_recall"),
+    ("context_utilization", "avg_context_utilization"),
+    ("completeness_score", "avg_completeness"),
+)
+SUMMARY_COLUMNS = ("use_reranker", "category") + tuple(f for f, _ in METRICS)
+
+# Row 0 of the accumulators is baseline (use_reranker False), row 1 rerank
+MODES = ("baseline", "rerank")
+
+
+def _as_float(values: list) -> np.ndarray:
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def iter_jsonl_columns(path: str | Path, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[dict]:
+    """Summary columns of an eval results JSONL, batch_size records at a time.
+
+    Yields:
+        Dict with "reranked" (bool array), "category" (str array) and one
+        float64 array per metric, NaN where the record has no value.
+    """
+    records = iter_jsonl(path)
+    while True:
+        batch = [r for _, r in zip(range(batch_size), records)]
+        if not batch:
+            return
+        columns = {
+            "reranked": np.array([bool(r.get("use_reranker")) for r in batch]),
+            "category": np.array([r.get("category") or "" for r in batch]),
+        }
+        for field, _ in METRICS:
+            columns[field] = _as_float([r.get(field) for r in batch])
+        yield columns
+
+
+def iter_parquet_columns(path: str | Path, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[dict]:
+    """Summary columns of an exported eval dataset (src.eval.columnar)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    dataset = open_dataset(path, "eval")
+    for batch in dataset.to_batches(columns=list(SUMMARY_COLUMNS), batch_size=batch_size):
+        if batch.num_rows == 0:
+            continue
+        columns = {
+            "reranked": pc.fill_null(batch.column("use_reranker"), False)
+                          .to_numpy(zero_copy_only=False),
+            "category": pc.fill_null(batch.column("category"), "")
+                          .to_numpy(zero_copy_only=False),
+        }
+        for field, _ in METRICS:
+            # Nulls become NaN in the float64 cast
+            columns[field] = pc.cast(batch.column(field), pa.float64()) \
+                               .to_numpy(zero_copy_only=False)
+        yield columns
+
+
+def iter_columns(path: str | Path, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[dict]:
+    """Column batches from a Parquet dataset (directory or .parquet) or a JSONL file."""
+    path = Path(path)
+    if path.is_dir() or path.suffix == ".parquet":
+        return iter_parquet_columns(path, batch_size)
+    return iter_jsonl_columns(path, batch_size)
+
+
+class SummaryAccumulator:
+    """Running per-(mode, category) counts and metric sums."""
+
+    def __init__(self):
+        self.categories: list[str] = []
+        self._index: dict[str, int] = {}
+        self.total = 0
+        self.n = np.zeros((2, 0), dtype=np.int64)
+        self.sums = {field: np.zeros((2, 0)) for field, _ in METRICS}
+        self.counts = {field: np.zeros((2, 0), dtype=np.int64) for field, _ in METRICS}
+
+    def add(self, columns: dict):
+        """Fold one column batch (see iter_jsonl_columns) into the totals."""
+        names, codes = np.unique(columns["category"], return_inverse=True)
+        to_global = np.array([self._column(name) for name in names], dtype=np.int64)
+        n_cat = len(self.categories)
+
+        # Flat group id: mode row * n_cat + global category index
+        group = columns["reranked"].astype(np.int64) * n_cat + to_global[codes.ravel()]
+        size = 2 * n_cat
+
+        self.total += len(group)
+        self.n += np.bincount(group, minlength=size).reshape(2, n_cat)
+        for field, _ in METRICS:
+            values = columns[field]
+            valid = ~np.isnan(values)
+            self.counts[field] += np.bincount(group[valid], minlength=size).reshape(2, n_cat)
+            self.sums[field] += np.bincount(
+                group[valid], weights=values[valid], minlength=size
+            ).reshape(2, n_cat)
+
+    def add_record(self, record: dict):
+        """Fold one eval record into the totals."""
+        row = 1 if record.get("use_reranker") else 0
+        col = self._column(record.get("category") or "")
+        self.total += 1
+        self.n[row, col] += 1
+        for field, _ in METRICS:
+            value = record.get(field)
+            if value is not None:
+                self.sums[field][row, col] += value
+                self.counts[field][row, col] += 1
+
+    def state(self) -> dict:
+        """JSON-serializable totals (see from_state)."""
+        return {
+            "categories": list(self.categories),
+            "total": self.total,
+            "n": self.n.tolist(),
+            "sums": {field: a.tolist() for field, a in self.sums.items()},
+            "counts": {field: a.tolist() for field, a in self.counts.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "SummaryAccumulator":
+        """Accumulator restored from state()."""
+        acc = cls()
+        for name in state["categories"]:
+            acc._column(name)
+        acc.total = state["total"]
+        shape = (2, len(acc.categories))
+        acc.n = np.array(state["n"], dtype=np.int64).reshape(shape)
+        for field, _ in METRICS:
+            acc.sums[field] = np.array(state["sums"][field], dtype=np.float64).reshape(shape)
+            acc.counts[field] = np.array(state["counts"][field], dtype=np.int64).reshape(shape)
+        return acc
+
+    def _column(self, name: str) -> int:
+        """Column of a category, added on first sight."""
+        if name not in self._index:
+            self._index[name] = len(self.categories)
+            self.categories.append(name)
+            self._grow(len(self.categories))
+        return self._index[name]
+
+    def _grow(self, n_cat: int):
+        extra = n_cat - self.n.shape[1]
+        if extra <= 0:
+            return
+        pad = ((0, 0), (0, extra))
+        self.n = np.pad(self.n, pad)
+        for field, _ in METRICS:
+            self.sums[field] = np.pad(self.sums[field], pad)
+            self.counts[field] = np.pad(self.counts[field], pad)
+
+    def _avg(self, field: str, row: int, cols) -> Optional[float]:
+        count = int(self.counts[field][row, cols].sum())
+        if not count:
+            return None
+        return round(float(self.sums[field][row, cols].sum()) / count, 2)
+
+    def summary(self, dry_run: bool = False) -> dict:
+        """The compute_summary() dict for everything added so far."""
+        summary = {"total_runs": self.total, "modes": {}}
+        all_cols = slice(None)
+        for mode in ("rerank", "baseline"):
+            row = MODES.index(mode)
+            mode_stats = {"n": int(self.n[row].sum()), "by_category": {}}
+
+            for cat in CATEGORIES:
+                col = self._index.get(cat)
+                if col is None or not self.n[row, col]:
+                    continue
+                stats = {
+                    "n": int(self.n[row, col]),
+                    "avg_groundedness": self._avg("groundedness_score", row, col),
+                    "avg_citation": self._avg("citation_score", row, col),
+                }
+                if self.counts["retrieval_recall"][row, col]:
+                    stats["avg_retrieval_recall"] = self._avg("retrieval_recall", row, col)
+                    stats["n_retrieval_recall"] = int(self.counts["retrieval_recall"][row, col])
+                if self.counts["context_utilization"][row, col]:
+                    stats["avg_context_utilization"] = self._avg("context_utilization", row, col)
+                if not dry_run and self.counts["completeness_score"][row, col]:
+                    stats["avg_completeness"] = self._avg("completeness_score", row, col)
+                mode_stats["by_category"][cat] = stats
+
+            mode_stats["overall"] = {
+                key: self._avg(field, row, all_cols)
+                for field, key in METRICS if field != "completeness_score"
+            }
+            if not dry_run and self.counts["completeness_score"][row].sum():
+                mode_stats["overall"]["avg_completeness"] = self._avg(
+                    "completeness_score", row, all_cols
+                )
+
+            summary["modes"][mode] = mode_stats
+        return summary
+
+
+def summarize_batches(batches: Iterable[dict], dry_run: bool = False) -> dict:
+    """compute_summary() over column batches."""
+    acc = SummaryAccumulator()
+    for columns in batches:
+        acc.add(columns)
+    return acc.summary(dry_run)
+
+
+def summarize(path: str | Path, dry_run: bool = False,
+              batch_size: int = DEFAULT_BATCH_SIZE) -> dict:
+    """compute_summary() of a Parquet export or eval results JSONL, streamed."""
+    return summarize_batches(iter_columns(path, batch_size), dry_run)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Eval summary statistics from JSONL or a Parquet export, streamed"
+    )
+    parser.add_argument("--input", default="logs/eval_results_v2.jsonl",
+                        help="Eval results JSONL, or a Parquet dataset directory "
+                             "(default: logs/eval_results_v2.jsonl)")
+    parser.add_argument("--output", default=None,
+                        help="Also write the summary as JSON to this path")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Leave out completeness averages (as score_completeness --dry-run)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Records per batch (default: {DEFAULT_BATCH_SIZE})")
+    args = parser.parse_args()
+
+    summary = summarize(args.input, dry_run=args.dry_run, batch_size=args.batch_size)
+    summary["source_file"] = args.input
+
+    from src.eval.score_completeness import print_summary
+
+    print_summary(summary, args.dry_run)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nSummary saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+concurrency.py — Bounded-parallel scheduling for eval API calls.
+
+Generation and judge calls are network-bound, so the eval runner can
+overlap them in a thread pool. This module provides the three pieces it
+needs:
+
+  - TokenBucket: client-side request rate limiter shared by all workers.
+  - ThrottledClient: wraps an Anthropic client so every messages.create()
+    call waits on the bucket and retries transient failures (the ones the
+    SDK's own retries cover: connection errors and timeouts, 408, 409,
+    429, 5xx and 529) with exponential backoff and jitter.
+  - run_ordered: runs tasks on N threads but hands results back in
+    submission order, so JSONL output is deterministic.
+
+The CPU-bound stages (embedding, reranking) stay on the one shared
+RAGPipeline, which serializes its model calls.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Iterable, Optional
+
+import anthropic
+
+
+# HTTP statuses worth retrying besides 5xx: request timeout, conflict, rate limited
+RETRYABLE_STATUS = (408, 409, 429)
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting calls to `rate` per second.
+
+    Up to `capacity` calls may burst before the steady rate applies.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate: Tokens added per second.
+            capacity: Maximum stored tokens (default: max(1, rate)).
+        """
+        if rate <= 0:
+            raise ValueError(f"rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float) -> "TokenBucket":
+        """Bucket allowing `requests_per_minute` calls per minute."""
+        return cls(rate=requests_per_minute / 60.0)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Block until `tokens` are available, then consume them.
+
+        Returns:
+            Seconds spent waiting.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._last) * self.rate
+                )
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def is_retryable(exc: Exception) -> bool:
+    """True for API errors that should be retried after a backoff.
+
+    Matches the SDK's own retry policy, which ThrottledClient replaces:
+    connection errors (including timeouts), 408/409/429 and any 5xx
+    (529 overloaded included).
+    """
+    if isinstance(exc, anthropic.APIConnectionError):  # includes APITimeoutError
+        return True
+    return isinstance(exc, anthropic.APIStatusError) and (
+        exc.status_code in RETRYABLE_STATUS or exc.status_code >= 500
+    )
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    """Server-suggested delay from a retry-after header, if present."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class _ThrottledMessages:
+    """messages namespace of ThrottledClient."""
+
+    def __init__(self, owner: "ThrottledClient"):
+        self._owner = owner
+
+    def create(self, **kwargs):
+        return self._owner.call(self._owner.client.messages.create, **kwargs)
+
+
+class ThrottledClient:
+    """Anthropic client wrapper adding rate limiting and retry with backoff.
+
+    Exposes messages.create() with the same signature as the wrapped
+    client, so it can be passed anywhere a client is expected (generate(),
+    score_response(), RAGPipeline). The wrapped client should be created
+    with max_retries=0 so retries are not compounded.
+
+    Example:
+        client = ThrottledClient(get_client(max_retries=0),
+                                 limiter=TokenBucket.per_minute(50))
+        response = client.messages.create(model=..., messages=...)
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        limiter: Optional[TokenBucket] = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+    ):
+        """
+        Args:
+            client: Anthropic client (or anything with messages.create()).
+            limiter: Shared TokenBucket; None disables rate limiting.
+            max_retries: Retries per call on retryable errors before re-raising.
+            base_delay: First backoff delay in seconds (doubled per retry).
+            max_delay: Upper bound on a single backoff delay.
+        """
+        self.client = client
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.messages = _ThrottledMessages(self)
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+
+    def call(self, fn: Callable, *args, **kwargs):
+        """Call fn under the rate limiter, retrying retryable API errors."""
+        attempt = 0
+        while True:
+            waited = self.limiter.acquire() if self.limiter else 0.0
+            with self._lock:
+                self.calls += 1
+                self.wait_seconds += waited
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+                    delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                reason = getattr(e, "status_code", None) or type(e).__name__
+                print(f"  API returned {reason}; retry {attempt}/"
+                      f"{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def stats(self) -> dict:
+        """Call, retry and rate-limit wait counters."""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "wait_seconds": round(self.wait_seconds, 2),
+            }
+
+
+def run_ordered(
+    tasks: Iterable,
+    fn: Callable,
+    concurrency: int = 1,
+) -> Iterable[tuple[int, Any, Any]]:
+    """Run fn over tasks on up to `concurrency` threads, yielding in order.
+
+    Results are yielded as (index, task, result) strictly in task order,
+    each as soon as it and every task before it have finished, so callers
+    can append to a file incrementally and still get deterministic output.
+    With concurrency=1 tasks run sequentially on the calling thread.
+
+    Exceptions raised by fn propagate when their result is reached.
+    """
+    tasks = list(tasks)
+    if concurrency <= 1:
+        for i, task in enumerate(tasks):
+            yield i, task, fn(task)
+        return
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(fn, task): i for i, task in enumerate(tasks)}
+        done: dict[int, Any] = {}
+        next_idx = 0
+        for future in as_completed(futures):
+            done[futures[future]] = future
+            while next_idx in done:
+                yield next_idx, tasks[next_idx], done.pop(next_idx).result()
+                next_idx += 1
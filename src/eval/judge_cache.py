@@ -0,0 +1,188 @@
+"""
+judge_cache.py — Cache of LLM-as-judge results, plus Message Batch submission.
+
+The judge prompt is a pure function of the rubric, the query, the answer
+and the chunks shown to the judge, so rescoring an unchanged answer (e.g.
+when only summaries are regenerated) can reuse the earlier verdict.
+JudgeCache keys results on:
+
+    (judge model, rubric version, query, sha256(answer), ordered chunk ids)
+
+Chunk ids are composite source_id::chunk_id. Bump the judge's
+RUBRIC_VERSION whenever its prompt changes.
+
+run_batch() submits many judge requests as one Anthropic Message Batch
+and polls until every result is back, so a full rescoring run is one round
+of batched work instead of hundreds of serial calls.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from src.rag.rerank_cache import chunk_key_id
+
+
+class JudgeCache:
+    """SQLite-backed judge result cache (in-memory unless db_path is given)."""
+
+    def __init__(self, db_path: Optional[str | Path] = None):
+        """
+        Args:
+            db_path: Optional SQLite file so verdicts survive across runs.
+        """
+        self.db_path = Path(db_path) if db_path else None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            str(self.db_path) if self.db_path else ":memory:",
+            check_same_thread=False,
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS judge_results ("
+            " key TEXT PRIMARY KEY,"
+            " judge_model TEXT NOT NULL,"
+            " rubric_version TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(
+        judge_model: str,
+        rubric_version: str,
+        query: str,
+        answer: str,
+        chunks: list[dict],
+    ) -> str:
+        """Hash of everything the judge sees (64-char hex)."""
+        payload = json.dumps(
+            {
+                "judge_model": judge_model,
+                "rubric_version": rubric_version,
+                "query": query,
+                "answer_sha256": hashlib.sha256(answer.encode("utf-8")).hexdigest(),
+                "chunk_ids": [chunk_key_id(c) for c in chunks],
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Cached result for a key, or None. Updates hit/miss counters."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM judge_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, result: dict, judge_model: str, rubric_version: str):
+        """Store a judge result."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO judge_results "
+                "(key, judge_model, rubric_version, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, judge_model, rubric_version,
+                 json.dumps(result, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the number of stored results."""
+        with self._lock:
+            (entries,) = self._conn.execute(
+                "SELECT COUNT(*) FROM judge_results"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self):
+        """Drop every cached result and reset counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM judge_results")
+            self._conn.commit()
+            self.hits = self.misses = 0
+
+    def close(self):
+        """Close the SQLite connection."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def run_batch(
+    client: Any,
+    requests: list[dict],
+    poll_interval: float = 30.0,
+    timeout: Optional[float] = None,
+) -> list[Any]:
+    """Run messages.create() params as one Message Batch and wait for results.
+
+    Args:
+        client: Anthropic client (needs messages.batches).
+        requests: messages.create() keyword dicts, one per request.
+        poll_interval: Seconds between status checks.
+        timeout: Give up (TimeoutError) after this many seconds; None waits
+                 for the batch to end (batches expire server-side after 24h).
+
+    Returns:
+        One entry per request, in order: the Message on success, otherwise
+        a RuntimeError describing the errored/canceled/expired result.
+    """
+    if not requests:
+        return []
+
+    batch = client.messages.batches.create(
+        requests=[
+            {"custom_id": f"req-{i}", "params": params}
+            for i, params in enumerate(requests)
+        ]
+    )
+    print(f"  Submitted batch {batch.id} ({len(requests)} requests)")
+
+    start = time.time()
+    while batch.processing_status != "ended":
+        if timeout is not None and time.time() - start > timeout:
+            raise TimeoutError(
+                f"Batch {batch.id} still {batch.processing_status} after {timeout:.0f}s"
+            )
+        time.sleep(poll_interval)
+        batch = client.messages.batches.retrieve(batch.id)
+        counts = batch.request_counts
+        print(f"  Batch {batch.id}: {batch.processing_status} "
+              f"({counts.succeeded} succeeded, {counts.errored} errored, "
+              f"{counts.processing} processing)")
+
+    results: list[Any] = [
+        RuntimeError("no result returned for request") for _ in requests
+    ]
+    for entry in client.messages.batches.results(batch.id):
+        idx = int(entry.custom_id.split("-", 1)[1])
+        if entry.result.type == "succeeded":
+            results[idx] = entry.result.message
+        else:
+            detail = getattr(entry.result, "error", None)
+            results[idx] = RuntimeError(
+                f"batch request {entry.result.type}" + (f": {detail}" if detail else "")
+            )
+    return results
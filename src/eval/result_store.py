@@ -0,0 +1,184 @@
+"""
+result_store.py — Content-addressed store of eval records for resumable runs.
+
+Every eval run is identified by a key derived from everything that
+determines its result:
+
+    (query_id, mode, generation model, prompt_version, judge_model, corpus hash,
+     retrieval_mode, n_retrieve, n_rerank)
+
+The store is the eval output JSONL itself. Records carry their run_key,
+and on load the latest record per key wins, so a rerun never produces
+duplicates in the deduplicated view. compact() rewrites the file with one
+line per key.
+
+Example:
+    store = ResultStore("logs/eval_results.jsonl")
+    key = run_key("D01", "rerank", "claude-sonnet-4-5", "v1.0", "claude-opus-4-6", "ab12...",
+                  "dense", 20, 10)
+    if store.status(key) != "ok":
+        ...run and score...
+        store.add(record)
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Optional
+
+
+# Fields hashed into run_key, in order
+KEY_FIELDS = (
+    "query_id", "mode", "model", "prompt_version", "judge_model", "corpus_hash",
+    "retrieval_mode", "n_retrieve", "n_rerank",
+)
+
+
+def run_key(
+    query_id: str,
+    mode: str,
+    model: str,
+    prompt_version: str,
+    judge_model: Optional[str],
+    corpus_hash: Optional[str],
+    retrieval_mode: str,
+    n_retrieve: int,
+    n_rerank: int,
+) -> str:
+    """Stable 16-char key for one eval run.
+
+    judge_model is None for unscored (--no-score) runs and corpus_hash is
+    None when the collection has no ingest state file. The retrieval
+    settings are part of the key, so dense and hybrid runs (or different
+    candidate pools) written to one file never replace each other.
+    """
+    values = (query_id, mode, model, prompt_version, judge_model, corpus_hash,
+              retrieval_mode, n_retrieve, n_rerank)
+    payload = json.dumps(dict(zip(KEY_FIELDS, values)), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class ResultStore:
+    """Eval records keyed by run_key, backed by an append-only JSONL file.
+
+    Records without a run_key (written before the store existed) are kept
+    as-is and never deduplicated or skipped.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._records: dict[str, dict] = {}
+        self._legacy: list[dict] = []
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        self._repair_tail()
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Corrupt line inside the file (a partial tail was repaired above)
+                    continue
+                key = record.get("run_key")
+                if key:
+                    # Latest record wins; position stays where the key first appeared
+                    self._records[key] = record
+                else:
+                    self._legacy.append(record)
+
+    def _repair_tail(self):
+        """End the file with a newline before anything is appended to it.
+
+        A crash mid-write can leave a last line without its newline, and
+        the next append would be glued onto it and lost with it. A last
+        line that parses is kept and terminated; a partial one is cut off.
+        """
+        with open(self.path, "rb+") as f:
+            size = f.seek(0, 2)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+
+            # Start of the last line: just after the last newline, if any
+            start = 0
+            pos = size
+            while pos > 0:
+                step = min(64 * 1024, pos)
+                pos -= step
+                f.seek(pos)
+                newline = f.read(step).rfind(b"\n")
+                if newline != -1:
+                    start = pos + newline + 1
+                    break
+
+            f.seek(start)
+            try:
+                json.loads(f.read())
+            except ValueError:  # JSONDecodeError and UnicodeDecodeError
+                f.truncate(start)
+                print(f"  Removed a truncated last line ({size - start} bytes) from {self.path}")
+            else:
+                f.write(b"\n")
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._records
+
+    def get(self, key: str) -> Optional[dict]:
+        """Latest record for a key, or None."""
+        return self._records.get(key)
+
+    def status(self, key: str) -> Optional[str]:
+        """Return "ok", "error", "pending", or None if the key has never run.
+
+        "pending" is a generated answer still waiting for its judge scores
+        (run_eval --judge-batch stores it before the batch is submitted).
+        """
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if "error" in record:
+            return "error"
+        return "pending" if record.get("judge_pending") else "ok"
+
+    def add(self, record: dict):
+        """Append a record (must carry run_key) and make it the latest for its key."""
+        key = record["run_key"]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._records[key] = record
+
+    def records(self, keys: Optional[list[str]] = None) -> list[dict]:
+        """Deduplicated records, optionally restricted to (and ordered by) keys."""
+        if keys is None:
+            return list(self._records.values())
+        return [self._records[k] for k in keys if k in self._records]
+
+    def compact(self) -> int:
+        """Rewrite the file with one line per key (atomic temp + rename).
+
+        Returns:
+            Number of superseded lines removed.
+        """
+        if not self.path.exists():
+            return 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            n_lines = sum(1 for line in f if line.strip())
+        kept = self._legacy + list(self._records.values())
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in kept:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        tmp_path.replace(self.path)
+        return n_lines - len(kept)
@@ -5,6 +5,10 @@ Loads evaluation queries from src/eval/queries.json, runs each through the
 RAG pipeline in two configurations (with and without reranking), scores
 each response using LLM-as-judge, and saves structured results.
 
+Runs in stages: one batched retrieval per query, one batched rerank, then
+both modes' context sets are derived from the same candidates (baseline is
+retrieved[:n_rerank]). Only generation and judging run per mode.
+
 Usage:
     # Run full evaluation (both modes)
     python -m src.eval.run_eval
@@ -24,10 +28,24 @@ Usage:
     # Specify output file
     python -m src.eval.run_eval --output logs/my_eval.jsonl
 
+    # Overlap generation and judge calls (8 in flight, <= 50 requests/min)
+    python -m src.eval.run_eval --concurrency 8 --requests-per-minute 50
+
+    # Continue an interrupted run; add --retry-errors to rerun failed records
+    # (answers still waiting for judge scores are judged, not regenerated)
+    python -m src.eval.run_eval --resume
+
+    # Store chunk references instead of text previews (see src.rag.chunk_store)
+    python -m src.eval.run_eval --compact-records
+
 Output:
-    JSONL file where each line is a complete evaluation record containing:
+    JSONL file where each line is a complete evaluation record. Records are
+    keyed by run_key (see result_store.py); reruns supersede older records
+    with the same key and the file is compacted at the end of each run.
+    Each record contains:
     - query metadata (id, category, sub_question, expected_sources)
-    - pipeline config (use_reranker, model, prompt_version)
+    - pipeline config (use_reranker, model, prompt_version, retrieval_mode,
+      n_retrieve, n_rerank)
     - pipeline output (answer, retrieved_chunks, reranked_chunks)
     - scores (groundedness, citation_correctness, failure_tags)
     - timing information
@@ -50,8 +68,17 @@ load_dotenv(_project_root / "grader.env", override=True)
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
-from src.rag.pipeline import run_query
-from src.eval.scorer import score_response
+from src.ingest.ingest import corpus_hash
+from src.rag.chunk_store import compact_record
+from src.rag.generator import get_client, resolve_model
+from src.rag.prompts import get_prompt_version
+from src.rag.pipeline import get_pipeline, run_query
+from src.rag.rerank_cache import RerankScoreCache
+from src.rag.response_cache import ResponseCache
+from src.eval.concurrency import ThrottledClient, TokenBucket, run_ordered
+from src.eval.result_store import ResultStore, run_key
+from src.eval.judge_cache import JudgeCache
+from src.eval.scorer import score_response, score_responses_batch
 
 
 def load_queries(queries_path: str | Path) -> list[dict]:
@@ -90,17 +117,25 @@ def run_single_query(
     use_reranker: bool = True,
     db_path: str = "data/chromadb",
     collection_name: str = "space_debris_rag",
+    retrieved: list[dict] | None = None,
+    context: list[dict] | None = None,
 ) -> dict:
     """Run a single query through the pipeline and capture all outputs.
 
     Calls the pipeline's run_query() function and reshapes the result
-    into the flat dict that build_eval_record() expects.
+    into the flat dict that build_eval_record() expects. When both
+    retrieved and context are given (from build_context_sets), only the
+    generation and logging stages run.
 
     Args:
         query_text: The query string.
         use_reranker: Whether to use cross-encoder reranking.
         db_path: Path to ChromaDB database.
         collection_name: ChromaDB collection name.
+        retrieved: Candidates from a batched retrieve_many() call. If None,
+                   run_query() retrieves for this query on its own.
+        context: Chunks to pass to the generator, already reranked or
+                 sliced for this mode. Requires retrieved.
 
     Returns:
         Dict with: answer, retrieved_chunks, reranked_chunks,
@@ -110,12 +145,18 @@ def run_single_query(
 
     # run_query() returns: {answer, chunks_used, log_entry}
     # log_entry contains the full details we need.
-    raw = run_query(
-        query=query_text,
-        db_path=db_path,
-        collection_name=collection_name,
-        skip_rerank=not use_reranker,
-    )
+    if context is not None:
+        raw = get_pipeline(db_path, collection_name).generate_and_log(
+            query_text, retrieved, context
+        )
+    else:
+        raw = run_query(
+            query=query_text,
+            db_path=db_path,
+            collection_name=collection_name,
+            skip_rerank=not use_reranker,
+            retrieved=retrieved,
+        )
 
     elapsed = time.time() - start
 
@@ -138,11 +179,59 @@ def run_single_query(
         "usage": gen.get("usage", {}),
         "elapsed_seconds": round(elapsed, 2),
         "use_reranker": use_reranker,
+        "generation_cache": gen.get("cache"),
     }
 
     return result
 
 
+def build_context_sets(
+    pipeline,
+    queries: list[dict],
+    retrieved_by_id: dict[str, list[dict]],
+    modes: list[str],
+    n_rerank: int = 10,
+) -> dict[tuple[str, str], tuple[list[dict], list[dict]]]:
+    """Derive every mode's generator context from one candidate list per query.
+
+    Both modes start from the same retrieved candidates, so they are
+    compared on an identical pool: "rerank" takes the cross-encoder's top
+    n_rerank (all queries in one batched call), "baseline" takes
+    retrieved[:n_rerank] in embedding order.
+
+    Args:
+        pipeline: The shared RAGPipeline.
+        queries: Query dicts from load_queries().
+        retrieved_by_id: Candidates per query id from retrieve_many().
+        modes: Modes to build ("rerank" and/or "baseline").
+        n_rerank: Chunks passed to the generator per query.
+
+    Returns:
+        Dict mapping (mode, query_id) to (retrieved, context). Each mode
+        gets its own chunk copies so score annotations don't leak.
+    """
+    contexts = {}
+    ids = [q["id"] for q in queries]
+
+    if "rerank" in modes:
+        candidates = [[dict(c) for c in retrieved_by_id[qid]] for qid in ids]
+        reranked = pipeline.rerank_many(
+            [q["query"] for q in queries], candidates, n_rerank=n_rerank
+        )
+        for qid, retrieved, context in zip(ids, candidates, reranked):
+            contexts[("rerank", qid)] = (retrieved, context)
+
+    if "baseline" in modes:
+        for qid in ids:
+            retrieved = [dict(c) for c in retrieved_by_id[qid]]
+            context = retrieved[:n_rerank]
+            for chunk in context:
+                chunk["rerank_score"] = None
+            contexts[("baseline", qid)] = (retrieved, context)
+
+    return contexts
+
+
 def build_eval_record(
     query_meta: dict,
     pipeline_result: dict,
@@ -184,7 +273,19 @@ def build_eval_record(
         "elapsed_seconds": pipeline_result.get("elapsed_seconds", 0),
     }
     
-    # Add scores if available
+    # Response-cache provenance, when generation went through the cache
+    if pipeline_result.get("generation_cache"):
+        record["generation_cache"] = pipeline_result["generation_cache"]
+    
+    return add_scores(record, scores)
+
+
+# Fields of a record whose answer is stored but not yet judged (--judge-batch)
+PENDING_FIELDS = ("judge_pending", "judge_chunks", "judge_error")
+
+
+def add_scores(record: dict, scores: dict | None) -> dict:
+    """Add judge scores (from scorer.score_response) to an eval record in place."""
     if scores:
         record["groundedness_score"] = scores.get("groundedness_score", 0)
         record["groundedness_rationale"] = scores.get("groundedness_rationale", "")
@@ -195,11 +296,44 @@ def build_eval_record(
         record["judge_tokens"] = {
             "input": scores.get("judge_input_tokens", 0),
             "output": scores.get("judge_output_tokens", 0),
+            "cache_write": scores.get("judge_cache_creation_tokens", 0),
+            "cache_read": scores.get("judge_cache_read_tokens", 0),
         }
+        if scores.get("judge_cache"):
+            record["judge_cache"] = scores["judge_cache"]
     
     return record
 
 
+def pending_record(record: dict, query: str, chunks: list[dict]) -> tuple[dict, dict]:
+    """Mark an unscored record as waiting for its judge scores.
+
+    The judge's chunk text is stored with it (the record itself only keeps
+    200-char previews), so --resume can judge the stored answer without
+    generating it again.
+
+    Returns:
+        (pending record, judge item with query, answer and chunks).
+    """
+    judge_chunks = [
+        {
+            "id": c.get("id", ""),
+            "source_id": c.get("source_id", ""),
+            "chunk_id": c.get("chunk_id", ""),
+            "section_title": c.get("section_title", ""),
+            "text": c.get("text", c.get("document", "")),
+        }
+        for c in chunks
+    ]
+    record = {**record, "judge_pending": True, "judge_chunks": judge_chunks}
+    return record, judge_item(record, query)
+
+
+def judge_item(record: dict, query: str) -> dict:
+    """Judge input (query, answer, chunks) of a pending record."""
+    return {"query": query, "answer": record.get("answer", ""), "chunks": record["judge_chunks"]}
+
+
 def _simplify_chunks(chunks: list[dict]) -> list[dict]:
     """Reduce chunk data to essentials for the eval log.
     
@@ -239,7 +373,7 @@ def print_progress(
         tag_str = f" | tags: {', '.join(tags)}" if tags else ""
         print(f"  {prefix}: G={g} C={c}{tag_str}")
     else:
-        print(f"  {prefix}: running...")
+        print(f"  {prefix}: done")
 
 
 def print_summary(records: list[dict]):
@@ -374,6 +508,23 @@ def main():
         default="claude-opus-4-6",
         help="Model to use for LLM-as-judge scoring",
     )
+    parser.add_argument(
+        "--judge-cache",
+        default=None,
+        help="SQLite file of cached judge verdicts keyed by judge model, rubric "
+             "version, query, answer and chunk ids (default: in-memory only)",
+    )
+    parser.add_argument(
+        "--judge-batch",
+        action="store_true",
+        help="Generate every answer first, then judge them all in one Message Batch",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=30.0,
+        help="Seconds between judge batch status checks (default: 30)",
+    )
     parser.add_argument(
         "--db-path",
         default="data/chromadb",
@@ -384,6 +535,78 @@ def main():
         default="space_debris_rag",
         help="ChromaDB collection name",
     )
+    parser.add_argument(
+        "--retrieval-mode",
+        choices=["dense", "hybrid"],
+        default="dense",
+        help="Candidate retrieval: dense (ChromaDB) or hybrid (ChromaDB + BM25)",
+    )
+    parser.add_argument(
+        "--n-retrieve",
+        type=int,
+        default=20,
+        help="Candidates retrieved per query (default: 20)",
+    )
+    parser.add_argument(
+        "--n-rerank",
+        type=int,
+        default=10,
+        help="Chunks passed to the generator per query in both modes (default: 10)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Runs in flight at once; generation and judge calls overlap "
+             "in a thread pool (default: 1, sequential)",
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=50,
+        help="Client-side cap on Anthropic API requests per minute (default: 50)",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=5,
+        help="Retries per API call on connection errors, timeouts, 408/409/429 and "
+             "5xx with exponential backoff (default: 5)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip runs already in --output for the same query, mode, model, "
+             "prompt version, judge model, corpus and retrieval settings "
+             "(failed runs included)",
+    )
+    parser.add_argument(
+        "--retry-errors",
+        action="store_true",
+        help="Like --resume, but rerun runs whose stored record is an error",
+    )
+    parser.add_argument(
+        "--rerank-cache",
+        default=None,
+        help="SQLite file for persistent rerank scores (default: in-memory only)",
+    )
+    parser.add_argument(
+        "--embedding-cache",
+        default=None,
+        help="Directory for persistent query embeddings (default: in-memory only)",
+    )
+    parser.add_argument(
+        "--response-cache",
+        default=None,
+        help="SQLite file caching generation responses by prompt fingerprint "
+             "(default: off, every run calls the API)",
+    )
+    parser.add_argument(
+        "--compact-records",
+        action="store_true",
+        help="Store chunks as id + preview hash references instead of text "
+             "previews (score_completeness rehydrates them)",
+    )
     args = parser.parse_args()
     
     # Determine which modes to run
@@ -411,84 +634,275 @@ def main():
         print(f"Judge model: {args.judge_model}")
     print()
     
-    # Pipeline is initialized on each call (run_query handles it internally).
+    # run_query() shares one warm RAGPipeline, so models load on the first run only.
     print(f"Using ChromaDB at: {args.db_path} (collection: {args.collection})\n")
     
+    # One rate-limited, retrying client shared by generation and judging.
+    # SDK retries are off so backoff happens only in ThrottledClient, which
+    # retries the same transient errors the SDK would.
+    client = ThrottledClient(
+        get_client(max_retries=0),
+        limiter=TokenBucket.per_minute(args.requests_per_minute),
+        max_retries=args.max_retries,
+    )
+    
+    pipeline = get_pipeline(
+        args.db_path,
+        args.collection,
+        rerank_cache=RerankScoreCache(db_path=args.rerank_cache),
+        embedding_cache_dir=args.embedding_cache,
+        retrieval_mode=args.retrieval_mode,
+        client=client,
+        response_cache=ResponseCache(args.response_cache) if args.response_cache else None,
+    )
+    
     # Ensure output directory exists
     output_path = Path(args.output)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # Run evaluation
-    all_records = []
-    run_idx = 0
+    # The output JSONL doubles as a content-addressed result store: every
+    # record carries a run_key over (query_id, mode, model, prompt_version,
+    # judge_model, corpus hash, retrieval mode, n_retrieve, n_rerank), and
+    # the latest record per key wins.
+    store = ResultStore(output_path)
+    corpus = corpus_hash(args.db_path, args.collection)
+    gen_model = resolve_model(pipeline.model)
+    prompt_version = get_prompt_version()
+    judge_model = None if args.no_score else args.judge_model
+    keys = {
+        (mode, q["id"]): run_key(
+            q["id"], mode, gen_model, prompt_version, judge_model, corpus,
+            args.retrieval_mode, args.n_retrieve, args.n_rerank,
+        )
+        for mode in modes
+        for q in queries
+    }
+    
+    # Every (mode, query) pair is one task; --resume drops finished ones.
+    # Answers stored before their judge batch returned are only judged.
+    tasks = [(mode, query_meta) for mode in modes for query_meta in queries]
+    judge_only: dict[tuple[str, str], dict] = {}
+    if args.resume or args.retry_errors:
+        done = {"ok", "pending"} if args.retry_errors else {"ok", "error", "pending"}
+        statuses = [store.status(keys[(m, q["id"])]) for m, q in tasks]
+        judge_only = {
+            (m, q["id"]): store.get(keys[(m, q["id"])])
+            for (m, q), status in zip(tasks, statuses) if status == "pending"
+        }
+        tasks = [t for t, status in zip(tasks, statuses) if status not in done]
+        print(f"Resuming from {output_path}: {statuses.count('ok')} done, "
+              f"{statuses.count('error')} failed"
+              f"{' (retrying)' if args.retry_errors else ' (skipped)'}, "
+              f"{len(judge_only)} awaiting judge scores, {len(tasks)} to run")
     
-    for mode in modes:
-        use_reranker = mode == "rerank"
-        mode_label = "WITH reranking" if use_reranker else "WITHOUT reranking (baseline)"
-        print(f"\n{'='*50}")
-        print(f"Running {len(queries)} queries {mode_label}")
-        print(f"{'='*50}\n")
+    # Retrieval and reranking only for queries that still have work
+    pending_ids = {q["id"] for _, q in tasks}
+    pending_queries = [q for q in queries if q["id"] in pending_ids]
+    pending_modes = [m for m in modes if any(t[0] == m for t in tasks)]
+    contexts = {}
+    if tasks:
+        # Batched retrieval: embed and search every query in one ChromaDB call
+        retrieve_start = time.time()
+        retrieved_by_id = dict(zip(
+            [q["id"] for q in pending_queries],
+            pipeline.retrieve_many(
+                [q["query"] for q in pending_queries], n_retrieve=args.n_retrieve
+            ),
+        ))
+        print(f"Retrieved candidates for {len(pending_queries)} queries in "
+              f"{time.time() - retrieve_start:.2f}s (batched)")
         
-        for query_meta in queries:
-            run_idx += 1
-            query_id = query_meta["id"]
-            query_text = query_meta["query"]
-            
-            print_progress(run_idx, total_runs, query_id, mode)
+        # Context sets for every mode, derived from that one candidate list
+        rerank_start = time.time()
+        contexts = build_context_sets(
+            pipeline, pending_queries, retrieved_by_id, pending_modes,
+            n_rerank=args.n_rerank,
+        )
+        print(f"Built {len(contexts)} context sets for {', '.join(pending_modes)} in "
+              f"{time.time() - rerank_start:.2f}s\n")
+    
+    # Run evaluation: only generation and judging fork per mode. Generation
+    # and judge calls go through the shared ThrottledClient, and results
+    # come back in task order, so the JSONL is identical for any
+    # --concurrency.
+    judge_cache = JudgeCache(args.judge_cache)
+    
+    # With --judge-batch, every answer is stored right away as a pending
+    # record, and its judge input is parked here (keyed by (mode, query_id))
+    # to be scored in one Message Batch after generation. A crash or a
+    # failed batch keeps the answers; --resume judges them.
+    batch_judging = args.judge_batch and not args.no_score
+    deferred: dict[tuple[str, str], tuple[dict, dict]] = {}
+    
+    def error_record(mode: str, query_meta: dict, e: Exception) -> dict:
+        print(f"  ERROR on {query_meta['id']} ({mode}): {e}")
+        return {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "query_id": query_meta["id"],
+            "query": query_meta["query"],
+            "use_reranker": mode == "rerank",
+            "model": gen_model,
+            "prompt_version": prompt_version,
+            "judge_model": judge_model or "",
+            "error": str(e),
+            "category": query_meta.get("category", ""),
+        }
+    
+    def keyed(record: dict, mode: str, query_id: str) -> dict:
+        record["run_key"] = keys[(mode, query_id)]
+        record["corpus_hash"] = corpus
+        record["retrieval_mode"] = args.retrieval_mode
+        record["n_retrieve"] = args.n_retrieve
+        record["n_rerank"] = args.n_rerank
+        if args.compact_records and "error" not in record:
+            record = compact_record(record)
+        return record
+    
+    def store_judged(mode: str, query_id: str, record: dict, outcome: dict | Exception):
+        """Store a pending record with its scores, or keep it pending on failure."""
+        if isinstance(outcome, Exception):
+            print(f"  JUDGE ERROR on {query_id} ({mode}): {outcome} "
+                  "(answer kept; --resume judges it)")
+            record = {**record, "judge_error": str(outcome)}
+        else:
+            record = {k: v for k, v in record.items() if k not in PENDING_FIELDS}
+            add_scores(record, outcome)
+        store.add(keyed(record, mode, query_id))
+        return record
+    
+    def run_task(task: tuple[str, dict]) -> dict:
+        mode, query_meta = task
+        use_reranker = mode == "rerank"
+        query_id = query_meta["id"]
+        query_text = query_meta["query"]
+        retrieved, context = contexts[(mode, query_id)]
+        try:
+            # Generate from the precomputed context set
+            pipeline_result = run_single_query(
+                query_text,
+                use_reranker=use_reranker,
+                db_path=args.db_path,
+                collection_name=args.collection,
+                retrieved=retrieved,
+                context=context,
+            )
             
-            try:
-                # Run pipeline
-                pipeline_result = run_single_query(
-                    query_text,
-                    use_reranker=use_reranker,
-                    db_path=args.db_path,
-                    collection_name=args.collection,
+            # Score with LLM-as-judge (unless --no-score)
+            scores = None
+            if not args.no_score:
+                # Determine which chunks to send to the judge:
+                # If reranking was used, send the reranked chunks (what the generator saw).
+                # If no reranking, send the retrieved chunks.
+                judge_chunks = (
+                    pipeline_result.get("reranked_chunks")
+                    or pipeline_result.get("retrieved_chunks", [])
                 )
                 
-                # Score with LLM-as-judge (unless --no-score)
-                scores = None
-                if not args.no_score:
-                    # Determine which chunks to send to the judge:
-                    # If reranking was used, send the reranked chunks (what the generator saw).
-                    # If no reranking, send the retrieved chunks.
-                    judge_chunks = (
-                        pipeline_result.get("reranked_chunks")
-                        or pipeline_result.get("retrieved_chunks", [])
-                    )
-                    
+                if not batch_judging:
                     scores = score_response(
                         query=query_text,
                         answer=pipeline_result.get("answer", ""),
                         chunks=judge_chunks,
                         model=args.judge_model,
+                        client=client,
+                        cache=judge_cache,
                     )
-                    print_progress(run_idx, total_runs, query_id, mode, scores)
-                
-                # Build and save record
-                record = build_eval_record(query_meta, pipeline_result, scores)
-                all_records.append(record)
-                
-                # Append to file incrementally (so we don't lose data on crash)
-                with open(output_path, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
-                
+            
+            record = build_eval_record(query_meta, pipeline_result, scores)
+            if batch_judging:
+                record, item = pending_record(record, query_text, judge_chunks)
+                deferred[(mode, query_id)] = (record, item)
+        
+        except Exception as e:
+            record = error_record(mode, query_meta, e)
+        
+        return keyed(record, mode, query_id)
+    
+    print(f"Running {len(tasks)} runs with concurrency {args.concurrency} "
+          f"(<= {args.requests_per_minute:g} API requests/min)\n")
+    eval_start = time.time()
+    
+    for idx, (mode, query_meta), record in run_ordered(
+        tasks, run_task, concurrency=args.concurrency
+    ):
+        if "error" not in record:
+            scored = not args.no_score and not record.get("judge_pending")
+            print_progress(idx + 1, len(tasks), query_meta["id"], mode,
+                           record if scored else None)
+        
+        # Append to the store incrementally (so we don't lose data on crash);
+        # with --judge-batch this is the pending record, scored below
+        store.add(record)
+    
+    # Answers a resumed run found waiting for their judge scores
+    order = [(m, q["id"]) for m, q in tasks if (m, q["id"]) in deferred]
+    for key, record in judge_only.items():
+        deferred[key] = (record, judge_item(record, record["query"]))
+        order.append(key)
+    
+    if deferred and batch_judging:
+        # One Message Batch for every stored answer, in task order
+        print(f"\nJudging {len(order)} runs in one batch")
+        try:
+            outcomes = score_responses_batch(
+                [deferred[k][1] for k in order],
+                model=args.judge_model,
+                client=client.client,
+                cache=judge_cache,
+                poll_interval=args.poll_interval,
+            )
+        except Exception as e:
+            print(f"  JUDGE BATCH FAILED: {e}\n  {len(order)} answers are stored "
+                  f"unscored in {output_path}; rerun with --resume to judge them")
+            outcomes = []
+        for idx, ((mode, query_id), outcome) in enumerate(zip(order, outcomes)):
+            record = store_judged(mode, query_id, deferred[(mode, query_id)][0], outcome)
+            if not isinstance(outcome, Exception):
+                print_progress(idx + 1, len(order), query_id, mode, record)
+    elif deferred:
+        # Resumed without --judge-batch: judge the stored answers one by one
+        def judge_task(key: tuple[str, str]) -> dict | Exception:
+            try:
+                return score_response(**deferred[key][1], model=args.judge_model,
+                                      client=client, cache=judge_cache)
             except Exception as e:
-                print(f"  ERROR on {query_id} ({mode}): {e}")
-                error_record = {
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                    "query_id": query_id,
-                    "query": query_text,
-                    "use_reranker": use_reranker,
-                    "error": str(e),
-                    "category": query_meta.get("category", ""),
-                }
-                all_records.append(error_record)
-                with open(output_path, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(error_record, ensure_ascii=False) + "\n")
+                return e
+        
+        print(f"\nJudging {len(order)} stored answers")
+        for idx, (mode, query_id), outcome in run_ordered(
+            order, judge_task, concurrency=args.concurrency
+        ):
+            record = store_judged(mode, query_id, deferred[(mode, query_id)][0], outcome)
+            if not isinstance(outcome, Exception):
+                print_progress(idx + 1, len(order), query_id, mode, record)
+    
+    api_stats = client.stats()
+    print(f"\nCompleted {len(tasks)} runs in {time.time() - eval_start:.1f}s: "
+          f"{api_stats['calls']} API calls, {api_stats['retries']} retries, "
+          f"{api_stats['wait_seconds']:.1f} thread-seconds waiting on the rate limiter")
+    
+    pipeline.flush()
+    
+    # Summaries cover this run's keys in the deduplicated store, so resumed
+    # and repeated runs count each (query, mode) once.
+    removed = store.compact()
+    if removed:
+        print(f"Compacted {output_path}: dropped {removed} superseded record(s)")
+    all_records = store.records(list(keys.values()))
     
     # Print summary
     print_summary(all_records)
     
+    if not args.no_score and tasks:
+        stats = judge_cache.stats()
+        print(f"\nJudge cache: {stats['hits']} hits, {stats['misses']} misses")
+    
+    if "rerank" in pending_modes:
+        stats = pipeline.rerank_cache.stats()
+        print(f"\nRerank cache: {stats['hits']} hits "
+              f"({stats['disk_hits']} from disk), {stats['misses']} misses "
+              f"(hit rate {stats['hit_rate']:.0%})")
+    
     print(f"\nResults saved to: {output_path}")
     print(f"Total records: {len(all_records)}")
     
@@ -502,6 +916,9 @@ def main():
             "total_runs": len(all_records),
             "errors": len([r for r in all_records if "error" in r]),
             "modes": modes,
+            "retrieval_mode": args.retrieval_mode,
+            "n_retrieve": args.n_retrieve,
+            "n_rerank": args.n_rerank,
         }
         
         for mode in modes:
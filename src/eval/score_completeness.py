@@ -12,10 +12,29 @@ Usage:
         --input logs/eval_results.jsonl \
         --output logs/eval_results_v2.jsonl
 
+    # Reuse earlier verdicts and submit the rest as one Message Batch
+    python -m src.eval.score_completeness --judge-cache data/cache/judge.sqlite --batch
+
+Compact records (run_eval --compact-records) are rehydrated from the
+chunked Markdown in --chunks-dir, or from ChromaDB with --db-path, before
+scoring; the restored text previews are identical, so judge prompts and
+cache keys are too. They are written back in compact form.
+
+With --stream, records are read, scored and appended one at a time in
+constant memory, with the summary kept as running totals. A checkpoint
+after each record (<output>.checkpoint.json) lets --resume continue an
+interrupted run without losing a record. The record in flight when the
+run stopped (judged, but its checkpoint not yet saved) is judged again on
+resume; with --judge-cache that second judgement is a cache hit:
+
+    python -m src.eval.score_completeness --stream --judge-cache data/cache/judge.sqlite
+    python -m src.eval.score_completeness --stream --resume --judge-cache data/cache/judge.sqlite
+
 Requires ANTHROPIC_API_KEY in environment or .env file.
 """
 
 import json
+import os
 import re
 import argparse
 import time
@@ -32,17 +51,24 @@ except ImportError:
 
 import anthropic
 
+from src.eval.columnar_summary import SummaryAccumulator
+from src.eval.judge_cache import JudgeCache, run_batch
+from src.rag.chunk_store import CHUNK_FORMAT, ChunkStore, rehydrate_record
+from src.rag.generator import usage_to_dict
+from src.rag.prompts import prefix_block
+
 JUDGE_MODEL = "claude-opus-4-6"
 
-COMPLETENESS_PROMPT = """You are evaluating the COMPLETENESS of a RAG system's answer.
+# Part of the judge cache key: bump whenever COMPLETENESS_RUBRIC /
+# COMPLETENESS_INPUT or the request layout changes
+RUBRIC_VERSION = "completeness-v2"
 
-QUERY: {query}
+# Static instructions first so every call shares a prompt prefix;
+# the per-record query, chunks and answer follow in COMPLETENESS_INPUT.
+COMPLETENESS_RUBRIC = """You are evaluating the COMPLETENESS of a RAG system's answer.
 
-RETRIEVED CHUNKS SENT TO GENERATOR (top {n_chunks}):
-{chunks_text}
-
-SYSTEM'S ANSWER:
-{answer}
+You will be given the QUERY, the RETRIEVED CHUNKS that were sent to the
+generator, and the SYSTEM'S ANSWER.
 
 COMPLETENESS RUBRIC (1-4):
 - 4: Covers all aspects of the question using the full range of relevant retrieved evidence
@@ -57,7 +83,18 @@ IMPORTANT SCORING RULES:
 - For out-of-scope queries where retrieved chunks are genuinely irrelevant, score based on how well the answer characterizes what the corpus does contain.
 
 Respond with ONLY a JSON object (no markdown, no backticks):
-{{"completeness_score": <1-4>, "completeness_rationale": "<2-3 sentences>"}}"""
+{"completeness_score": <1-4>, "completeness_rationale": "<2-3 sentences>"}"""
+
+COMPLETENESS_INPUT = """QUERY: {query}
+
+RETRIEVED CHUNKS SENT TO GENERATOR (top {n_chunks}):
+{chunks_text}
+
+SYSTEM'S ANSWER:
+{answer}"""
+
+# Token counts for a verdict served from the judge cache (no API call)
+NO_TOKENS = {"input": 0, "output": 0, "cache_write": 0, "cache_read": 0}
 
 
 def format_chunks_for_judge(chunks):
@@ -110,42 +147,299 @@ def compute_context_utilization(record):
     return round(n_exact / len(sent), 4)
 
 
-def score_completeness(client, record):
-    """Call Claude Opus to score completeness for one record."""
-    # Get the chunks that were sent to the generator
+def select_judge_chunks(record):
+    """Return the (up to 10) chunks that were sent to the generator."""
     if record.get("use_reranker") and record.get("reranked_chunks"):
-        sent_chunks = record["reranked_chunks"][:10]
-    else:
-        sent_chunks = record.get("retrieved_chunks", [])[:10]
+        return record["reranked_chunks"][:10]
+    return record.get("retrieved_chunks", [])[:10]
 
-    chunks_text = format_chunks_for_judge(sent_chunks)
 
-    prompt = COMPLETENESS_PROMPT.format(
+def build_completeness_request(record):
+    """Build the messages.create() parameters for one completeness call.
+
+    The rubric block comes first (see prefix_block); the record-specific
+    block comes after it.
+    """
+    sent_chunks = select_judge_chunks(record)
+    record_block = COMPLETENESS_INPUT.format(
         query=record["query"],
         n_chunks=len(sent_chunks),
-        chunks_text=chunks_text,
+        chunks_text=format_chunks_for_judge(sent_chunks),
         answer=record["answer"],
     )
+    return {
+        "model": JUDGE_MODEL,
+        "max_tokens": 300,
+        "messages": [{
+            "role": "user",
+            "content": [
+                prefix_block(COMPLETENESS_RUBRIC, JUDGE_MODEL),
+                {"type": "text", "text": record_block},
+            ],
+        }],
+    }
 
-    response = client.messages.create(
-        model=JUDGE_MODEL,
-        max_tokens=300,
-        messages=[{"role": "user", "content": prompt}],
-    )
 
+def parse_completeness_response(response):
+    """Parse a completeness judge Message into (result, tokens)."""
     raw = response.content[0].text.strip()
     # Strip markdown fences if present
     raw = re.sub(r"^```json\s*", "", raw)
     raw = re.sub(r"\s*```$", "", raw)
 
     result = json.loads(raw)
+    usage = usage_to_dict(response.usage)
     tokens = {
-        "input": response.usage.input_tokens,
-        "output": response.usage.output_tokens,
+        "input": usage["input_tokens"],
+        "output": usage["output_tokens"],
+        "cache_write": usage["cache_creation_input_tokens"],
+        "cache_read": usage["cache_read_input_tokens"],
     }
     return result, tokens
 
 
+def completeness_cache_key(record):
+    """JudgeCache key for a record's completeness verdict."""
+    return JudgeCache.make_key(
+        JUDGE_MODEL, RUBRIC_VERSION, record["query"], record["answer"],
+        select_judge_chunks(record),
+    )
+
+
+def score_completeness(client, record, cache=None):
+    """Call Claude Opus to score completeness for one record.
+
+    With a JudgeCache, a verdict for the same query, answer and chunk ids
+    is reused; tokens are then zero because no call was made.
+    """
+    key = None
+    if cache is not None:
+        key = completeness_cache_key(record)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, dict(NO_TOKENS)
+
+    response = client.messages.create(**build_completeness_request(record))
+    result, tokens = parse_completeness_response(response)
+
+    if cache is not None:
+        cache.put(key, result, JUDGE_MODEL, RUBRIC_VERSION)
+    return result, tokens
+
+
+def score_completeness_batch(client, records, cache=None, poll_interval=30.0):
+    """Score completeness for many records with one Message Batch.
+
+    Cached verdicts are reused; only cache misses are submitted.
+
+    Returns:
+        One entry per record, in order: a (result, tokens) tuple as from
+        score_completeness(), or the Exception for a failed request.
+    """
+    outcomes = [None] * len(records)
+    keys = [completeness_cache_key(r) for r in records]
+
+    pending = []
+    for i, key in enumerate(keys):
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            outcomes[i] = (cached, dict(NO_TOKENS))
+        else:
+            pending.append(i)
+
+    responses = run_batch(
+        client,
+        [build_completeness_request(records[i]) for i in pending],
+        poll_interval=poll_interval,
+    )
+    for i, response in zip(pending, responses):
+        if isinstance(response, Exception):
+            outcomes[i] = response
+            continue
+        try:
+            result, tokens = parse_completeness_response(response)
+        except json.JSONDecodeError as e:
+            outcomes[i] = e
+            continue
+        if cache is not None:
+            cache.put(keys[i], result, JUDGE_MODEL, RUBRIC_VERSION)
+        outcomes[i] = (result, tokens)
+    return outcomes
+
+
+def enrich_record(record, client=None, cache=None, outcome=None):
+    """Add mechanical metrics and, with a client, the completeness score.
+
+    Updates record in place. A scoring failure is recorded in the record
+    (completeness_score None plus the error as rationale), not raised.
+
+    Args:
+        record: Eval record (with chunk text previews, not compact).
+        client: Anthropic client, or None for mechanical metrics only.
+        cache: Optional JudgeCache.
+        outcome: Result of score_completeness_batch() for this record,
+                 used instead of a per-record judge call.
+
+    Returns:
+        (tokens, api_called, error): judge tokens spent, whether the judge
+        API was called for this record, and the scoring exception if any.
+    """
+    record["retrieval_recall"] = compute_retrieval_recall(record)
+    record["context_utilization"] = compute_context_utilization(record)
+
+    if client is None and outcome is None:
+        return dict(NO_TOKENS), False, None
+
+    api_called = False
+    try:
+        if outcome is not None:
+            if isinstance(outcome, Exception):
+                raise outcome
+            result, tokens = outcome
+        else:
+            result, tokens = score_completeness(client, record, cache=cache)
+            api_called = tokens["input"] > 0
+    except Exception as e:
+        record["completeness_score"] = None
+        record["completeness_rationale"] = f"Scoring error: {e}"
+        return dict(NO_TOKENS), api_called, e
+
+    record["completeness_score"] = result["completeness_score"]
+    record["completeness_rationale"] = result["completeness_rationale"]
+    return tokens, api_called, None
+
+
+def progress_line(record, error=None, dry_run=False):
+    """One progress line for an enriched record."""
+    qid = record["query_id"]
+    mode = "rerank" if record["use_reranker"] else "baseline"
+    if error is not None:
+        return f"{qid} {mode}: ERROR - {error}"
+    metrics = (f"ret_recall={record['retrieval_recall']} "
+               f"ctx_util={record['context_utilization']:.2f}")
+    if dry_run:
+        return f"{qid} {mode}: {metrics} (dry-run, skipping completeness)"
+    return f"{qid} {mode}: completeness={record['completeness_score']} {metrics}"
+
+
+def _with_chunk_refs(record, compact):
+    """Enriched record with the chunk references of its compact original.
+
+    Stale chunks keep their old hash rather than one of the rehydrated text.
+    """
+    return {**record, **{k: v for k, v in compact.items()
+                         if k in ("chunk_format", "retrieved_chunks", "reranked_chunks")}}
+
+
+def checkpoint_path(output_path):
+    """Checkpoint file of a --stream run writing output_path."""
+    return Path(f"{output_path}.checkpoint.json")
+
+
+def _write_checkpoint(path, state):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def enrich_stream(input_path, output_path, client=None, cache=None, resume=False,
+                  chunk_store=None, dry_run=False):
+    """Enrich records one at a time: read, score, append, checkpoint.
+
+    After each record the output line is flushed and a checkpoint
+    (<output>.checkpoint.json) records the input byte offset, the output
+    size and the running summary totals. With resume, output past the
+    checkpoint (a record that was being written when the run stopped) is
+    truncated and reading continues at the checkpoint offset, so no
+    record is lost or written twice. That record is judged again, though:
+    without a cache its verdict (and judge tokens) are paid twice, so
+    pass cache to make the re-judgement a hit. Records appended to the
+    input since a finished run are picked up the same way.
+
+    Memory stays constant: only the current record and the per-(mode,
+    category) summary totals are held.
+
+    Args:
+        input_path: Eval results JSONL.
+        output_path: Enriched JSONL, appended to record by record.
+        client: Anthropic client, or None for mechanical metrics only.
+        cache: Optional JudgeCache.
+        resume: Continue from the checkpoint of an earlier run.
+        chunk_store: Callable returning the ChunkStore for compact records
+                     (called on the first compact record only).
+        dry_run: Print dry-run progress lines.
+
+    Returns:
+        (accumulator, judge_tokens, processed): a SummaryAccumulator over
+        every record in the output, total judge tokens (including earlier
+        resumed runs) and the number of records processed in this call.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    ckpt = checkpoint_path(output_path)
+
+    acc = SummaryAccumulator()
+    judge_tokens = dict(NO_TOKENS)
+    offset = output_bytes = done = 0
+    if resume and ckpt.exists():
+        with open(ckpt, encoding="utf-8") as f:
+            state = json.load(f)
+        if state["input"] != str(input_path):
+            raise ValueError(f"Checkpoint {ckpt} is for {state['input']}, not {input_path}")
+        offset, output_bytes, done = state["offset"], state["output_bytes"], state["records"]
+        acc = SummaryAccumulator.from_state(state["summary"])
+        judge_tokens = state["judge_tokens"]
+        print(f"Resuming from {ckpt}: {done} records done, continuing at byte {offset}")
+
+    # Drop anything written after the checkpoint (or everything, on a fresh run)
+    with open(output_path, "ab") as out:
+        out.truncate(output_bytes)
+
+    store = None
+    processed = 0
+    with open(input_path, "rb") as src, open(output_path, "ab") as out:
+        src.seek(offset)
+        for line in src:
+            offset += len(line)
+            if not line.strip():
+                continue
+            compact = json.loads(line)
+            record = compact
+            if compact.get("chunk_format") == CHUNK_FORMAT:
+                store = store or chunk_store()
+                record = rehydrate_record(compact, store)
+
+            tokens, api_called, error = enrich_record(record, client, cache)
+            for field in judge_tokens:
+                judge_tokens[field] += tokens[field]
+            acc.add_record(record)
+            if record is not compact:
+                record = _with_chunk_refs(record, compact)
+
+            data = (json.dumps(record) + "\n").encode("utf-8")
+            out.write(data)
+            out.flush()
+            output_bytes += len(data)
+            done += 1
+            processed += 1
+            _write_checkpoint(ckpt, {
+                "input": str(input_path),
+                "offset": offset,
+                "output_bytes": output_bytes,
+                "records": done,
+                "judge_tokens": judge_tokens,
+                "summary": acc.state(),
+            })
+            print(f"  [{done}] {progress_line(record, error, dry_run)}")
+
+            # Rate limiting: brief pause after API calls (none for cache hits)
+            if api_called:
+                time.sleep(0.5)
+
+    return acc, judge_tokens, processed
+
+
 def main():
     parser = argparse.ArgumentParser(description="Add completeness scores to eval results")
     parser.add_argument("--input", default="logs/eval_results.jsonl",
@@ -156,72 +450,113 @@ def main():
                         help="Path for summary JSON (default: <output>.summary.json)")
     parser.add_argument("--dry-run", action="store_true",
                         help="Compute mechanical metrics only, skip API calls")
+    parser.add_argument("--judge-cache", default=None,
+                        help="SQLite file of cached judge verdicts (default: in-memory only)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit all completeness prompts as one Message Batch "
+                             "and collect the results when it ends")
+    parser.add_argument("--poll-interval", type=float, default=30.0,
+                        help="Seconds between batch status checks (default: 30)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read, score and write one record at a time in constant "
+                             "memory, checkpointing after each record")
+    parser.add_argument("--resume", action="store_true",
+                        help="With --stream, continue from <output>.checkpoint.json")
+    parser.add_argument("--chunks-dir", default="data/processed",
+                        help="Chunked Markdown to rehydrate compact records from "
+                             "(default: data/processed)")
+    parser.add_argument("--db-path", default=None,
+                        help="Rehydrate compact records from this ChromaDB instead of --chunks-dir")
+    parser.add_argument("--collection", default="space_debris_rag",
+                        help="ChromaDB collection for --db-path (default: space_debris_rag)")
     args = parser.parse_args()
 
+    if args.stream and args.batch:
+        parser.error("--stream scores record by record; it cannot be combined with --batch")
+    if args.resume and not args.stream:
+        parser.error("--resume needs --stream")
+
     if args.summary is None:
         args.summary = args.output.replace(".jsonl", ".summary.json")
 
-    # Load existing results
-    records = []
-    with open(args.input, encoding="utf-8") as f:
-        for line in f:
-            if line.strip():
-                records.append(json.loads(line))
-
-    print(f"Loaded {len(records)} records from {args.input}")
+    def chunk_store():
+        return (
+            ChunkStore.from_collection(args.db_path, args.collection)
+            if args.db_path else ChunkStore.from_processed(args.chunks_dir)
+        )
 
     client = None if args.dry_run else anthropic.Anthropic()
-
-    enriched = []
-    total_judge_tokens = {"input": 0, "output": 0}
-
-    for i, record in enumerate(records):
-        qid = record["query_id"]
-        mode = "rerank" if record["use_reranker"] else "baseline"
-
-        # Mechanical metrics (always computed)
-        record["retrieval_recall"] = compute_retrieval_recall(record)
-        record["context_utilization"] = compute_context_utilization(record)
-
-        # Completeness scoring (API call)
-        if not args.dry_run:
-            try:
-                result, tokens = score_completeness(client, record)
-                record["completeness_score"] = result["completeness_score"]
-                record["completeness_rationale"] = result["completeness_rationale"]
-                total_judge_tokens["input"] += tokens["input"]
-                total_judge_tokens["output"] += tokens["output"]
-                print(f"  [{i+1}/{len(records)}] {qid} {mode}: "
-                      f"completeness={result['completeness_score']} "
-                      f"ret_recall={record['retrieval_recall']} "
-                      f"ctx_util={record['context_utilization']:.2f}")
-            except Exception as e:
-                print(f"  [{i+1}/{len(records)}] {qid} {mode}: ERROR - {e}")
-                record["completeness_score"] = None
-                record["completeness_rationale"] = f"Scoring error: {e}"
-        else:
-            print(f"  [{i+1}/{len(records)}] {qid} {mode}: "
-                  f"ret_recall={record['retrieval_recall']} "
-                  f"ctx_util={record['context_utilization']:.2f} "
-                  f"(dry-run, skipping completeness)")
-
-        enriched.append(record)
-
-        # Rate limiting: brief pause between API calls
-        if not args.dry_run and i < len(records) - 1:
-            time.sleep(0.5)
-
-    # Write enriched results
-    output_path = Path(args.output)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(output_path, "w", encoding="utf-8") as f:
-        for record in enriched:
-            f.write(json.dumps(record) + "\n")
-
-    print(f"\nWrote {len(enriched)} enriched records to {args.output}")
-
-    # Compute and write summary
-    summary = compute_summary(enriched, args.dry_run)
+    judge_cache = JudgeCache(args.judge_cache)
+
+    if args.stream:
+        acc, total_judge_tokens, processed = enrich_stream(
+            args.input, args.output, client=client, cache=judge_cache,
+            resume=args.resume, chunk_store=chunk_store, dry_run=args.dry_run,
+        )
+        print(f"\nEnriched {processed} records this run; {acc.total} in {args.output}")
+        summary = acc.summary(args.dry_run)
+    else:
+        # Load existing results
+        records = []
+        with open(args.input, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    records.append(json.loads(line))
+
+        print(f"Loaded {len(records)} records from {args.input}")
+
+        # Compact records get their chunk text previews back for the judge
+        compact = {i: r for i, r in enumerate(records) if r.get("chunk_format") == CHUNK_FORMAT}
+        if compact:
+            store = chunk_store()
+            for i in compact:
+                records[i] = rehydrate_record(records[i], store)
+            stale = sum(
+                1 for i in compact
+                for key in ("retrieved_chunks", "reranked_chunks")
+                for c in records[i].get(key, [])
+                if c.get("text_stale") or c.get("text_missing")
+            )
+            print(f"Rehydrated {len(compact)} compact records from "
+                  f"{args.db_path or args.chunks_dir}"
+                  f"{f' ({stale} chunks stale or missing)' if stale else ''}")
+
+        # Batch mode: one round of batched judge work up front, merged below
+        batch_outcomes = None
+        if not args.dry_run and args.batch:
+            batch_outcomes = score_completeness_batch(
+                client, records, cache=judge_cache, poll_interval=args.poll_interval
+            )
+
+        enriched = []
+        total_judge_tokens = dict(NO_TOKENS)
+
+        for i, record in enumerate(records):
+            outcome = batch_outcomes[i] if batch_outcomes is not None else None
+            tokens, api_called, error = enrich_record(record, client, judge_cache, outcome)
+            for field in total_judge_tokens:
+                total_judge_tokens[field] += tokens[field]
+            print(f"  [{i+1}/{len(records)}] {progress_line(record, error, args.dry_run)}")
+
+            enriched.append(record)
+
+            # Rate limiting: brief pause between API calls (none for cache hits)
+            if api_called and i < len(records) - 1:
+                time.sleep(0.5)
+
+        # Write enriched results
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(output_path, "w", encoding="utf-8") as f:
+            for i, record in enumerate(enriched):
+                if i in compact:
+                    record = _with_chunk_refs(record, compact[i])
+                f.write(json.dumps(record) + "\n")
+
+        print(f"\nWrote {len(enriched)} enriched records to {args.output}")
+        summary = compute_summary(enriched, args.dry_run)
+
+    # Write summary
     summary["run_date"] = datetime.now(timezone.utc).isoformat()
     summary["source_file"] = args.input
     summary["judge_model"] = JUDGE_MODEL
@@ -232,6 +567,9 @@ def main():
         json.dump(summary, f, indent=2)
 
     print(f"Wrote summary to {args.summary}")
+    if not args.dry_run:
+        stats = judge_cache.stats()
+        print(f"Judge cache: {stats['hits']} hits, {stats['misses']} misses")
     print_summary(summary, args.dry_run)
 
 
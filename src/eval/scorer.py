@@ -9,6 +9,12 @@ Uses a separate Anthropic API call with a structured scoring prompt.
 The judge model can differ from the generation model (e.g., use Sonnet for both,
 or use a different model for judging).
 
+The static rubric is sent first as its own content block, followed by
+the per-query QUERY / CHUNKS / ANSWER block, so judge calls share a
+common prefix. It is marked for prompt caching only if it grows past the
+judge model's minimum cacheable length (src.rag.prompts.prefix_block);
+the current rubric does not, so judge calls are not cached.
+
 Scoring rubric (1–4):
   4: Fully grounded/correct; citations accurate; uncertainty stated when evidence is weak
   3: Mostly correct; minor missing nuance or minor citation issues
@@ -25,6 +31,10 @@ import anthropic
 from pathlib import Path
 from dotenv import load_dotenv
 
+from src.eval.judge_cache import JudgeCache, run_batch
+from src.rag.generator import usage_to_dict
+from src.rag.prompts import prefix_block
+
 _project_root = Path(__file__).resolve().parent.parent.parent
 load_dotenv(_project_root / ".env", override=True)
 load_dotenv(_project_root / "grader.env", override=True)
@@ -33,7 +43,12 @@ load_dotenv(_project_root / "grader.env", override=True)
 # Scoring prompt template
 # ---------------------------------------------------------------------------
 
-SCORING_PROMPT = """You are an expert evaluator for a Retrieval-Augmented Generation (RAG) system
+# Part of the judge cache key: bump whenever SCORING_RUBRIC / SCORING_INPUT
+# or the request layout changes
+RUBRIC_VERSION = "groundedness-citation-v2"
+
+# Static prefix of every judge request
+SCORING_RUBRIC = """You are an expert evaluator for a Retrieval-Augmented Generation (RAG) system
 focused on ML failure modes in space debris tracking and collision avoidance.
 
 You will be given:
@@ -62,13 +77,13 @@ Do the citations accurately point to chunks that support the associated claims?
 - If the answer refuses to answer when evidence IS present in the chunks, score Groundedness as 1.
 
 Respond with ONLY a JSON object in this exact format (no markdown, no backticks):
-{{
+{
   "groundedness_score": <1-4>,
   "groundedness_rationale": "<1-2 sentence explanation>",
   "citation_score": <1-4>,
   "citation_rationale": "<1-2 sentence explanation>",
   "failure_tags": ["<tag1>", "<tag2>"]
-}}
+}
 
 Valid failure tags (use any that apply, or empty list if none):
 - HALLUCINATED_CLAIM: answer contains claims not in the retrieved chunks
@@ -79,8 +94,10 @@ Valid failure tags (use any that apply, or empty list if none):
 - FALSE_REFUSAL: answer says evidence is missing when it's present in chunks
 - OVER_EXTRAPOLATION: answer goes significantly beyond what chunks support
 - CONTRADICTS_SOURCE: answer contradicts information in the retrieved chunks
+"""
 
----
+# Per-query part, sent after the rubric
+SCORING_INPUT = """---
 
 QUERY:
 {query}
@@ -119,41 +136,38 @@ def format_chunks_for_scoring(chunks: list[dict]) -> str:
     return "\n\n".join(parts)
 
 
-def score_response(
+def build_scoring_request(
     query: str,
     answer: str,
     chunks: list[dict],
     model: str = "claude-opus-4-6",
 ) -> dict:
-    """Score a single RAG response using LLM-as-judge.
-    
-    Args:
-        query: The original user query.
-        answer: The RAG pipeline's generated answer.
-        chunks: The retrieved (and possibly reranked) chunks provided to the generator.
-        model: Anthropic model to use for judging.
+    """Build the messages.create() parameters for one judge call.
     
-    Returns:
-        Dict with keys: groundedness_score, groundedness_rationale,
-        citation_score, citation_rationale, failure_tags, judge_model.
+    The rubric block comes first, so all judge calls share it as a prefix
+    (marked for caching once it is long enough; see prefix_block).
     """
-    client = anthropic.Anthropic()  # reads ANTHROPIC_API_KEY from env
-    
-    formatted_chunks = format_chunks_for_scoring(chunks)
-    
-    prompt = SCORING_PROMPT.format(
+    query_block = SCORING_INPUT.format(
         query=query,
-        chunks=formatted_chunks,
+        chunks=format_chunks_for_scoring(chunks),
         answer=answer,
     )
-    
-    response = client.messages.create(
-        model=model,
-        max_tokens=500,
-        temperature=0.0,
-        messages=[{"role": "user", "content": prompt}],
-    )
-    
+    return {
+        "model": model,
+        "max_tokens": 500,
+        "temperature": 0.0,
+        "messages": [{
+            "role": "user",
+            "content": [
+                prefix_block(SCORING_RUBRIC, model),
+                {"type": "text", "text": query_block},
+            ],
+        }],
+    }
+
+
+def parse_scoring_response(response, model: str) -> dict:
+    """Turn a judge Message into the score_response() result dict."""
     raw_text = response.content[0].text.strip()
     
     # Parse the JSON response
@@ -173,7 +187,124 @@ def score_response(
         }
     
     result["judge_model"] = model
-    result["judge_input_tokens"] = response.usage.input_tokens
-    result["judge_output_tokens"] = response.usage.output_tokens
+    usage = usage_to_dict(response.usage)
+    result["judge_input_tokens"] = usage["input_tokens"]
+    result["judge_output_tokens"] = usage["output_tokens"]
+    result["judge_cache_creation_tokens"] = usage["cache_creation_input_tokens"]
+    result["judge_cache_read_tokens"] = usage["cache_read_input_tokens"]
+    
+    return result
+
+
+def _cache_result(cache: Optional[JudgeCache], key: str, result: dict, model: str):
+    """Store a verdict unless the judge output failed to parse."""
+    if cache is not None and "JUDGE_PARSE_ERROR" not in result.get("failure_tags", []):
+        cache.put(key, result, model, RUBRIC_VERSION)
+
+
+def score_response(
+    query: str,
+    answer: str,
+    chunks: list[dict],
+    model: str = "claude-opus-4-6",
+    client: Optional[anthropic.Anthropic] = None,
+    cache: Optional[JudgeCache] = None,
+) -> dict:
+    """Score a single RAG response using LLM-as-judge.
+    
+    Args:
+        query: The original user query.
+        answer: The RAG pipeline's generated answer.
+        chunks: The retrieved (and possibly reranked) chunks provided to the generator.
+        model: Anthropic model to use for judging.
+        client: Reusable Anthropic client (e.g. a ThrottledClient shared by
+                concurrent workers). A new one is created if omitted.
+        cache: Optional JudgeCache. A verdict for the same judge model,
+               RUBRIC_VERSION, query, answer and chunk ids is reused.
+    
+    Returns:
+        Dict with keys: groundedness_score, groundedness_rationale,
+        citation_score, citation_rationale, failure_tags, judge_model,
+        judge_input_tokens, judge_output_tokens, the prompt-cache counts
+        judge_cache_creation_tokens and judge_cache_read_tokens, and
+        judge_cache ("hit" or "miss") when a JudgeCache is given.
+    """
+    key = None
+    if cache is not None:
+        key = JudgeCache.make_key(model, RUBRIC_VERSION, query, answer, chunks)
+        cached = cache.get(key)
+        if cached is not None:
+            return {**cached, "judge_cache": "hit"}
+    
+    client = client or anthropic.Anthropic()  # reads ANTHROPIC_API_KEY from env
+    response = client.messages.create(
+        **build_scoring_request(query, answer, chunks, model)
+    )
+    result = parse_scoring_response(response, model)
+    
+    if cache is not None:
+        _cache_result(cache, key, result, model)
+        result["judge_cache"] = "miss"
     
     return result
+
+
+def score_responses_batch(
+    items: list[dict],
+    model: str = "claude-opus-4-6",
+    client: Optional[anthropic.Anthropic] = None,
+    cache: Optional[JudgeCache] = None,
+    poll_interval: float = 30.0,
+) -> list[dict | Exception]:
+    """Score many responses with one Message Batch instead of serial calls.
+    
+    Cached verdicts are returned directly; only cache misses are submitted.
+    
+    Args:
+        items: Dicts with keys query, answer, chunks (as for score_response).
+        model: Anthropic model to use for judging.
+        client: Anthropic client with messages.batches.
+        cache: Optional JudgeCache, read before and filled after the batch.
+        poll_interval: Seconds between batch status checks.
+    
+    Returns:
+        One entry per item, in order: a score_response()-style dict, or the
+        Exception for a request the batch failed to process.
+    """
+    results: list = [None] * len(items)
+    keys = [
+        JudgeCache.make_key(model, RUBRIC_VERSION, it["query"], it["answer"], it["chunks"])
+        for it in items
+    ]
+    
+    pending = []
+    for i, (item, key) in enumerate(zip(items, keys)):
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            results[i] = {**cached, "judge_cache": "hit"}
+        else:
+            pending.append(i)
+    
+    if pending:
+        client = client or anthropic.Anthropic()
+        responses = run_batch(
+            client,
+            [
+                build_scoring_request(
+                    items[i]["query"], items[i]["answer"], items[i]["chunks"], model
+                )
+                for i in pending
+            ],
+            poll_interval=poll_interval,
+        )
+        for i, response in zip(pending, responses):
+            if isinstance(response, Exception):
+                results[i] = response
+                continue
+            result = parse_scoring_response(response, model)
+            if cache is not None:
+                _cache_result(cache, keys[i], result, model)
+                result["judge_cache"] = "miss"
+            results[i] = result
+    
+    return results
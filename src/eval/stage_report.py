@@ -0,0 +1,128 @@
+"""
+stage_report.py — Per-stage latency percentiles from the query log.
+
+Reads the "trace" spans the pipeline writes into each entry of
+logs/rag_queries.jsonl (load, embed, search, rerank, prompt_build,
+generate) and reports count, mean and p50/p95/p99 per stage,
+plus time-to-first-token and total latency from "timing". Each stage's
+share of the summed stage time shows where a query's latency goes.
+
+Rotated (and compressed) log segments written by LogSink are read too.
+log_write, the append of an entry, can't be inside the line it writes;
+it is in the --trace-file export, and LogSink.stats() reports the
+writer's own write time.
+Entries written before tracing existed have no "trace" and are skipped.
+A stage recorded more than once in a query (e.g. several "load" spans on
+a cold start) counts as one sample: its summed duration. Stages a query
+did not run (e.g. "rerank" with --no-rerank, "load" on a warm pipeline)
+are absent from that query rather than counted as zero.
+
+Usage:
+    python -m src.eval.stage_report
+    python -m src.eval.stage_report --log logs/rag_queries.jsonl --last 200 \
+        --output logs/stage_report.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from src.rag.log_sink import iter_log_entries
+from src.rag.tracing import STAGES, stage_durations
+
+
+def load_traced_entries(log_path: str | Path, last: Optional[int] = None) -> list[dict]:
+    """Log entries that carry a trace, oldest first (the last N if given)."""
+    entries = [e for e in iter_log_entries(log_path) if "trace" in e]
+    return entries[-last:] if last else entries
+
+
+def _summarize(values_ms: list[float]) -> dict:
+    p50, p95, p99 = np.percentile(values_ms, [50, 95, 99])
+    return {
+        "count": len(values_ms),
+        "mean_ms": round(float(np.mean(values_ms)), 2),
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+    }
+
+
+def stage_report(entries: list[dict]) -> dict:
+    """Percentiles per stage and for end-to-end latency.
+
+    Returns:
+        Dict with:
+            n_entries: Number of traced entries.
+            stages: {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, share}},
+                    in pipeline order, then any other span names.
+            latency: {"time_to_first_token": {...}, "total": {...}} when
+                     entries have "timing".
+    """
+    per_stage: dict[str, list[float]] = {}
+    for entry in entries:
+        for name, ms in stage_durations(entry["trace"]).items():
+            per_stage.setdefault(name, []).append(ms)
+
+    names = [s for s in STAGES if s in per_stage] + sorted(set(per_stage) - set(STAGES))
+    grand_total = sum(sum(v) for v in per_stage.values()) or 1.0
+    stages = {}
+    for name in names:
+        stages[name] = _summarize(per_stage[name])
+        stages[name]["share"] = round(sum(per_stage[name]) / grand_total, 4)
+
+    latency = {}
+    timed = [e["timing"] for e in entries if "timing" in e]
+    if timed:
+        latency["time_to_first_token"] = _summarize(
+            [t["time_to_first_token_seconds"] * 1000 for t in timed]
+        )
+        latency["total"] = _summarize([t["total_seconds"] * 1000 for t in timed])
+
+    return {"n_entries": len(entries), "stages": stages, "latency": latency}
+
+
+def print_report(report: dict):
+    """Print the stage table."""
+    print(f"\nStage latency over {report['n_entries']} traced queries")
+    print(f"  {'stage':<20s} {'n':>5s} {'mean ms':>9s} {'p50 ms':>9s} "
+          f"{'p95 ms':>9s} {'p99 ms':>9s} {'share':>6s}")
+    rows = [(name, s, f"{s['share']:>6.1%}") for name, s in report["stages"].items()]
+    rows += [(name, s, "") for name, s in report["latency"].items()]
+    for name, s, share in rows:
+        print(f"  {name:<20s} {s['count']:>5d} {s['mean_ms']:>9.1f} {s['p50_ms']:>9.1f} "
+              f"{s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {share:>6s}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Per-stage latency percentiles from the RAG query log"
+    )
+    parser.add_argument("--log", default="logs/rag_queries.jsonl",
+                        help="Query log JSONL (default: logs/rag_queries.jsonl)")
+    parser.add_argument("--last", type=int, default=None,
+                        help="Only the most recent N traced entries")
+    parser.add_argument("--output", default=None,
+                        help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    entries = load_traced_entries(args.log, last=args.last)
+    if not entries:
+        print(f"No traced entries in {args.log} (entries need a \"trace\" field)")
+        return
+
+    report = stage_report(entries)
+    print_report(report)
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
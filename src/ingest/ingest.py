@@ -10,10 +10,25 @@ Usage:
 
 Workflow:
     1. Discover all *_chunked.md files in --chunks-dir.
-    2. Parse each file into chunks with metadata (parser.py).
-    3. Enrich with manifest metadata (year, source_type, venue, tags).
-    4. Generate embeddings using sentence-transformers/all-mpnet-base-v2.
-    5. Upsert into ChromaDB collection with metadata.
+    2. Skip files whose content hash matches the ingest state file.
+    3. Parse each changed file into chunks with metadata (parser.py).
+    4. Enrich with manifest metadata (year, source_type, venue, tags).
+    5. Generate embeddings using sentence-transformers/all-mpnet-base-v2.
+    6. Upsert new/changed chunks, delete removed ones.
+    7. Rebuild the BM25 lexical index used by hybrid retrieval.
+
+Ingest is incremental: db_path/ingest_state_<collection>.json records a
+content hash per file and per chunk. Pass --full to rebuild from scratch.
+
+HNSW index parameters (cosine space):
+    --hnsw-m                Graph degree M (ChromaDB default 16)
+    --hnsw-construction-ef  Candidate list size while building (default 100)
+    --hnsw-search-ef        Candidate list size while searching (default 100)
+M and construction_ef are fixed when the collection is created, so
+changing them needs --full. --hnsw-search-ef also updates an existing
+collection; it is the only way search_ef changes, and processes already
+serving queries keep the old value until restarted (see src.rag.hnsw).
+src/bench/bench_hnsw.py measures recall against exact search.
 
 Requirements:
     pip install chromadb sentence-transformers
@@ -30,7 +45,11 @@ ChromaDB metadata schema per chunk:
 '''
 
 import argparse
+import hashlib
+import json
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from typing import Optional
 
@@ -38,30 +57,41 @@ from typing import Optional
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
 
 from src.ingest.parser import (
-    parse_chunked_file,
+    parse_chunked_document,
     load_manifest,
     enrich_chunks_with_manifest,
     build_composite_id,
 )
+from src.rag.hnsw import hnsw_configuration, hnsw_params, set_search_ef
+from src.rag.lexical import BM25Index, get_lexical_index_path
 
 # I chose this model as a higher performance option which shouldn't be too slow with a corpus this size.
 # I do have the argument to allow testing with other models if needed.
-def get_embedding_function(model_name: str = 'all-mpnet-base-v2'):
+def get_embedding_function(
+    model_name: str = 'all-mpnet-base-v2',
+    cache_dir: Optional[str | Path] = None,
+):
     '''Load sentence-transformers model and return a ChromaDB-compatible 
     embedding function.
     
+    The function caches embeddings by content hash, so texts it has seen
+    before (in this process, or in cache_dir) skip the model.
+    
     Args:
         model_name: HuggingFace model name for sentence-transformers
+        cache_dir:  Optional directory for the on-disk embedding cache
     
     Returns:
-        chromadb.utils.embedding_functions.SentenceTransformerEmbeddingFunction
+        src.rag.embedding_cache.CachedSentenceTransformerEmbeddingFunction
     '''
-    from chromadb.utils.embedding_functions import (
-        SentenceTransformerEmbeddingFunction,
+    from src.rag.embedding_cache import (
+        CachedSentenceTransformerEmbeddingFunction,
     )
     
     print(f'Loading embedding model: {model_name}')
-    ef = SentenceTransformerEmbeddingFunction(model_name=model_name)
+    ef = CachedSentenceTransformerEmbeddingFunction(
+        model_name=model_name, cache_dir=cache_dir
+    )
     print('Embedding model loaded.')
     return ef
 
@@ -73,6 +103,196 @@ def discover_chunked_files(chunks_dir: Path) -> list[Path]:
     return files
 
 
+def _sha256(data: bytes | str) -> str:
+    '''Hex SHA-256 of bytes or UTF-8 text.'''
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_to_record(chunk: dict) -> tuple[str, str, dict]:
+    '''Convert an enriched chunk dict into (id, document, metadata) for ChromaDB.'''
+    composite_id = build_composite_id(chunk['source_id'], chunk['chunk_id'])
+    metadata = {
+        'source_id': chunk['source_id'],
+        'chunk_id': chunk['chunk_id'],
+        'section_id': chunk['section_id'],
+        'section_title': chunk['section_title'],
+        'year': chunk['year'],
+        'doc_type': chunk['doc_type'],
+        'venue': chunk['venue'],
+        'authors': chunk['authors'],
+    }
+    return composite_id, chunk['text'], metadata
+
+
+def hash_record(document: str, metadata: dict) -> str:
+    '''Content hash of one chunk: its text plus its ChromaDB metadata.'''
+    return _sha256(json.dumps([document, metadata], sort_keys=True, ensure_ascii=False))
+
+
+def hash_file(filepath: Path, manifest: dict[str, dict]) -> str:
+    '''Content hash of a chunked file plus its manifest row.
+    
+    Including the manifest row means a manifest edit (e.g. a corrected
+    year) re-processes the file even though its text did not change.
+    '''
+    source_id = filepath.name.removesuffix('_chunked.md')
+    manifest_row = json.dumps(manifest.get(source_id, {}), sort_keys=True)
+    return _sha256(filepath.read_bytes() + manifest_row.encode('utf-8'))
+
+
+def get_state_path(db_path: Path, collection_name: str) -> Path:
+    '''Location of the incremental ingest state file for a collection.'''
+    return db_path / f'ingest_state_{collection_name}.json'
+
+
+def load_ingest_state(state_path: Path) -> dict:
+    '''Load the ingest state file, or an empty state if it does not exist.
+    
+    State schema:
+        {
+          'model_name': str,
+          'files': {
+            '<file name>': {
+              'hash': str,
+              'chunks': {'<source_id::chunk_id>': '<chunk hash>', ...}
+            }
+          }
+        }
+    '''
+    if not state_path.exists():
+        return {'model_name': None, 'files': {}}
+    with open(state_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_ingest_state(state_path: Path, state: dict):
+    '''Write the ingest state file atomically (temp file + rename).'''
+    tmp_path = state_path.with_suffix('.json.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    tmp_path.replace(state_path)
+
+
+def corpus_hash(db_path: str | Path, collection_name: str) -> str | None:
+    '''Content hash of an ingested corpus, from its ingest state file.
+    
+    Covers the embedding model and every chunk's id and content hash, so
+    it changes whenever any chunk is added, edited or removed.
+    
+    Returns:
+        16-char hex digest, or None if the collection has no state file.
+    '''
+    state_path = get_state_path(Path(db_path), collection_name)
+    if not state_path.exists():
+        return None
+    state = load_ingest_state(state_path)
+    chunk_hashes = sorted(
+        f'{chunk_id}={h}'
+        for entry in state['files'].values()
+        for chunk_id, h in entry['chunks'].items()
+    )
+    return _sha256('\n'.join([str(state['model_name'])] + chunk_hashes))[:16]
+
+
+def _parse_and_enrich(
+    filepath: Path, manifest: dict[str, dict]
+) -> tuple[list[dict], str | None, list[tuple[int, str]]]:
+    '''Parse one chunked file and merge manifest metadata.
+    
+    Top-level so it can run in a worker process. Errors are returned
+    rather than raised so one bad file doesn't abort the pool.
+    
+    Returns:
+        (chunks, error message or None, malformed (line_number, line) list)
+    '''
+    try:
+        doc = parse_chunked_document(filepath)
+        chunks = enrich_chunks_with_manifest(doc['chunks'], manifest)
+        return chunks, None, doc['malformed']
+    except Exception as e:
+        return [], str(e), []
+
+
+def parse_files(
+    files: list[Path],
+    manifest: dict[str, dict],
+    workers: int = 1,
+) -> list[tuple[list[dict], str | None, list[tuple[int, str]]]]:
+    '''Parse files serially, or in a process pool when workers > 1.
+    
+    Returns:
+        One (chunks, error, malformed) tuple per file, in the same order
+        as files.
+    '''
+    if workers <= 1 or len(files) <= 1:
+        return [_parse_and_enrich(fp, manifest) for fp in files]
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_parse_and_enrich, files, [manifest] * len(files)))
+
+
+def embed_and_upsert(
+    collection,
+    ef,
+    ids: list[str],
+    documents: list[str],
+    metadatas: list[dict],
+    batch_size: int = 50,
+    embed_batch_size: int = 64,
+) -> dict:
+    '''Embed chunks explicitly and upsert them, overlapping the two stages.
+    
+    A single writer thread runs collection.upsert for batch k while the
+    main thread embeds batch k+1 (the model and SQLite both release the
+    GIL for most of their work). At most one write is in flight.
+    
+    Args:
+        collection:       ChromaDB collection
+        ef:               Embedding function (called as ef(list_of_texts))
+        ids, documents, metadatas: Parallel lists of records to upsert
+        batch_size:       Records per collection.upsert call
+        embed_batch_size: Texts per embedding call
+    
+    Returns:
+        Dict with embed_seconds and write_seconds (summed stage time).
+    '''
+    timings = {'embed_seconds': 0.0, 'write_seconds': 0.0}
+    
+    def write(start: int, end: int, embeddings: list):
+        t0 = time.perf_counter()
+        collection.upsert(
+            ids=ids[start:end],
+            embeddings=embeddings,
+            documents=documents[start:end],
+            metadatas=metadatas[start:end],
+        )
+        timings['write_seconds'] += time.perf_counter() - t0
+        print(f'  Upserted batch {start+1}-{end} of {total}')
+    
+    total = len(ids)
+    pending = None
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        for start in range(0, total, batch_size):
+            end = min(start + batch_size, total)
+            
+            t0 = time.perf_counter()
+            embeddings = []
+            for e_start in range(start, end, embed_batch_size):
+                e_end = min(e_start + embed_batch_size, end)
+                embeddings.extend(ef(documents[e_start:e_end]))
+            timings['embed_seconds'] += time.perf_counter() - t0
+            
+            if pending is not None:
+                pending.result()  # surface write errors, keep one in flight
+            pending = writer.submit(write, start, end, embeddings)
+        if pending is not None:
+            pending.result()
+    
+    return timings
+
+
 def ingest(
     chunks_dir: str | Path,
     manifest_path: str | Path,
@@ -80,9 +300,22 @@ def ingest(
     collection_name: str = 'space_debris_rag',
     model_name: str = 'all-mpnet-base-v2',
     batch_size: int = 50,
+    embedding_cache_dir: Optional[str | Path] = None,
+    full: bool = False,
+    workers: int = 1,
+    embed_batch_size: int = 64,
+    hnsw_m: Optional[int] = None,
+    hnsw_construction_ef: Optional[int] = None,
+    hnsw_search_ef: Optional[int] = None,
 ):
     '''Main ingest pipeline.
     
+    Incremental by default: a state file next to the ChromaDB storage
+    records a content hash per file and per chunk. Unchanged files and
+    chunks are skipped, new or changed chunks are upserted, and chunks
+    that disappeared from a file (or whose file was removed) are deleted
+    from the collection.
+    
     Args:
         chunks_dir:      Directory containing *_chunked.md files
         manifest_path:   Path to data_manifest.csv
@@ -90,6 +323,15 @@ def ingest(
         collection_name: Name of the ChromaDB collection
         model_name:      Sentence-transformers model name
         batch_size:      Number of chunks to upsert per batch
+        embedding_cache_dir: Optional on-disk embedding cache directory
+        full:            Drop the collection and state and rebuild everything
+        workers:         Worker processes for parsing (1 = in-process)
+        embed_batch_size: Texts per embedding call (independent of batch_size)
+        hnsw_m:          HNSW graph degree M for a new collection
+        hnsw_construction_ef: HNSW build-time candidate list size for a new collection
+        hnsw_search_ef:  HNSW search-time candidate list size (also updated
+                         on an existing collection; running query
+                         processes pick it up when restarted)
     '''
     import chromadb
     
@@ -108,69 +350,147 @@ def ingest(
         print('No chunked files found. Exiting.')
         return
     
-    # 3. Parse all chunks.
-    all_chunks = []
-    for fp in chunked_files:
-        try:
-            chunks = parse_chunked_file(fp)
-            chunks = enrich_chunks_with_manifest(chunks, manifest)
-            all_chunks.extend(chunks)
-            print(f'  Parsed {fp.name}: {len(chunks)} chunks')
-        except Exception as e:
-            print(f'  ERROR parsing {fp.name}: {e}')
-    
-    print(f'\nTotal chunks to ingest: {len(all_chunks)}')
-    
-    # 4. Set up ChromaDB.
+    # 3. Set up ChromaDB.
     print(f'\nInitializing ChromaDB at {db_path}...')
     db_path.mkdir(parents=True, exist_ok=True)
     client = chromadb.PersistentClient(path=str(db_path))
     
+    # 4. Load previous ingest state; fall back to a full rebuild when the
+    #    state can't be trusted.
+    state_path = get_state_path(db_path, collection_name)
+    state = load_ingest_state(state_path)
+    if not full and state['files'] and state.get('model_name') != model_name:
+        print(f'  Embedding model changed ({state.get("model_name")} -> {model_name}); '
+              'doing a full rebuild')
+        full = True
+    if full:
+        if collection_name in {c.name for c in client.list_collections()}:
+            client.delete_collection(collection_name)
+            print(f'  Deleted collection "{collection_name}" for full rebuild')
+        state = {'model_name': model_name, 'files': {}}
+    
     # 5. Load embedding function.
-    ef = get_embedding_function(model_name)
+    ef = get_embedding_function(model_name, cache_dir=embedding_cache_dir)
     
     # 6. Create or get collection.
     collection = client.get_or_create_collection(
         name=collection_name,
         embedding_function=ef,
-        metadata={'hnsw:space': 'cosine'},  # cosine similarity
+        configuration=hnsw_configuration(hnsw_m, hnsw_construction_ef, hnsw_search_ef),
     )
-    print(f'Collection "{collection_name}" ready (existing count: {collection.count()})')
+    # An existing collection keeps its build parameters; only search_ef changes
+    params = hnsw_params(collection)
+    for name, wanted in (('M', hnsw_m), ('construction_ef', hnsw_construction_ef)):
+        if wanted is not None and params[name] != wanted:
+            print(f'  WARNING: collection was built with {name}={params[name]}; '
+                  f'pass --full to rebuild it with {name}={wanted}')
+    if hnsw_search_ef is not None and set_search_ef(collection, hnsw_search_ef):
+        params['search_ef'] = hnsw_search_ef
+    print(f'Collection "{collection_name}" ready (existing count: {collection.count()}; '
+          f'HNSW M={params["M"]}, construction_ef={params["construction_ef"]}, '
+          f'search_ef={params["search_ef"]})')
+    if collection.count() == 0 and state['files']:
+        print('  Collection is empty but ingest state exists; re-ingesting everything')
+        state = {'model_name': model_name, 'files': {}}
     
-    # 7. Prepare and upsert in batches.
+    # 7. Parse changed files and diff their chunks against the state.
     ids = []
     documents = []
     metadatas = []
+    delete_ids = []
+    counts = {'added': 0, 'updated': 0, 'deleted': 0, 'skipped': 0}
+    new_files = {}
     
-    for chunk in all_chunks:
-        composite_id = build_composite_id(chunk['source_id'], chunk['chunk_id'])
-        ids.append(composite_id)
-        documents.append(chunk['text'])
-        metadatas.append({
-            'source_id': chunk['source_id'],
-            'chunk_id': chunk['chunk_id'],
-            'section_id': chunk['section_id'],
-            'section_title': chunk['section_title'],
-            'year': chunk['year'],
-            'doc_type': chunk['doc_type'],
-            'venue': chunk['venue'],
-            'authors': chunk['authors'],
-        })
-    
-    # Upsert in batches.
-    total = len(ids)
-    for start in range(0, total, batch_size):
-        end = min(start + batch_size, total)
-        collection.upsert(
-            ids=ids[start:end],
-            documents=documents[start:end],
-            metadatas=metadatas[start:end],
-        )
-        print(f'  Upserted batch {start+1}-{end} of {total}')
+    changed = []
+    for fp in chunked_files:
+        old_entry = state['files'].get(fp.name, {'hash': None, 'chunks': {}})
+        file_hash = hash_file(fp, manifest)
+        if file_hash == old_entry['hash']:
+            new_files[fp.name] = old_entry
+            counts['skipped'] += len(old_entry['chunks'])
+        else:
+            changed.append((fp, file_hash, old_entry))
+    
+    parse_start = time.perf_counter()
+    parsed = parse_files([fp for fp, _, _ in changed], manifest, workers=workers)
+    parse_seconds = time.perf_counter() - parse_start
+    
+    for (fp, file_hash, old_entry), (chunks, error, malformed) in zip(changed, parsed):
+        for line_no, line in malformed:
+            print(f'  WARNING {fp.name}:{line_no}: malformed chunk line skipped: {line[:80]}')
+        if error is not None:
+            print(f'  ERROR parsing {fp.name}: {error}')
+            # Keep the previous state so its chunks are not deleted.
+            if old_entry['hash'] is not None:
+                new_files[fp.name] = old_entry
+            continue
+        
+        old_chunks = old_entry['chunks']
+        new_chunks = {}
+        for chunk in chunks:
+            composite_id, document, metadata = chunk_to_record(chunk)
+            chunk_hash = hash_record(document, metadata)
+            new_chunks[composite_id] = chunk_hash
+            if old_chunks.get(composite_id) == chunk_hash:
+                counts['skipped'] += 1
+                continue
+            counts['updated' if composite_id in old_chunks else 'added'] += 1
+            ids.append(composite_id)
+            documents.append(document)
+            metadatas.append(metadata)
+        
+        removed = [cid for cid in old_chunks if cid not in new_chunks]
+        delete_ids.extend(removed)
+        new_files[fp.name] = {'hash': file_hash, 'chunks': new_chunks}
+        print(f'  Parsed {fp.name}: {len(chunks)} chunks ({len(removed)} removed)')
+    
+    # Files that no longer exist: delete all of their chunks.
+    for name, entry in state['files'].items():
+        if name not in new_files:
+            delete_ids.extend(entry['chunks'])
+            print(f'  {name} no longer exists; deleting {len(entry["chunks"])} chunks')
+    counts['deleted'] = len(delete_ids)
+    
+    print(f'\nChunks to upsert: {len(ids)}, to delete: {len(delete_ids)}')
+    
+    # 8. Delete stale chunks, then embed and upsert in overlapping batches.
+    delete_start = time.perf_counter()
+    for start in range(0, len(delete_ids), batch_size):
+        collection.delete(ids=delete_ids[start:start + batch_size])
+    delete_seconds = time.perf_counter() - delete_start
+    
+    write_start = time.perf_counter()
+    timings = embed_and_upsert(
+        collection, ef, ids, documents, metadatas,
+        batch_size=batch_size, embed_batch_size=embed_batch_size,
+    )
+    embed_write_wall = time.perf_counter() - write_start
+    ef.flush()
+    
+    save_ingest_state(state_path, {'model_name': model_name, 'files': new_files})
+    
+    # Rebuild the BM25 index from the collection so it always mirrors it.
+    lexical_start = time.perf_counter()
+    lexical_path = get_lexical_index_path(db_path, collection_name)
+    lexical_index = BM25Index.from_collection(collection)
+    lexical_index.save(lexical_path)
+    lexical_seconds = time.perf_counter() - lexical_start
+    print(f'Saved BM25 index ({len(lexical_index)} chunks, '
+          f'{len(lexical_index.terms)} terms) to {lexical_path}')
     
     print(f'\nIngestion complete. Collection now has {collection.count()} chunks.')
+    print(f'  added={counts["added"]} updated={counts["updated"]} '
+          f'deleted={counts["deleted"]} skipped={counts["skipped"]}')
+    print('\n--- Timing ---')
+    print(f'  parse:  {parse_seconds:7.2f}s ({len(changed)} files, workers={workers})')
+    print(f'  embed:  {timings["embed_seconds"]:7.2f}s (embed batch size {embed_batch_size})')
+    print(f'  write:  {timings["write_seconds"] + delete_seconds:7.2f}s '
+          f'(upsert batch size {batch_size}, incl. {delete_seconds:.2f}s deletes)')
+    print(f'  lexical index: {lexical_seconds:.2f}s')
+    print(f'  embed+write wall time: {embed_write_wall:.2f}s '
+          f'(overlap saved {timings["embed_seconds"] + timings["write_seconds"] - embed_write_wall:.2f}s)')
     
-    # 8. Quick sanity check
+    # 9. Quick sanity check
     print('\n--- Sanity Check ---')
     results = collection.query(
         query_texts=['collision avoidance machine learning'],
@@ -182,6 +502,8 @@ def ingest(
         print(f'  [{i+1}] {doc_id} (dist={dist:.4f})')
         print(f'      {doc[:120]}...')
     
+    return counts
+    
 
 def main():
     parser = argparse.ArgumentParser(
@@ -223,6 +545,49 @@ def main():
         default=50,
         help='Batch size for ChromaDB upserts',
     )
+    parser.add_argument(
+        '--embed-batch-size',
+        type=int,
+        default=64,
+        help='Batch size for embedding calls (independent of --batch-size)',
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Worker processes for parsing files (default: 1, in-process)',
+    )
+    parser.add_argument(
+        '--embedding-cache',
+        type=str,
+        default=None,
+        help='Directory for the on-disk embedding cache (default: memory only)',
+    )
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='Ignore the ingest state and rebuild the whole collection',
+    )
+    parser.add_argument(
+        '--hnsw-m',
+        type=int,
+        default=None,
+        help='HNSW graph degree M for a new collection (default: ChromaDB, 16)',
+    )
+    parser.add_argument(
+        '--hnsw-construction-ef',
+        type=int,
+        default=None,
+        help='HNSW candidate list size while building a new collection '
+             '(default: ChromaDB, 100)',
+    )
+    parser.add_argument(
+        '--hnsw-search-ef',
+        type=int,
+        default=None,
+        help='HNSW candidate list size while searching; also updates an existing '
+             'collection, for query processes started afterwards (default: ChromaDB, 100)',
+    )
     
     args = parser.parse_args()
     
@@ -233,6 +598,13 @@ def main():
         collection_name=args.collection,
         model_name=args.model,
         batch_size=args.batch_size,
+        embedding_cache_dir=args.embedding_cache,
+        full=args.full,
+        workers=args.workers,
+        embed_batch_size=args.embed_batch_size,
+        hnsw_m=args.hnsw_m,
+        hnsw_construction_ef=args.hnsw_construction_ef,
+        hnsw_search_ef=args.hnsw_search_ef,
     )
 
 
@@ -13,6 +13,11 @@ This module extracts each chunk as a dict with:
   - text: the paragraph content
   - section_title: the section/subsection heading
   - section_id: e.g. 'sec2.1'
+
+parse_chunked_document() does all of this in one streaming pass over the
+file and also returns the header metadata and the line numbers of any
+malformed chunk lines. parse_chunked_file() and parse_header_metadata()
+are thin views over it.
 '''
 
 import re
@@ -21,54 +26,122 @@ from pathlib import Path
 from typing import Optional
 
 
-def parse_chunked_file(filepath: str | Path) -> list[dict]:
-    '''Parse a single chunked markdown file into a list of chunk dicts.
+# Precompiled line patterns (see CHUNKING_PROTOCOL.md).
+# Document header: '# source_id -- Title'.
+HEADER_RE = re.compile(r'^#\s+(\S+)\s+--\s+(.+)')
+# Section headers: '## secN -- Title'  or  '### secN.M -- Title'.
+SECTION_RE = re.compile(r'^#{2,3}\s+(sec[\d.]+)\s+--\s+(.+)')
+# Chunk lines: '[secN_pM] text'  or  '[secN.M_pK] text'. Some chunks have
+# suffixes like [sec2.3_p1_1]. Group 2 is the section_id (everything before _p).
+CHUNK_RE = re.compile(r'^\[((sec[\d.]+)_p\d+(?:_\d+)?)\]\s+(.+)')
+# Header key/value lines: '**Key:** Value'.
+HEADER_KV_RE = re.compile(r'^\*\*(.+?):\*\*\s+(.+)')
+
+# parse_header_metadata only looks at the first 20 lines.
+HEADER_SCAN_LINES = 20
+
+
+def parse_chunked_document(
+    filepath: str | Path,
+    header_only: bool = False,
+    strict: bool = True,
+) -> dict:
+    '''Parse a chunked markdown file in one streaming pass.
+    
+    Reads the file line by line and returns the header metadata and the
+    chunks together, so callers that need both don't read the file twice.
+    
+    Args:
+        filepath:    Path to a *_chunked.md file.
+        header_only: Stop at the first section header (metadata only).
+        strict:      Raise ValueError if the '# source_id -- Title' header
+                     line is missing.
     
     Returns:
-        List of dicts, each with keys:
-            source_id, chunk_id, text, section_id, section_title
+        Dict with keys:
+            metadata:  Same dict as parse_header_metadata()
+            chunks:    Same list as parse_chunked_file()
+            malformed: List of (line_number, line) for lines that start
+                       like a chunk ('[sec...') but don't match the chunk
+                       format; these are not included in chunks.
     '''
     filepath = Path(filepath)
-    text = filepath.read_text(encoding='utf-8')
-    lines = text.split('\n')
-    
-    # Extract source_id from first line: '# source_id -- Title'.
-    header_match = re.match(r'^#\s+(\S+)\s+--\s+(.+)', lines[0])
-    if not header_match:
-        raise ValueError(f'Could not parse header in {filepath}: {lines[0]}')
-    source_id = header_match.group(1)
     
+    metadata = {}
     chunks = []
-    current_section_id = None
+    malformed = []
+    source_id = None
     current_section_title = None
+    in_header = True
     
-    for line in lines:
-        # Match section headers: ## secN -- Title  or  ### secN.M -- Title.
-        sec_match = re.match(r'^#{2,3}\s+(sec[\d.]+)\s+--\s+(.+)', line)
-        if sec_match:
-            current_section_id = sec_match.group(1)
-            current_section_title = sec_match.group(2).strip()
-            continue
-        
-        # Match chunk lines: [secN_pM] text  or  [secN.M_pK] text.
-        # Some chunks may have suffixes like [sec2.3_p1_1].
-        chunk_match = re.match(r'^\[(sec[\d.]+_p\d+(?:_\d+)?)\]\s+(.+)', line)
-        if chunk_match:
-            chunk_id = chunk_match.group(1)
-            chunk_text = chunk_match.group(2).strip()
+    with open(filepath, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.rstrip('\n')
             
-            # Derive section_id from chunk_id (everything before _p).
-            section_from_chunk = re.match(r'(sec[\d.]+)_p', chunk_id).group(1)
+            if line_no == 1:
+                header_match = HEADER_RE.match(line)
+                if header_match:
+                    source_id = header_match.group(1)
+                    metadata['source_id'] = source_id
+                    metadata['title'] = header_match.group(2).strip()
+                elif strict:
+                    raise ValueError(f'Could not parse header in {filepath}: {line}')
+                continue
             
-            chunks.append({
-                'source_id': source_id,
-                'chunk_id': chunk_id,
-                'text': chunk_text,
-                'section_id': section_from_chunk,
-                'section_title': current_section_title or 'Unknown',
-            })
+            if in_header:
+                if line_no <= HEADER_SCAN_LINES:
+                    kv_match = HEADER_KV_RE.match(line)
+                    if kv_match:
+                        key = kv_match.group(1).strip().lower()
+                        value = kv_match.group(2).strip()
+                        if key == 'authors':
+                            metadata['authors'] = value
+                        elif key == 'venue':
+                            metadata['venue'] = value
+                        elif key in ('url', 'doi'):
+                            metadata['url_or_doi'] = value
+                if line.startswith('## ') or line_no >= HEADER_SCAN_LINES:
+                    in_header = False
+                    if header_only:
+                        break
+            
+            # Cheap first-character dispatch before running any regex.
+            first = line[:1]
+            if first == '#':
+                sec_match = SECTION_RE.match(line)
+                if sec_match:
+                    current_section_title = sec_match.group(2).strip()
+                    continue
+            
+            elif first == '[':
+                chunk_match = CHUNK_RE.match(line)
+                if chunk_match:
+                    chunks.append({
+                        'source_id': source_id,
+                        'chunk_id': chunk_match.group(1),
+                        'text': chunk_match.group(3).strip(),
+                        'section_id': chunk_match.group(2),
+                        'section_title': current_section_title or 'Unknown',
+                    })
+                    continue
+            
+            if line.lstrip().startswith('[sec'):
+                malformed.append((line_no, line))
     
-    return chunks
+    if strict and source_id is None:
+        raise ValueError(f'Could not parse header in {filepath}: file is empty')
+    
+    return {'metadata': metadata, 'chunks': chunks, 'malformed': malformed}
+
+
+def parse_chunked_file(filepath: str | Path) -> list[dict]:
+    '''Parse a single chunked markdown file into a list of chunk dicts.
+    
+    Returns:
+        List of dicts, each with keys:
+            source_id, chunk_id, text, section_id, section_title
+    '''
+    return parse_chunked_document(filepath)['chunks']
 
 
 def parse_header_metadata(filepath: str | Path) -> dict:
@@ -77,34 +150,7 @@ def parse_header_metadata(filepath: str | Path) -> dict:
     Returns:
         Dict with keys: source_id, title, authors, venue, url_or_doi
     '''
-    filepath = Path(filepath)
-    text = filepath.read_text(encoding='utf-8')
-    lines = text.split('\n')
-    
-    metadata = {}
-    
-    # Line 0: # source_id -- Title.
-    header_match = re.match(r'^#\s+(\S+)\s+--\s+(.+)', lines[0])
-    if header_match:
-        metadata['source_id'] = header_match.group(1)
-        metadata['title'] = header_match.group(2).strip()
-    
-    # Subsequent lines: **Key:** Value.
-    for line in lines[1:20]:  # Only scan first 20 lines.
-        kv_match = re.match(r'^\*\*(.+?):\*\*\s+(.+)', line)
-        if kv_match:
-            key = kv_match.group(1).strip().lower()
-            value = kv_match.group(2).strip()
-            if key == 'authors':
-                metadata['authors'] = value
-            elif key == 'venue':
-                metadata['venue'] = value
-            elif key in ('url', 'doi'):
-                metadata['url_or_doi'] = value
-        if line.startswith('## '):
-            break  # Stop at first section.
-    
-    return metadata
+    return parse_chunked_document(filepath, header_only=True, strict=False)['metadata']
 
 
 def load_manifest(manifest_path: str | Path) -> dict[str, dict]:
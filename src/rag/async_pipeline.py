@@ -0,0 +1,311 @@
+"""
+async_pipeline.py — asyncio front end to the RAG pipeline for concurrent users.
+
+AsyncRAGPipeline serves many concurrent query() calls from one process
+without a thread per request:
+
+  - Embedding and reranking are CPU-bound and stay on the wrapped
+    RAGPipeline's warm models, but run in a small bounded thread pool so
+    the event loop keeps accepting requests.
+  - Requests that arrive within batch_window_ms of each other are
+    micro-batched: their embeddings are computed in one retrieve_many()
+    call and their candidates scored in one rerank_many() call.
+  - Generation uses the async Anthropic client, so any number of API
+    calls can be in flight at once.
+
+Logging matches RAGPipeline.query(): one JSONL entry per query, with timing
+and stage spans. The response-cache lookups and the log writes are
+blocking file I/O, so they run on a single I/O thread, never on the event
+loop. Spans of a shared batch stage are copied into the trace of
+every query in the batch, with a batch_size attribute.
+
+Example:
+    pipeline = AsyncRAGPipeline()
+    await pipeline.warmup()
+    results = await asyncio.gather(*(pipeline.query(q) for q in questions))
+"""
+
+import asyncio
+import functools
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from src.rag.generator import agenerate, get_async_client
+from src.rag.pipeline import RAGPipeline
+from src.rag.tracing import Span, Trace
+
+
+class MicroBatcher:
+    """Collects items submitted within a short window and runs them as one batch.
+
+    Items are grouped by a hashable key (only items with equal keys can
+    share a batch); run_batch(key, items) runs in the executor and must
+    return one result per item, in order.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[Any, list], list],
+        executor: ThreadPoolExecutor,
+        window_seconds: float = 0.005,
+        max_batch_size: int = 32,
+    ):
+        """
+        Args:
+            run_batch: Blocking batch function, called as run_batch(key, items).
+            executor: Bounded executor the batch function runs in.
+            window_seconds: How long the first item of a batch waits for others.
+            max_batch_size: Flush as soon as this many items are pending.
+        """
+        self.run_batch = run_batch
+        self.executor = executor
+        self.window_seconds = window_seconds
+        self.max_batch_size = max_batch_size
+
+        self._pending: list[tuple[Any, Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+        self.max_seen = 0
+
+    async def submit(self, key: Any, item: Any) -> Any:
+        """Queue one item and wait for its result."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((key, item, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+
+        groups: dict[Any, list[tuple[Any, asyncio.Future]]] = {}
+        for key, item, future in pending:
+            groups.setdefault(key, []).append((item, future))
+        for key, entries in groups.items():
+            # Keep a reference so the task is not garbage-collected mid-run
+            task = asyncio.ensure_future(self._run(key, entries))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Any, entries: list[tuple[Any, asyncio.Future]]):
+        items = [item for item, _ in entries]
+        self.batches += 1
+        self.items += len(items)
+        self.max_seen = max(self.max_seen, len(items))
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, self.run_batch, key, items)
+        except Exception as e:
+            for _, future in entries:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(entries, results):
+            if not future.done():
+                future.set_result(result)
+
+    def reset_stats(self):
+        """Zero the batch counters."""
+        self.batches = self.items = self.max_seen = 0
+
+    def stats(self) -> dict:
+        """Batch count, item count, mean and max batch size."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_size": self.max_seen,
+        }
+
+
+class AsyncRAGPipeline:
+    """Async RAG pipeline: micro-batched retrieval/rerank plus async generation.
+
+    Wraps a (warm) RAGPipeline for the models, caches and logging; only
+    the scheduling differs.
+    """
+
+    def __init__(
+        self,
+        pipeline: Optional[RAGPipeline] = None,
+        client=None,
+        max_workers: int = 2,
+        batch_window_ms: float = 5.0,
+        max_batch_size: int = 32,
+        **pipeline_kwargs,
+    ):
+        """
+        Args:
+            pipeline: RAGPipeline providing the collection, models, caches
+                      and log path. Built from pipeline_kwargs if omitted.
+            client: Async Anthropic client (anthropic.AsyncAnthropic or
+                    compatible). Created on first use if omitted.
+            max_workers: Threads for embedding/reranking batches. The
+                         models are serialized by the pipeline, so a small
+                         number is enough to overlap batching with compute.
+            batch_window_ms: Micro-batching window in milliseconds.
+            max_batch_size: Maximum queries per embedding/rerank batch.
+            **pipeline_kwargs: RAGPipeline arguments when pipeline is None.
+        """
+        self.pipeline = pipeline or RAGPipeline(**pipeline_kwargs)
+        self._client = client
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="rag-cpu"
+        )
+        # One thread keeps log appends in completion order
+        self.io_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="rag-io"
+        )
+        self.batcher = MicroBatcher(
+            self._retrieve_and_rerank_batch,
+            self.executor,
+            window_seconds=batch_window_ms / 1000.0,
+            max_batch_size=max_batch_size,
+        )
+
+    @property
+    def client(self):
+        """Async Anthropic API client (created once)."""
+        if self._client is None:
+            self._client = get_async_client()
+        return self._client
+
+    async def warmup(self, rerank: bool = True, client: bool = True) -> "AsyncRAGPipeline":
+        """Load every model in the executor (see RAGPipeline.warmup())."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self.executor, lambda: self.pipeline.warmup(rerank=rerank, client=False)
+        )
+        if client:
+            self.client
+        return self
+
+    def _retrieve_and_rerank_batch(
+        self, key: tuple, queries: list[str]
+    ) -> list[tuple[list[dict], list[dict], list[Span]]]:
+        """One batched retrieve_many() + rerank_many() call (runs in the executor).
+
+        Returns:
+            Per query: (retrieved, reranked, spans of the shared batch).
+        """
+        n_retrieve, n_rerank, skip_rerank, where_json = key
+        where = json.loads(where_json) if where_json else None
+
+        batch = Trace()
+        with batch.active():
+            retrieved_lists = self.pipeline.retrieve_many(
+                queries, n_retrieve=n_retrieve, where=where
+            )
+            if skip_rerank:
+                reranked_lists = [r[:n_rerank] for r in retrieved_lists]
+                for reranked in reranked_lists:
+                    for chunk in reranked:
+                        chunk["rerank_score"] = None
+            else:
+                reranked_lists = self.pipeline.rerank_many(
+                    queries, retrieved_lists, n_rerank=n_rerank
+                )
+        for span in batch.spans:
+            span.attributes["batch_size"] = len(queries)
+        return [
+            (retrieved, reranked, batch.spans)
+            for retrieved, reranked in zip(retrieved_lists, reranked_lists)
+        ]
+
+    async def _submit(
+        self,
+        query: str,
+        n_retrieve: int,
+        n_rerank: int,
+        where: Optional[dict],
+        skip_rerank: bool,
+    ) -> tuple[list[dict], list[dict], list[Span]]:
+        # Only requests with identical stage parameters can share a batch
+        key = (n_retrieve, n_rerank, skip_rerank,
+               json.dumps(where, sort_keys=True) if where else None)
+        return await self.batcher.submit(key, query)
+
+    async def retrieve_and_rerank(
+        self,
+        query: str,
+        n_retrieve: int = 20,
+        n_rerank: int = 10,
+        where: Optional[dict] = None,
+        skip_rerank: bool = False,
+    ) -> tuple[list[dict], list[dict]]:
+        """Retrieval and reranking for one query, batched with concurrent calls.
+
+        Returns:
+            Tuple of (retrieved chunks, chunks to pass to the LLM).
+        """
+        retrieved, reranked, _ = await self._submit(
+            query, n_retrieve, n_rerank, where, skip_rerank
+        )
+        return retrieved, reranked
+
+    async def query(
+        self,
+        query: str,
+        n_retrieve: int = 20,
+        n_rerank: int = 10,
+        where: Optional[dict] = None,
+        model: Optional[str] = None,
+        max_tokens: int = 2048,
+        log_path: Optional[str | Path] = None,
+        skip_rerank: bool = False,
+        metadata: Optional[dict] = None,
+    ) -> dict:
+        """Run the full RAG pipeline for a single query (see RAGPipeline.query()).
+
+        Returns:
+            Dict with keys answer, chunks_used and log_entry.
+        """
+        trace = Trace()
+        log_path = log_path or self.pipeline.log_path
+
+        # 1-2. Retrieve and rerank (micro-batched, in the executor)
+        retrieved, reranked, batch_spans = await self._submit(
+            query, n_retrieve, n_rerank, where, skip_rerank
+        )
+        trace.add_spans(batch_spans)
+
+        # 3. Generate (async API call); each task has its own context, so
+        # concurrent queries record into their own traces
+        with trace.active():
+            gen_result = await agenerate(
+                query,
+                reranked,
+                model=model or self.pipeline.model,
+                max_tokens=max_tokens,
+                client=self.client,
+                cache=self.pipeline.response_cache,
+                executor=self.io_executor,
+            )
+        end_time = time.perf_counter()
+        self.pipeline.print_generated(gen_result)
+
+        # 4. Log (blocking append, on the I/O thread)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.io_executor, functools.partial(
+            self.pipeline.log_result,
+            query, retrieved, reranked, gen_result, log_path, metadata,
+            timing=RAGPipeline._timing(trace.start, end_time, end_time, False),
+            trace=trace,
+        ))
+
+    def close(self):
+        """Flush the embedding cache and shut down both executors."""
+        self.pipeline.flush()
+        self.executor.shutdown(wait=True)
+        self.io_executor.shutdown(wait=True)
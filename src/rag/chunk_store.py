@@ -0,0 +1,294 @@
+"""
+chunk_store.py — Compact chunk references in logs, and text rehydration.
+
+Query log entries (log_query) and eval records (run_eval) normally copy
+chunk text, or a 200-char preview, into every line, although the text
+already lives in ChromaDB and in data/processed. In the compact format a
+chunk keeps its metadata and scores, but its text is replaced by a
+reference:
+
+    "id":        "source_id::chunk_id"  (the ChromaDB document id; eval
+                 chunks reference it through their source_id and chunk_id)
+    "text_hash": first 12 hex chars of sha256(text)
+                 ("preview_hash" of the text_preview for eval chunks)
+
+The entry also records "chunk_format": "ref" and "corpus_hash", the
+ingest corpus hash of the collection it was retrieved from (see
+src.ingest.ingest.corpus_hash; None without an ingest state file).
+
+ChunkStore rehydrates text on demand from a ChromaDB collection or from
+the chunked Markdown files. rehydrate_entry() restores a query log
+entry's "text" fields; rehydrate_record() restores an eval record's
+"text_preview" fields byte-for-byte, so judge prompts and judge cache
+keys are unchanged. A chunk whose stored text no longer matches its
+text_hash (re-ingested or edited since the entry was written) is still
+filled in, but flagged "text_stale": true. A chunk the store does not
+have gets "text_missing": true.
+
+Usage:
+    # Size reduction of compacting the existing logs (nothing is written)
+    python -m src.rag.chunk_store
+
+    # Write compact copies
+    python -m src.rag.chunk_store --write
+"""
+
+import argparse
+import hashlib
+import json
+from pathlib import Path
+from typing import Iterator, Optional
+
+from src.ingest.parser import build_composite_id, parse_chunked_file
+
+CHUNK_FORMAT = "ref"
+
+# Eval records keep this many characters of text as text_preview
+PREVIEW_CHARS = 200
+
+
+def text_hash(text: str) -> str:
+    """Short content hash stored with a chunk reference."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def text_preview(text: str) -> str:
+    """The eval record text_preview of a chunk's text."""
+    return text[:PREVIEW_CHARS] + "..." if len(text) > PREVIEW_CHARS else text
+
+
+def chunk_ref(chunk: dict) -> str:
+    """Composite source_id::chunk_id of a chunk dict."""
+    return chunk.get("id") or build_composite_id(
+        chunk.get("source_id", ""), chunk.get("chunk_id", "")
+    )
+
+
+def compact_chunk(chunk: dict) -> dict:
+    """Replace a chunk's text (or text_preview) with its id and text hash.
+
+    For eval-record chunks, which only carry a preview, the hash is of the
+    preview; rehydrate_record() compares it with the preview of the
+    stored text. Empty text is kept as is (there is nothing to rehydrate).
+    """
+    if chunk.get("text"):
+        compact = {k: v for k, v in chunk.items() if k != "text"}
+        compact["text_hash"] = text_hash(chunk["text"])
+    elif chunk.get("text_preview"):
+        compact = {k: v for k, v in chunk.items() if k != "text_preview"}
+        compact["preview_hash"] = text_hash(chunk["text_preview"])
+    else:
+        compact = dict(chunk)
+    return compact
+
+
+class ChunkStore:
+    """Chunk text by composite id, from a ChromaDB collection or chunk files.
+
+    Lookups are cached, so rehydrating many entries that share popular
+    chunks fetches each chunk once.
+    """
+
+    def __init__(self, chunks: Optional[dict[str, dict]] = None, collection=None,
+                 version: Optional[str] = None):
+        """
+        Args:
+            chunks: Preloaded {composite id: chunk dict with "text"}.
+            collection: ChromaDB collection to fetch ids not in chunks.
+            version: Corpus hash of the backing collection, if known.
+        """
+        self._chunks = dict(chunks or {})
+        self.collection = collection
+        self.version = version
+
+    @classmethod
+    def from_processed(cls, chunks_dir: str | Path = "data/processed") -> "ChunkStore":
+        """Store over every *_chunked.md file in chunks_dir (no ChromaDB needed)."""
+        chunks = {}
+        for path in sorted(Path(chunks_dir).glob("*_chunked.md")):
+            for chunk in parse_chunked_file(path):
+                chunks[build_composite_id(chunk["source_id"], chunk["chunk_id"])] = chunk
+        return cls(chunks)
+
+    @classmethod
+    def from_collection(
+        cls,
+        db_path: str | Path = "data/chromadb",
+        collection_name: str = "space_debris_rag",
+    ) -> "ChunkStore":
+        """Store that fetches chunks from a ChromaDB collection on demand."""
+        import chromadb
+
+        from src.ingest.ingest import corpus_hash
+
+        client = chromadb.PersistentClient(path=str(db_path))
+        return cls(
+            collection=client.get_collection(name=collection_name),
+            version=corpus_hash(db_path, collection_name),
+        )
+
+    def get_many(self, ids: list[str]) -> dict[str, dict]:
+        """Chunk dicts (with "text") for the ids the store has."""
+        missing = sorted({i for i in ids if i not in self._chunks})
+        if missing and self.collection is not None:
+            got = self.collection.get(ids=missing, include=["documents", "metadatas"])
+            for doc_id, doc, meta in zip(got["ids"], got["documents"], got["metadatas"]):
+                self._chunks[doc_id] = {**meta, "text": doc}
+        return {i: self._chunks[i] for i in ids if i in self._chunks}
+
+    def text(self, chunk_id: str) -> Optional[str]:
+        """Text of one chunk, or None if the store does not have it."""
+        chunk = self.get_many([chunk_id]).get(chunk_id)
+        return chunk["text"] if chunk else None
+
+
+def _rehydrate_chunks(chunks: list[dict], store: ChunkStore, preview: bool) -> list[dict]:
+    hash_key = "preview_hash" if preview else "text_hash"
+    stored = store.get_many([chunk_ref(c) for c in chunks if hash_key in c])
+    out = []
+    for c in chunks:
+        if hash_key not in c:
+            out.append(c)
+            continue
+        chunk = {k: v for k, v in c.items() if k != hash_key}
+        found = stored.get(chunk_ref(c))
+        if found is None:
+            chunk["text_preview" if preview else "text"] = ""
+            chunk["text_missing"] = True
+        elif preview:
+            chunk["text_preview"] = text_preview(found["text"])
+            if text_hash(chunk["text_preview"]) != c[hash_key]:
+                chunk["text_stale"] = True
+        else:
+            chunk["text"] = found["text"]
+            if text_hash(found["text"]) != c[hash_key]:
+                chunk["text_stale"] = True
+        out.append(chunk)
+    return out
+
+
+def compact_entry(entry: dict, corpus_hash: Optional[str] = None) -> dict:
+    """Compact form of a query log entry (log_query) with full chunk text."""
+    if entry.get("chunk_format") == CHUNK_FORMAT:
+        return entry
+    compact = {**entry, "chunk_format": CHUNK_FORMAT, "corpus_hash": corpus_hash}
+    compact["reranking"] = {
+        **entry["reranking"],
+        "chunks": [compact_chunk(c) for c in entry["reranking"]["chunks"]],
+    }
+    return compact
+
+
+def compact_record(record: dict) -> dict:
+    """Compact form of an eval record (run_eval) with chunk text previews.
+
+    Eval records already carry their corpus_hash.
+    """
+    if record.get("chunk_format") == CHUNK_FORMAT:
+        return record
+    compact = {**record, "chunk_format": CHUNK_FORMAT}
+    for key in ("retrieved_chunks", "reranked_chunks"):
+        if key in record:
+            compact[key] = [compact_chunk(c) for c in record[key]]
+    return compact
+
+
+def rehydrate_entry(entry: dict, store: ChunkStore) -> dict:
+    """Query log entry with chunk text restored (unchanged if not compact)."""
+    if entry.get("chunk_format") != CHUNK_FORMAT:
+        return entry
+    full = {k: v for k, v in entry.items() if k not in ("chunk_format", "corpus_hash")}
+    full["reranking"] = {
+        **entry["reranking"],
+        "chunks": _rehydrate_chunks(entry["reranking"]["chunks"], store, preview=False),
+    }
+    return full
+
+
+def rehydrate_record(record: dict, store: ChunkStore) -> dict:
+    """Eval record with chunk text_preview restored (unchanged if not compact)."""
+    if record.get("chunk_format") != CHUNK_FORMAT:
+        return record
+    full = {k: v for k, v in record.items() if k != "chunk_format"}
+    for key in ("retrieved_chunks", "reranked_chunks"):
+        if key in record:
+            full[key] = _rehydrate_chunks(record[key], store, preview=True)
+    return full
+
+
+def iter_rehydrated(path: str | Path, store: ChunkStore) -> Iterator[dict]:
+    """Read a query log or eval results JSONL, rehydrating compact lines."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            yield rehydrate_record(item, store) if "query_id" in item \
+                else rehydrate_entry(item, store)
+
+
+def _jsonl_size(items: list[dict]) -> int:
+    return sum(len((json.dumps(i, ensure_ascii=False) + "\n").encode("utf-8")) for i in items)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Report (and optionally write) compact chunk-reference copies of logs"
+    )
+    parser.add_argument("--query-log", default="logs/rag_queries.jsonl",
+                        help="Query log JSONL (default: logs/rag_queries.jsonl)")
+    parser.add_argument("--eval-results", default="logs/eval_results_v2.jsonl",
+                        help="Eval results JSONL (default: logs/eval_results_v2.jsonl)")
+    parser.add_argument("--chunks-dir", default="data/processed",
+                        help="Chunked Markdown used to verify rehydration (default: data/processed)")
+    parser.add_argument("--db-path", default="data/chromadb",
+                        help="ChromaDB path, for the corpus hash (default: data/chromadb)")
+    parser.add_argument("--collection", default="space_debris_rag",
+                        help="ChromaDB collection name (default: space_debris_rag)")
+    parser.add_argument("--write", action="store_true",
+                        help="Write <name>.compact.jsonl next to each input")
+    args = parser.parse_args()
+
+    from src.ingest.ingest import corpus_hash
+
+    corpus = corpus_hash(args.db_path, args.collection)
+    store = ChunkStore.from_processed(args.chunks_dir)
+
+    print(f"\nCompact chunk references (corpus hash: {corpus or 'none'}; "
+          f"rehydrating from {args.chunks_dir}, {len(store._chunks)} chunks)")
+    print(f"  {'file':<32s} {'lines':>6s} {'original':>11s} {'compact':>11s} "
+          f"{'saved':>7s} {'round-trip':>11s}")
+
+    for path, compact_fn, rehydrate_fn in (
+        (args.query_log, lambda e: compact_entry(e, corpus), rehydrate_entry),
+        (args.eval_results, compact_record, rehydrate_record),
+    ):
+        path = Path(path)
+        if not path.exists():
+            continue
+        with open(path, encoding="utf-8") as f:
+            items = [json.loads(line) for line in f if line.strip()]
+        compact = [compact_fn(i) for i in items]
+        original_bytes = path.stat().st_size
+        compact_bytes = _jsonl_size(compact)
+
+        # A line round-trips if rehydrating it restores the original exactly
+        exact = sum(
+            1 for orig, c in zip(items, compact)
+            if rehydrate_fn(c, store) == {k: v for k, v in orig.items()
+                                          if k not in ("chunk_format", "corpus_hash")}
+        )
+        print(f"  {path.name:<32s} {len(items):>6d} {original_bytes / 1e6:>9.2f}MB "
+              f"{compact_bytes / 1e6:>9.2f}MB {1 - compact_bytes / original_bytes:>7.1%} "
+              f"{exact:>5d}/{len(items):<5d}")
+
+        if args.write:
+            out = path.with_name(path.stem + ".compact.jsonl")
+            with open(out, "w", encoding="utf-8") as f:
+                for c in compact:
+                    f.write(json.dumps(c, ensure_ascii=False) + "\n")
+            print(f"    -> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+embedding_cache.py — Content-hashed cache in front of the sentence-transformers
+embedding function.
+
+Every collection.query(query_texts=[...]) re-embeds the query on CPU.
+CachedSentenceTransformerEmbeddingFunction is a drop-in replacement for
+ChromaDB's SentenceTransformerEmbeddingFunction (same name and config, so
+existing collections accept it) that only runs the model on texts it has
+not embedded before.
+
+Two tiers, both scoped to one model:
+  - memory: LRU-evicted OrderedDict, bounded by max_entries
+  - disk (optional): <cache_dir>/<model>/vectors.npy, opened with
+    mmap_mode="r" so lookups don't load the whole file, plus keys.txt
+    holding one content hash per row. New rows are appended on flush().
+
+Row i of vectors.npy belongs to line i of keys.txt. Loading and flushing
+hold an exclusive fcntl lock on <dir>/lock, so processes sharing a cache
+dir append rows and keys in step, and a crash between the two writes is
+repaired (the unmatched tail is cut off) before anything else is appended.
+
+Callers that want to skip ChromaDB's internal embedding call can embed
+with the function themselves and pass query_embeddings= to
+collection.query (see retriever.retrieve_many).
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def text_hash(text: str) -> str:
+    """Content hash used as the cache key for one text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+class EmbeddingCache:
+    """LRU memory cache of embeddings with an optional memory-mapped .npy tier."""
+
+    def __init__(
+        self,
+        scope: str,
+        max_entries: int = 10_000,
+        cache_dir: Optional[str | Path] = None,
+    ):
+        """
+        Args:
+            scope: Model identifier; embeddings from different models never mix.
+            max_entries: Maximum vectors kept in the memory tier.
+            cache_dir: Optional root directory for the disk tier.
+        """
+        self.scope = scope
+        self.max_entries = max_entries
+        self.dir = None
+        if cache_dir:
+            self.dir = Path(cache_dir) / re.sub(r"[^\w.-]+", "_", scope)
+
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._pending: dict[str, np.ndarray] = {}
+        self._disk_rows: dict[str, int] = {}
+        self._disk: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.dir:
+            self._load_disk()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.dir / "vectors.npy"
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.dir / "keys.txt"
+
+    def _load_disk(self):
+        """Memory-map the .npy tier and index its rows by content hash."""
+        if not self._vectors_path.exists() and not self._keys_path.exists():
+            self._disk, self._disk_rows = None, {}
+            return
+        with _dir_lock(self.dir):
+            self._read_disk()
+
+    def _read_disk(self):
+        """Repair a partial flush, then map the rows (caller holds the dir lock).
+
+        flush() writes rows before keys, so a crash can leave rows without
+        keys, or a last key without its newline. Both are cut off here:
+        appending after them would pair every later key with the wrong row.
+        """
+        self._disk, self._disk_rows = None, {}
+        keys = []
+        if self._keys_path.exists():
+            text = self._keys_path.read_text(encoding="utf-8")
+            keys = text.split("\n")[:-1]  # the last element is "" or a partial key
+        header_rows, rows = (
+            _npy_rows(self._vectors_path) if self._vectors_path.exists() else (0, 0)
+        )
+
+        n = min(len(keys), rows)
+        if n == 0:
+            self._vectors_path.unlink(missing_ok=True)
+            self._keys_path.unlink(missing_ok=True)
+            return
+        if header_rows != n:
+            _truncate_rows(self._vectors_path, n)
+        if len(keys) > n or not text.endswith("\n"):
+            keys = keys[:n]
+            self._keys_path.write_text("\n".join(keys) + "\n", encoding="utf-8")
+
+        self._disk = np.load(self._vectors_path, mmap_mode="r")
+        self._disk_rows = {key: row for row, key in enumerate(keys)}
+
+    def get_many(self, keys: list[str]) -> dict[str, np.ndarray]:
+        """Look up keys in memory, then on disk. Updates hit/miss counters."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in found:
+                    continue
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                elif key in self._pending:
+                    found[key] = self._pending[key]
+                elif key in self._disk_rows:
+                    vec = np.array(self._disk[self._disk_rows[key]], dtype=np.float32)
+                    found[key] = vec
+                    self.disk_hits += 1
+                    self._remember(key, vec)
+            self.hits += sum(1 for k in keys if k in found)
+            self.misses += sum(1 for k in keys if k not in found)
+        return found
+
+    def put_many(self, vectors: dict[str, np.ndarray]):
+        """Store new embeddings in memory; queue them for the disk tier."""
+        with self._lock:
+            for key, vec in vectors.items():
+                self._remember(key, vec)
+                if self.dir and key not in self._disk_rows:
+                    self._pending[key] = vec
+
+    def _remember(self, key: str, vec: np.ndarray):
+        """Insert into the memory tier, evicting least-recently-used entries."""
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def flush(self):
+        """Append pending embeddings to the on-disk .npy and keys file.
+
+        The dir lock is held from re-reading the files (which picks up
+        rows other processes flushed) to the reload after the append.
+        """
+        with self._lock:
+            if not self.dir or not self._pending:
+                return
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with _dir_lock(self.dir):
+                self._read_disk()
+                keys = [k for k in self._pending if k not in self._disk_rows]
+                if keys:
+                    new_rows = np.stack([self._pending[k] for k in keys]).astype("<f4")
+                    self._disk = None  # release the read-only map before writing
+                    if self._vectors_path.exists():
+                        _append_rows(self._vectors_path, new_rows)
+                    else:
+                        np.save(self._vectors_path, new_rows)
+                    with open(self._keys_path, "a", encoding="utf-8") as f:
+                        f.write("\n".join(keys) + "\n")
+                    self._read_disk()
+            self._pending.clear()
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and tier sizes."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._disk_rows),
+        }
+
+
+@contextmanager
+def _dir_lock(directory: Path):
+    """Hold an exclusive advisory lock on <directory>/lock (no-op without fcntl)."""
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(directory / "lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+
+def _read_header(f) -> tuple[tuple[int, int], tuple, bool, np.dtype]:
+    """(version, shape, fortran_order, dtype) of an open .npy file."""
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    return version, shape, fortran_order, dtype
+
+
+def _write_shape(f, version: tuple[int, int], dtype: np.dtype, shape: tuple) -> int:
+    """Rewrite a .npy header with a new shape; returns the header length."""
+    header = {
+        "descr": np.lib.format.dtype_to_descr(dtype),
+        "fortran_order": False,
+        "shape": shape,
+    }
+    f.seek(0)
+    if version == (1, 0):
+        np.lib.format.write_array_header_1_0(f, header)
+    else:
+        np.lib.format.write_array_header_2_0(f, header)
+    return f.tell()
+
+
+def _npy_rows(path: Path) -> tuple[int, int]:
+    """(rows in the header, complete rows in the data) of a 2-D .npy file.
+
+    They differ after a crash mid-append: the header is rewritten first.
+    """
+    with open(path, "rb") as f:
+        _, shape, _, dtype = _read_header(f)
+        data_offset = f.tell()
+    row_bytes = max(dtype.itemsize * int(np.prod(shape[1:])), 1)
+    return shape[0], min(shape[0], (path.stat().st_size - data_offset) // row_bytes)
+
+
+def _truncate_rows(path: Path, n: int):
+    """Cut a 2-D .npy file down to its first n rows in place."""
+    with open(path, "r+b") as f:
+        version, shape, _, dtype = _read_header(f)
+        data_offset = f.tell()
+        if _write_shape(f, version, dtype, (n,) + tuple(shape[1:])) == data_offset:
+            f.truncate(data_offset + n * dtype.itemsize * int(np.prod(shape[1:])))
+            return
+        f.seek(data_offset)
+        data = f.read(n * dtype.itemsize * int(np.prod(shape[1:])))
+    np.save(path, np.frombuffer(data, dtype=dtype).reshape((n,) + tuple(shape[1:])))
+
+
+def _append_rows(path: Path, rows: np.ndarray):
+    """Append rows to a 2-D .npy file in place, rewriting only its header.
+
+    numpy pads .npy headers so the first dimension can grow without
+    changing the header length. If that ever doesn't hold, fall back to
+    rewriting the whole file.
+    """
+    with open(path, "r+b") as f:
+        version, shape, fortran_order, dtype = _read_header(f)
+        data_offset = f.tell()
+        if fortran_order or dtype != rows.dtype or shape[1:] != rows.shape[1:]:
+            raise ValueError(f"Embedding cache {path} does not match new rows")
+
+        new_shape = (shape[0] + rows.shape[0],) + tuple(shape[1:])
+        if _write_shape(f, version, dtype, new_shape) == data_offset:
+            f.seek(data_offset + shape[0] * rows[0].nbytes)
+            f.write(rows.tobytes())
+            f.truncate()
+            return
+
+    existing = np.load(path)
+    np.save(path, np.concatenate([existing[:shape[0]], rows]))
+
+
+# Module-level caches so every embedding function for a model shares one tier
+_caches: dict[tuple[str, str], EmbeddingCache] = {}
+
+
+def get_embedding_cache(
+    scope: str,
+    cache_dir: Optional[str | Path] = None,
+    max_entries: int = 10_000,
+) -> EmbeddingCache:
+    """Return the shared EmbeddingCache for a model scope and cache dir."""
+    key = (scope, str(cache_dir or ""))
+    if key not in _caches:
+        _caches[key] = EmbeddingCache(scope, max_entries=max_entries, cache_dir=cache_dir)
+    return _caches[key]
+
+
+def clear_embedding_caches():
+    """Forget every shared in-memory cache (disk tiers are left on disk).
+
+    Embedding functions created afterwards start with an empty memory
+    tier; existing ones keep the cache they already hold.
+    """
+    _caches.clear()
+
+
+class CachedSentenceTransformerEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """SentenceTransformerEmbeddingFunction that skips the model on cache hits."""
+
+    def __init__(
+        self,
+        model_name: str = "all-mpnet-base-v2",
+        cache_dir: Optional[str | Path] = None,
+        max_entries: int = 10_000,
+        **kwargs,
+    ):
+        """
+        Args:
+            model_name: Sentence-transformers model name.
+            cache_dir: Optional directory for the memory-mapped disk tier.
+            max_entries: Maximum vectors kept in memory.
+            **kwargs: Passed to SentenceTransformerEmbeddingFunction
+                      (device, normalize_embeddings, ...).
+        """
+        super().__init__(model_name=model_name, **kwargs)
+        scope = model_name
+        if self.normalize_embeddings:
+            scope += "-normalized"
+        self.cache = get_embedding_cache(scope, cache_dir, max_entries)
+
+    def __call__(self, input):
+        texts = list(input)
+        keys = [text_hash(t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        # Embed each distinct missing text once
+        missing = {k: t for k, t in zip(keys, texts) if k not in found}
+        if missing:
+            vectors = super().__call__(list(missing.values()))
+            new = {
+                k: np.asarray(v, dtype=np.float32)
+                for k, v in zip(missing, vectors)
+            }
+            self.cache.put_many(new)
+            found.update(new)
+
+        return [found[k] for k in keys]
+
+    def flush(self):
+        """Persist newly computed embeddings to the disk tier, if enabled."""
+        self.cache.flush()
@@ -3,16 +3,26 @@ generator.py — Generate citation-backed answers using the Anthropic API.
 
 Requires ANTHROPIC_API_KEY environment variable to be set.
 
+generate() returns the whole answer at once; generate_stream() yields
+text deltas as they arrive; agenerate() is the asyncio form of generate().
+
 Default model: claude-sonnet-4-5-20250929 (cost-effective for eval runs).
 Override with --model flag or ANTHROPIC_MODEL env var.
 """
 
+import asyncio
 import os
-from typing import Optional
+import time
+from concurrent.futures import Executor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Iterator, Optional
 
-import anthropic
+from src.rag.prompts import get_system_blocks, build_prompt, get_prompt_version
+from src.rag.response_cache import ResponseCache
+from src.rag.tracing import current_trace, span
 
-from src.rag.prompts import get_system_prompt, build_prompt, get_prompt_version
+if TYPE_CHECKING:
+    import anthropic
 
 
 # Default model — Sonnet is cost-effective for running 20+ eval queries.
@@ -20,10 +30,8 @@ from src.rag.prompts import get_system_prompt, build_prompt, get_prompt_version
 DEFAULT_MODEL = "claude-sonnet-4-5-20250929"
 
 
-def get_client() -> anthropic.Anthropic:
-    """Create an Anthropic API client.
-
-    Reads ANTHROPIC_API_KEY from environment.
+def _api_key() -> str:
+    """ANTHROPIC_API_KEY from the environment.
 
     Raises:
         ValueError: If ANTHROPIC_API_KEY is not set.
@@ -35,7 +43,90 @@ def get_client() -> anthropic.Anthropic:
             "Set it with: set ANTHROPIC_API_KEY=your-key-here (Windows) "
             "or export ANTHROPIC_API_KEY=your-key-here (Linux/Mac)"
         )
-    return anthropic.Anthropic(api_key=api_key)
+    return api_key
+
+
+def get_client(max_retries: int = 2) -> "anthropic.Anthropic":
+    """Create an Anthropic API client.
+
+    Reads ANTHROPIC_API_KEY from environment.
+
+    Args:
+        max_retries: SDK-level retries (set 0 when an outer retry loop,
+                     such as ThrottledClient, handles them).
+
+    Raises:
+        ValueError: If ANTHROPIC_API_KEY is not set.
+    """
+    import anthropic  # deferred: the SDK is slow to import
+
+    return anthropic.Anthropic(api_key=_api_key(), max_retries=max_retries)
+
+
+def get_async_client(max_retries: int = 2) -> "anthropic.AsyncAnthropic":
+    """Create an async Anthropic API client (see get_client()).
+
+    Raises:
+        ValueError: If ANTHROPIC_API_KEY is not set.
+    """
+    import anthropic
+
+    return anthropic.AsyncAnthropic(api_key=_api_key(), max_retries=max_retries)
+
+
+def usage_to_dict(usage) -> dict:
+    """Token counts from an API usage object, including prompt-cache reads/writes."""
+    return {
+        "input_tokens": usage.input_tokens,
+        "output_tokens": usage.output_tokens,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", None) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", None) or 0,
+    }
+
+
+def resolve_model(model: Optional[str] = None) -> str:
+    """Model generate() will use: the argument, ANTHROPIC_MODEL, or DEFAULT_MODEL."""
+    return model or os.environ.get("ANTHROPIC_MODEL", DEFAULT_MODEL)
+
+
+def _result_from_response(response, model: str) -> dict:
+    """generate() result for an API Message."""
+    # Extract text from response
+    answer = ""
+    for block in response.content:
+        if block.type == "text":
+            answer += block.text
+
+    return {
+        "answer": answer,
+        "model": model,
+        "prompt_version": get_prompt_version(),
+        "usage": usage_to_dict(response.usage),
+    }
+
+
+def _cache_hit_result(cached: dict, cache_key: str) -> dict:
+    """generate() result for a response-cache hit, with provenance."""
+    created_at = cached["created_at"]
+    return {
+        **cached["response"],
+        "cache": {
+            "status": "hit",
+            "key": cache_key,
+            "created_at": datetime.fromtimestamp(created_at, timezone.utc).isoformat(),
+            "age_seconds": round(
+                datetime.now(timezone.utc).timestamp() - created_at, 1
+            ),
+        },
+    }
+
+
+def _span_attributes(result: dict) -> dict:
+    """Attributes of the "generate" span: token counts and response-cache status."""
+    return {
+        **result["usage"],
+        "response_cache": result.get("cache", {}).get("status", "off"),
+    }
 
 
 def generate(
@@ -43,6 +134,8 @@ def generate(
     chunks: list[dict],
     model: Optional[str] = None,
     max_tokens: int = 2048,
+    client: Optional["anthropic.Anthropic"] = None,
+    cache: Optional[ResponseCache] = None,
 ) -> dict:
     """Generate a citation-backed answer from retrieved chunks.
 
@@ -51,39 +144,221 @@ def generate(
         chunks: Ranked list of chunk dicts from retriever/reranker.
         model: Anthropic model name. Defaults to DEFAULT_MODEL.
         max_tokens: Maximum tokens in the response.
+        client: Reusable Anthropic client. A new one is created if omitted.
+        cache: Optional response cache. A request identical in model, system
+               prompt, messages and max_tokens to a cached one is answered
+               from the cache without an API call.
 
     Returns:
         Dict with keys:
             answer: The generated text.
             model: Model name used.
             prompt_version: Version string for logging.
-            usage: Dict with input_tokens and output_tokens.
+            usage: Dict with input_tokens, output_tokens and the prompt-cache
+                   counts cache_creation_input_tokens (write) and
+                   cache_read_input_tokens (read); those of the original API
+                   call when served from the response cache.
+            cache: Provenance, only when a cache is given:
+                   {"status": "hit" | "miss", "key", and on hits
+                   "created_at" and "age_seconds"}.
     """
-    client = get_client()
-    model = model or os.environ.get("ANTHROPIC_MODEL", DEFAULT_MODEL)
+    model = resolve_model(model)
 
-    system_prompt = get_system_prompt()
-    messages = build_prompt(query, chunks)
+    with span("prompt_build"):
+        # Static system prompt first (shared prefix), evidence in messages
+        system_prompt = get_system_blocks(model)
+        messages = build_prompt(query, chunks)
+        cache_key = (
+            cache.make_key(model, system_prompt, messages, max_tokens)
+            if cache is not None else None
+        )
 
-    response = client.messages.create(
-        model=model,
-        max_tokens=max_tokens,
-        system=system_prompt,
-        messages=messages,
-    )
+    with span("generate", model=model) as attrs:
+        cached = cache.get(cache_key) if cache is not None else None
+        if cached is not None:
+            result = _cache_hit_result(cached, cache_key)
+        else:
+            client = client or get_client()
+            response = client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                system=system_prompt,
+                messages=messages,
+            )
 
-    # Extract text from response
-    answer = ""
-    for block in response.content:
-        if block.type == "text":
-            answer += block.text
+            result = _result_from_response(response, model)
 
-    return {
-        "answer": answer,
-        "model": model,
-        "prompt_version": get_prompt_version(),
-        "usage": {
-            "input_tokens": response.usage.input_tokens,
-            "output_tokens": response.usage.output_tokens,
-        },
-    }
+            if cache is not None:
+                cache.put(cache_key, result)
+                result["cache"] = {"status": "miss", "key": cache_key}
+        attrs.update(_span_attributes(result))
+
+    return result
+
+
+async def agenerate(
+    query: str,
+    chunks: list[dict],
+    model: Optional[str] = None,
+    max_tokens: int = 2048,
+    client: Optional["anthropic.AsyncAnthropic"] = None,
+    cache: Optional[ResponseCache] = None,
+    executor: Optional[Executor] = None,
+) -> dict:
+    """Async generate() using the async Anthropic client; same arguments and result.
+
+    The response-cache lookup and store are blocking SQLite calls, so they
+    run in executor (default: the event loop's default executor) instead
+    of on the event loop.
+    """
+    model = resolve_model(model)
+    loop = asyncio.get_running_loop()
+
+    with span("prompt_build"):
+        system_prompt = get_system_blocks(model)
+        messages = build_prompt(query, chunks)
+        cache_key = (
+            cache.make_key(model, system_prompt, messages, max_tokens)
+            if cache is not None else None
+        )
+
+    with span("generate", model=model) as attrs:
+        cached = (
+            await loop.run_in_executor(executor, cache.get, cache_key)
+            if cache is not None else None
+        )
+        if cached is not None:
+            result = _cache_hit_result(cached, cache_key)
+        else:
+            client = client or get_async_client()
+            response = await client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                system=system_prompt,
+                messages=messages,
+            )
+
+            result = _result_from_response(response, model)
+
+            if cache is not None:
+                await loop.run_in_executor(executor, cache.put, cache_key, result)
+                result["cache"] = {"status": "miss", "key": cache_key}
+        attrs.update(_span_attributes(result))
+
+    return result
+
+
+class GenerationStream:
+    """Streaming generate(): iterate for answer text deltas as they arrive.
+
+    Once iteration finishes, .result holds the same dict generate() would
+    have returned, and .time_to_first_token the seconds from the start of
+    iteration to the first delta. A response-cache hit is yielded as one
+    delta.
+
+    Example:
+        stream = generate_stream(query, chunks)
+        for text in stream:
+            print(text, end="", flush=True)
+        print(stream.result["usage"])
+    """
+
+    def __init__(
+        self,
+        query: str,
+        chunks: list[dict],
+        model: Optional[str] = None,
+        max_tokens: int = 2048,
+        client: Optional["anthropic.Anthropic"] = None,
+        cache: Optional[ResponseCache] = None,
+    ):
+        self.model = resolve_model(model)
+        self.max_tokens = max_tokens
+        with span("prompt_build"):
+            self.system_prompt = get_system_blocks(self.model)
+            self.messages = build_prompt(query, chunks)
+            self.cache_key = (
+                cache.make_key(self.model, self.system_prompt, self.messages, max_tokens)
+                if cache is not None else None
+            )
+        self.client = client
+        self.cache = cache
+        self.result: Optional[dict] = None
+        self.time_to_first_token: Optional[float] = None
+        # Iteration is interleaved with the consumer's code, so the
+        # "generate" span is recorded on the trace active at construction
+        self._trace = current_trace()
+
+    def __iter__(self) -> Iterator[str]:
+        start = time.perf_counter()
+        yield from self._iter_deltas(start)
+        if self._trace is not None:
+            self._trace.add(
+                "generate", start, time.perf_counter(),
+                model=self.model, streamed=True, **_span_attributes(self.result),
+            )
+
+    def _iter_deltas(self, start: float) -> Iterator[str]:
+        cache_key = self.cache_key
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.result = _cache_hit_result(cached, cache_key)
+                self.time_to_first_token = time.perf_counter() - start
+                yield self.result["answer"]
+                return
+
+        client = self.client or get_client()
+        # Raw event stream via create(stream=True), so wrappers that only
+        # expose messages.create() (e.g. ThrottledClient) work too
+        events = client.messages.create(
+            model=self.model,
+            max_tokens=self.max_tokens,
+            system=self.system_prompt,
+            messages=self.messages,
+            stream=True,
+        )
+
+        parts = []
+        usage = {}
+        for event in events:
+            if event.type == "message_start":
+                usage = usage_to_dict(event.message.usage)
+            elif event.type == "content_block_delta" and event.delta.type == "text_delta":
+                if self.time_to_first_token is None:
+                    self.time_to_first_token = time.perf_counter() - start
+                parts.append(event.delta.text)
+                yield event.delta.text
+            elif event.type == "message_delta" and event.usage is not None:
+                # Cumulative output count for the whole message
+                usage["output_tokens"] = event.usage.output_tokens
+
+        self.result = {
+            "answer": "".join(parts),
+            "model": self.model,
+            "prompt_version": get_prompt_version(),
+            "usage": usage,
+        }
+        if self.time_to_first_token is None:
+            self.time_to_first_token = time.perf_counter() - start
+
+        if self.cache is not None:
+            self.cache.put(cache_key, self.result)
+            self.result = {**self.result, "cache": {"status": "miss", "key": cache_key}}
+
+
+def generate_stream(
+    query: str,
+    chunks: list[dict],
+    model: Optional[str] = None,
+    max_tokens: int = 2048,
+    client: Optional["anthropic.Anthropic"] = None,
+    cache: Optional[ResponseCache] = None,
+) -> GenerationStream:
+    """Streaming variant of generate(); same arguments.
+
+    Returns:
+        A GenerationStream yielding text deltas; its .result is the
+        generate()-style dict once the stream is exhausted.
+    """
+    return GenerationStream(query, chunks, model, max_tokens, client, cache)
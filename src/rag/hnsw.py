@@ -0,0 +1,58 @@
+"""
+hnsw.py — HNSW index parameters of the ChromaDB collection.
+
+The collection uses a cosine HNSW index. M and construction_ef are fixed
+when the collection is created (src.ingest.ingest --hnsw-m,
+--hnsw-construction-ef); search_ef is stored in the collection
+configuration and changed only by ingest (--hnsw-search-ef), an explicit
+admin operation on the shared database.
+
+ChromaDB applies search_ef when a process loads the index, so a changed
+value is picked up by processes started afterwards. Query and serve
+processes never write it.
+"""
+
+from typing import Optional
+
+
+def hnsw_configuration(
+    m: Optional[int] = None,
+    construction_ef: Optional[int] = None,
+    search_ef: Optional[int] = None,
+) -> dict:
+    """ChromaDB collection configuration for a cosine HNSW index.
+
+    Parameters left as None keep ChromaDB's defaults.
+    """
+    hnsw = {"space": "cosine"}
+    if m is not None:
+        hnsw["max_neighbors"] = m
+    if construction_ef is not None:
+        hnsw["ef_construction"] = construction_ef
+    if search_ef is not None:
+        hnsw["ef_search"] = search_ef
+    return {"hnsw": hnsw}
+
+
+def hnsw_params(collection) -> dict:
+    """HNSW parameters of a collection: {space, M, construction_ef, search_ef}."""
+    # The raw JSON: collection.configuration would rebuild the embedding function
+    hnsw = (collection.configuration_json or {}).get("hnsw") or {}
+    return {
+        "space": hnsw.get("space"),
+        "M": hnsw.get("max_neighbors"),
+        "construction_ef": hnsw.get("ef_construction"),
+        "search_ef": hnsw.get("ef_search"),
+    }
+
+
+def set_search_ef(collection, search_ef: int) -> bool:
+    """Persist a new HNSW search_ef in the collection; True if it changed.
+
+    Processes that already loaded the index, including this one, keep
+    searching with the old value until they are restarted.
+    """
+    if hnsw_params(collection)["search_ef"] == search_ef:
+        return False
+    collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+    return True
@@ -0,0 +1,208 @@
+"""
+lexical.py — Persistent BM25 inverted index for hybrid retrieval.
+
+all-mpnet-base-v2 handles exact technical terms ("CDM", "TLE", "Pc",
+"Kessler") poorly, so dense retrieval alone needs a large candidate pool.
+BM25Index scores chunks lexically; retriever.retrieve_many(mode="hybrid")
+fuses it with ChromaDB results using reciprocal rank fusion.
+
+The index is built at the end of src.ingest.ingest from the collection
+contents and saved next to the ChromaDB files as one uncompressed .npz:
+
+    terms     uint8   newline-joined vocabulary (sorted)
+    offsets   int64   postings for term t are [offsets[t], offsets[t+1])
+    postings  int32   document indices, grouped by term
+    tfs       uint16  term frequency for each posting
+    doc_ids   uint8   newline-joined composite ids (source_id::chunk_id)
+    doc_lens  int32   document lengths in tokens
+    params    float64 [k1, b]
+
+Everything is a flat NumPy array, so loading is a few reads with no
+per-posting Python objects.
+"""
+
+import re
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Small stopword list: drops the highest-frequency postings without
+# touching domain terms.
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or "
+    "that the their this to was were which with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase alphanumeric tokens with stopwords removed."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def get_lexical_index_path(
+    db_path: str | Path = "data/chromadb",
+    collection_name: str = "space_debris_rag",
+) -> Path:
+    """Location of the BM25 index for a collection (inside the ChromaDB dir)."""
+    return Path(db_path) / f"lexical_{collection_name}.npz"
+
+
+class BM25Index:
+    """Okapi BM25 over a compact CSR-style postings layout."""
+
+    def __init__(
+        self,
+        terms: list[str],
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        tfs: np.ndarray,
+        doc_ids: list[str],
+        doc_lens: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.postings = postings
+        self.tfs = tfs
+        self.doc_ids = doc_ids
+        self.doc_lens = doc_lens
+        self.k1 = k1
+        self.b = b
+
+        n_docs = len(doc_ids)
+        self.avg_len = float(doc_lens.mean()) if n_docs else 0.0
+        doc_freq = np.diff(offsets).astype(np.float64)
+        self.idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+        # Per-document BM25 length normalization, precomputed once
+        self._norm = k1 * (1 - b + b * doc_lens / max(self.avg_len, 1e-9))
+
+    @classmethod
+    def build(
+        cls,
+        doc_ids: list[str],
+        texts: list[str],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> "BM25Index":
+        """Build an index from parallel lists of ids and texts."""
+        term_postings: dict[str, dict[int, int]] = {}
+        doc_lens = np.zeros(len(texts), dtype=np.int32)
+        for d, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens[d] = len(tokens)
+            for token in tokens:
+                counts = term_postings.setdefault(token, {})
+                counts[d] = counts.get(d, 0) + 1
+
+        terms = sorted(term_postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        postings, tfs = [], []
+        for t, term in enumerate(terms):
+            counts = term_postings[term]
+            postings.extend(counts.keys())
+            tfs.extend(counts.values())
+            offsets[t + 1] = offsets[t] + len(counts)
+
+        return cls(
+            terms,
+            offsets,
+            np.asarray(postings, dtype=np.int32),
+            np.minimum(np.asarray(tfs, dtype=np.int64), np.iinfo(np.uint16).max).astype(np.uint16),
+            list(doc_ids),
+            doc_lens,
+            k1=k1,
+            b=b,
+        )
+
+    @classmethod
+    def from_collection(cls, collection, **kwargs) -> "BM25Index":
+        """Build an index over every document currently in a ChromaDB collection."""
+        data = collection.get(include=["documents"])
+        return cls.build(data["ids"], data["documents"], **kwargs)
+
+    def save(self, path: str | Path):
+        """Write the index as one uncompressed .npz file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # np.savez appends .npz unless the name already ends with it
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(
+            tmp_path,
+            terms=np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8),
+            offsets=self.offsets,
+            postings=self.postings,
+            tfs=self.tfs,
+            doc_ids=np.frombuffer("\n".join(self.doc_ids).encode("utf-8"), dtype=np.uint8),
+            doc_lens=self.doc_lens,
+            params=np.array([self.k1, self.b], dtype=np.float64),
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: str | Path) -> "BM25Index":
+        """Load an index written by save()."""
+        with np.load(Path(path)) as data:
+            terms_blob = data["terms"].tobytes().decode("utf-8")
+            ids_blob = data["doc_ids"].tobytes().decode("utf-8")
+            k1, b = data["params"]
+            return cls(
+                terms_blob.split("\n") if terms_blob else [],
+                data["offsets"],
+                data["postings"],
+                data["tfs"],
+                ids_blob.split("\n") if ids_blob else [],
+                data["doc_lens"],
+                k1=float(k1),
+                b=float(b),
+            )
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for a query (dense array)."""
+        scores = np.zeros(len(self.doc_ids), dtype=np.float64)
+        for token in set(tokenize(query)):
+            t = self.vocab.get(token)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            docs = self.postings[start:end]
+            tf = self.tfs[start:end].astype(np.float64)
+            scores[docs] += self.idf[t] * tf * (self.k1 + 1) / (tf + self._norm[docs])
+        return scores
+
+    def search(
+        self,
+        query: str,
+        k: int = 20,
+        allowed_ids: Optional[set[str]] = None,
+    ) -> list[tuple[str, float]]:
+        """Top-k (composite id, BM25 score) pairs for a query.
+
+        Args:
+            query: Query text.
+            k: Number of results.
+            allowed_ids: If given, only these ids can be returned (used to
+                         apply a ChromaDB metadata filter).
+        """
+        scores = self.scores(query)
+        if allowed_ids is not None:
+            mask = np.fromiter(
+                (doc_id in allowed_ids for doc_id in self.doc_ids),
+                dtype=bool,
+                count=len(self.doc_ids),
+            )
+            scores[~mask] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if len(candidates) > k:
+            top = np.argpartition(-scores[candidates], k)[:k]
+            candidates = candidates[top]
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.doc_ids[i], float(scores[i])) for i in ranked]
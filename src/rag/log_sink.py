@@ -0,0 +1,395 @@
+"""
+log_sink.py — Buffered, rotating JSONL writer for pipeline log entries.
+
+LogSink takes serialized log lines from any number of threads and writes
+them from one background thread:
+
+  - A bounded queue decouples queries from disk I/O. When it is full,
+    write_line() blocks (backpressure) or, with overflow="drop", drops the
+    entry and counts it.
+  - Everything queued since the last write goes out in one batch, as a
+    single write() on an O_APPEND descriptor.
+  - Every batch is written under an exclusive fcntl lock on the log file,
+    so several processes can share one log without interleaving partial
+    lines. Without fcntl (Windows) the single O_APPEND write still keeps
+    lines whole in practice, but rotation is not coordinated.
+  - Optional rotation by size (rotate_bytes) and/or time (rotate_seconds).
+    The current file is renamed to <stem>.<UTC timestamp>.jsonl and a new
+    one started. The rotated segment can be compressed with gzip or zstd
+    (zstd needs the optional zstandard package).
+
+Rotation is decided from the file itself (size, and the mtime of its last
+write for time-based rotation), so processes sharing a log agree on it.
+A process whose file was rotated away by another process notices the
+inode change under the lock and reopens the path.
+
+append_lines() is the unbuffered form of the same locked append, used by
+log_query() when no sink is given. iter_log_entries() reads a log together
+with its rotated (and compressed) segments, oldest first.
+
+Example:
+    sink = LogSink("logs/rag_queries.jsonl", rotate_bytes=100_000_000, compression="gzip")
+    sink.write({"query": "..."})
+    sink.close()
+"""
+
+import atexit
+import gzip
+import io
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+COMPRESSIONS = (None, "gzip", "zstd")
+COMPRESSED_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+# Sentinel that tells the writer thread to exit
+_STOP = object()
+
+
+@contextmanager
+def _locked(fd: int):
+    """Hold an exclusive advisory lock on fd (no-op without fcntl)."""
+    if fcntl is None:
+        yield
+        return
+    fcntl.flock(fd, fcntl.LOCK_EX)
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+def _open_append(path: Path) -> int:
+    return os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+
+def _write_all(fd: int, data: bytes):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _encode_lines(lines: list[str]) -> bytes:
+    """UTF-8 JSONL bytes for lines.
+
+    Lines are serialized with ensure_ascii=False, so a lone surrogate
+    (e.g. from a query string) reaches the encoder; backslashreplace
+    writes it as the JSON escape \\udXXX, which reads back unchanged.
+    """
+    return "".join(line + "\n" for line in lines).encode("utf-8", "backslashreplace")
+
+
+def append_lines(path: str | Path, lines: list[str]):
+    """Append complete JSONL lines to path with one locked O_APPEND write."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = _encode_lines(lines)
+    fd = _open_append(path)
+    try:
+        with _locked(fd):
+            _write_all(fd, data)
+    finally:
+        os.close(fd)
+
+
+def _segment_pattern(path: Path) -> re.Pattern:
+    return re.compile(
+        rf"^{re.escape(path.stem)}\.(\d{{8}}T\d{{6}}Z)(?:\.(\d+))?"
+        rf"{re.escape(path.suffix)}(\.gz|\.zst)?$"
+    )
+
+
+def rotated_segments(path: str | Path) -> list[Path]:
+    """Rotated segments of a log, oldest first."""
+    path = Path(path)
+    pattern = _segment_pattern(path)
+    found = []
+    if path.parent.exists():
+        for p in path.parent.iterdir():
+            m = pattern.match(p.name)
+            if m:
+                found.append(((m.group(1), int(m.group(2) or 0)), p))
+    return [p for _, p in sorted(found)]
+
+
+def _open_text(path: Path):
+    if path.suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.suffix == ".zst":
+        import zstandard
+
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True),
+            encoding="utf-8",
+        )
+    return open(path, encoding="utf-8")
+
+
+def iter_log_entries(path: str | Path, include_rotated: bool = True) -> Iterator[dict]:
+    """Yield the entries of a JSONL log, rotated segments first.
+
+    Args:
+        path: The live log file (e.g. logs/rag_queries.jsonl).
+        include_rotated: Also read <stem>.<timestamp>.jsonl[.gz|.zst]
+                         segments written by LogSink rotation.
+    """
+    path = Path(path)
+    files = rotated_segments(path) if include_rotated else []
+    if path.exists():
+        files.append(path)
+    for file in files:
+        with _open_text(file) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class LogSink:
+    """Thread-safe JSONL sink with a background writer, batching and rotation."""
+
+    def __init__(
+        self,
+        path: str | Path,
+        max_queue: int = 10_000,
+        max_batch: int = 512,
+        rotate_bytes: Optional[int] = None,
+        rotate_seconds: Optional[float] = None,
+        compression: Optional[str] = None,
+        overflow: str = "block",
+    ):
+        """
+        Args:
+            path: JSONL log file.
+            max_queue: Maximum lines waiting to be written.
+            max_batch: Maximum lines per write.
+            rotate_bytes: Rotate before a batch would grow the file past
+                          this size. None disables size rotation.
+            rotate_seconds: Rotate when the file's last write was in an
+                            earlier rotate_seconds-long window (e.g. 86400
+                            for daily files). None disables time rotation.
+            compression: None, "gzip" or "zstd" for rotated segments.
+            overflow: "block" to wait for queue space, or "drop" to discard
+                      (and count) entries while the queue is full.
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression!r}; expected one of {COMPRESSIONS}")
+        if compression == "zstd":
+            try:
+                import zstandard  # noqa: F401
+            except ImportError as e:
+                raise ImportError(
+                    "zstd compression needs the zstandard package: pip install zstandard"
+                ) from e
+        if overflow not in ("block", "drop"):
+            raise ValueError(f"Unknown overflow {overflow!r}; expected 'block' or 'drop'")
+
+        self.path = Path(path)
+        self.max_batch = max_batch
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compression = compression
+        self.overflow = overflow
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._fd: Optional[int] = None
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+        self.rotations = 0
+        self.dropped = 0
+        self.errors = 0
+
+        self._thread = threading.Thread(
+            target=self._run, name=f"log-sink:{self.path.name}", daemon=True
+        )
+        self._thread.start()
+        # Entries still queued at interpreter exit are written, not lost
+        atexit.register(self.close)
+
+    def write(self, entry: dict):
+        """Queue one log entry (serialized in the calling thread)."""
+        self.write_line(json.dumps(entry, ensure_ascii=False))
+
+    def write_line(self, line: str):
+        """Queue one already-serialized JSON line (without the newline)."""
+        if self._closed:
+            append_lines(self.path, [line])
+            return
+        if self.overflow == "drop":
+            try:
+                self._queue.put_nowait(line)
+            except queue.Full:
+                self.dropped += 1
+        else:
+            self._queue.put(line)
+
+    def flush(self):
+        """Block until every queued line has been written."""
+        if not self._closed:
+            self._queue.join()
+
+    def close(self):
+        """Write what is queued, stop the writer thread and close the file."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        # Lines queued by a write_line() that raced with close()
+        leftover = []
+        while True:
+            try:
+                line = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if line is not _STOP:
+                leftover.append(line)
+        if leftover:
+            append_lines(self.path, leftover)
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        atexit.unregister(self.close)
+
+    def stats(self) -> dict:
+        """Lines written, write batches and time, rotations, drops, errors and queue depth."""
+        return {
+            "written": self.written,
+            "batches": self.batches,
+            "mean_batch_size": round(self.written / self.batches, 2) if self.batches else 0.0,
+            "write_seconds": round(self.write_seconds, 4),
+            "mean_write_ms": (
+                round(self.write_seconds / self.batches * 1000, 3) if self.batches else 0.0
+            ),
+            "rotations": self.rotations,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queued": self._queue.qsize(),
+        }
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = [self._queue.get()]
+            # Take whatever else is already waiting, up to max_batch
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                stop = True
+            lines = [line for line in batch if line is not _STOP]
+            try:
+                if lines:
+                    self._write_batch(lines)
+            except Exception as e:
+                # Keep the writer alive: flush() and blocking writes wait on it
+                self.errors += 1
+                print(f"  WARNING: log sink failed to write {len(lines)} entries "
+                      f"to {self.path}: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _stale(self) -> bool:
+        """True if self.path no longer names the file our descriptor points at."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return True
+        fst = os.fstat(self._fd)
+        return (st.st_ino, st.st_dev) != (fst.st_ino, fst.st_dev)
+
+    def _should_rotate(self, incoming: int) -> bool:
+        st = os.fstat(self._fd)
+        if st.st_size == 0:
+            return False
+        if self.rotate_bytes and st.st_size + incoming > self.rotate_bytes:
+            return True
+        if self.rotate_seconds:
+            window = self.rotate_seconds
+            return int(st.st_mtime // window) != int(time.time() // window)
+        return False
+
+    def _write_batch(self, lines: list[str]):
+        start = time.perf_counter()
+        data = _encode_lines(lines)
+        rotated = None
+        while True:
+            if self._fd is None:
+                self._fd = _open_append(self.path)
+            with _locked(self._fd):
+                if self._stale():
+                    reopen = True
+                elif rotated is None and self._should_rotate(len(data)):
+                    rotated = self._rotate()
+                    reopen = True
+                else:
+                    _write_all(self._fd, data)
+                    reopen = False
+            if not reopen:
+                break
+            # Rotated by us or another process: lock the new file before writing
+            os.close(self._fd)
+            self._fd = None
+
+        self.written += len(lines)
+        self.batches += 1
+        self.write_seconds += time.perf_counter() - start
+        if rotated is not None and self.compression:
+            self._compress(rotated)
+
+    def _rotate(self) -> Path:
+        """Rename the live file to a timestamped segment (caller holds the lock)."""
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        n = 0
+        while True:
+            name = f"{self.path.stem}.{stamp}{f'.{n}' if n else ''}{self.path.suffix}"
+            segment = self.path.with_name(name)
+            if not any(segment.with_name(segment.name + s).exists()
+                       for s in ("", *COMPRESSED_SUFFIXES.values())):
+                break
+            n += 1
+        os.rename(self.path, segment)
+        self.rotations += 1
+        return segment
+
+    def _compress(self, segment: Path):
+        """Compress a rotated segment in place (outside the lock)."""
+        target = segment.with_name(segment.name + COMPRESSED_SUFFIXES[self.compression])
+        tmp = target.with_name(target.name + ".tmp")
+        try:
+            with open(segment, "rb") as src:
+                if self.compression == "gzip":
+                    with gzip.open(tmp, "wb") as dst:
+                        shutil.copyfileobj(src, dst)
+                else:
+                    import zstandard
+
+                    with open(tmp, "wb") as dst:
+                        zstandard.ZstdCompressor().copy_stream(src, dst)
+            os.replace(tmp, target)
+            segment.unlink()
+        except OSError as e:
+            self.errors += 1
+            print(f"  WARNING: could not compress {segment}: {e}")
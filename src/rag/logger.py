@@ -7,13 +7,26 @@ JSON Lines (.jsonl) file for easy parsing.
 
 Required by assignment: "store queries, retrieved chunks, model outputs,
 and prompt/version IDs."
+
+Entries go to a LogSink (src.rag.log_sink: background writer, batching,
+rotation) when one is given, otherwise straight to the file with one
+locked append, so concurrent writers never interleave partial lines.
+
+With compact=True reranked chunks are logged as references (id plus a
+text hash) and the entry records the corpus hash; src.rag.chunk_store
+rehydrates their text when the log is read.
 """
 
 import json
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
+from src.rag.chunk_store import compact_entry
+from src.rag.log_sink import LogSink, append_lines
+from src.rag.tracing import Trace
+
 
 def log_query(
     query: str,
@@ -22,6 +35,11 @@ def log_query(
     generation_result: dict,
     log_path: str | Path = "logs/rag_queries.jsonl",
     metadata: Optional[dict] = None,
+    timing: Optional[dict] = None,
+    trace: Optional[Trace] = None,
+    sink: Optional[LogSink] = None,
+    compact: bool = False,
+    corpus_hash: Optional[str] = None,
 ) -> dict:
     """Log a complete RAG pipeline run to a JSONL file.
 
@@ -30,16 +48,27 @@ def log_query(
         retrieved_chunks: Raw retrieval results (before reranking).
         reranked_chunks: Chunks after reranking (the ones passed to the LLM).
         generation_result: Dict from generator.generate() with answer,
-                          model, prompt_version, usage.
+                          model, prompt_version, usage (including the
+                          prompt-cache read/write token counts).
         log_path: Path to the JSONL log file.
         metadata: Optional extra metadata dict (e.g. eval tags).
+        timing: Optional latency dict (time_to_first_token_seconds,
+                total_seconds, streamed) from the pipeline.
+        trace: Optional per-stage spans, stored under "trace" (see
+               src.rag.tracing). A "log_write" span timing the append
+               (or enqueue) is added to it after the line is written, so
+               it is in the returned entry and the exported trace but
+               not in the logged line.
+        sink: Optional LogSink to queue the entry on instead of writing
+              it synchronously; log_path is then ignored.
+        compact: Log reranked chunks as id + text_hash references instead
+                 of their text (see src.rag.chunk_store).
+        corpus_hash: Corpus hash of the collection the chunks came from,
+                     stored with compact entries.
 
     Returns:
         The log entry dict that was written.
     """
-    log_path = Path(log_path)
-    log_path.parent.mkdir(parents=True, exist_ok=True)
-
     # Slim down chunk data for logging (don't duplicate full text for retrieved)
     def slim_chunk(chunk: dict) -> dict:
         return {
@@ -84,11 +113,33 @@ def log_query(
         },
     }
 
+    # Response-cache provenance (hit/miss, key, age) when a cache was used
+    if "cache" in generation_result:
+        entry["generation"]["cache"] = generation_result["cache"]
+
+    if timing:
+        entry["timing"] = timing
+
     if metadata:
         entry["metadata"] = metadata
 
+    if compact:
+        entry = compact_entry(entry, corpus_hash)
+
+    if trace is not None:
+        entry["trace"] = trace.to_dict()
+
     # Append to JSONL
-    with open(log_path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    line = json.dumps(entry, ensure_ascii=False)
+    write_start = time.perf_counter()
+    if sink is not None:
+        sink.write_line(line)
+    else:
+        append_lines(log_path, [line])
+
+    if trace is not None:
+        # A line can't hold the time it took to write itself
+        trace.add("log_write", write_start, time.perf_counter(), sink=sink is not None)
+        entry["trace"] = trace.to_dict()
 
     return entry
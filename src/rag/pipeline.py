@@ -4,15 +4,681 @@ pipeline.py — End-to-end RAG pipeline: retrieve → rerank → generate → lo
 This is the main orchestrator. It connects all components and provides
 a single function that takes a query and returns a grounded answer
 with citations and a complete log entry.
+
+RAGPipeline is the long-lived form: it owns the ChromaDB collection (and
+its embedding model), the cross-encoder and the Anthropic client, so they
+are built once per process instead of once per query. run_query() is a
+thin wrapper over a cached RAGPipeline. chromadb, sentence-transformers
+and the Anthropic SDK are imported when the component that needs them is
+first used, not when this module is imported.
+
+run_query_stream() / RAGPipeline.query_stream() are the streaming forms:
+they yield the retrieval and rerank results first, then answer tokens as
+they arrive, then the log entry. Every log entry records
+time-to-first-token and total latency under "timing", and per-stage spans
+(load, embed, search, rerank, prompt_build, generate) under "trace" (see
+src.rag.tracing); the log_write span of the append itself is exported
+with the trace.
 """
 
+import threading
+import time
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Iterator, Optional
 
-from src.rag.retriever import get_collection, retrieve
-from src.rag.reranker import rerank
-from src.rag.generator import generate
+from src.rag.lexical import BM25Index, get_lexical_index_path
+from src.rag.reranker import DEFAULT_RERANKER_MODEL, get_reranker, rerank, rerank_many
+from src.rag.rerank_cache import RerankScoreCache
+from src.rag.response_cache import ResponseCache
+from src.rag.generator import generate, generate_stream, get_client
+from src.rag.log_sink import LogSink
 from src.rag.logger import log_query
+from src.rag.tracing import OTLPFileExporter, Trace, span
+
+if TYPE_CHECKING:
+    from src.rag.embedding_cache import CachedSentenceTransformerEmbeddingFunction
+
+
+class RAGPipeline:
+    """Warm RAG pipeline that loads its heavy dependencies once.
+
+    Components are loaded lazily on first use, or eagerly via warmup().
+
+    Example:
+        pipeline = RAGPipeline()
+        pipeline.warmup()
+        result = pipeline.query("What is the Kessler syndrome?")
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path = "data/chromadb",
+        collection_name: str = "space_debris_rag",
+        embedding_model: str = "all-mpnet-base-v2",
+        reranker_model: str = DEFAULT_RERANKER_MODEL,
+        model: Optional[str] = None,
+        log_path: str | Path = "logs/rag_queries.jsonl",
+        rerank_cache: Optional[RerankScoreCache] = None,
+        embedding_cache_dir: Optional[str | Path] = None,
+        retrieval_mode: str = "dense",
+        client=None,
+        response_cache: Optional[ResponseCache] = None,
+        trace_exporter: Optional[OTLPFileExporter] = None,
+        log_sink: Optional[LogSink] = None,
+        compact_logs: bool = False,
+    ):
+        """
+        Args:
+            db_path: Path to ChromaDB storage.
+            collection_name: ChromaDB collection name.
+            embedding_model: Sentence-transformers model (must match ingest).
+            reranker_model: Cross-encoder model name.
+            model: Default Anthropic model for generation.
+            log_path: Default path for JSONL log output.
+            rerank_cache: Cross-encoder score cache. Defaults to an
+                          in-memory RerankScoreCache.
+            embedding_cache_dir: Optional disk tier for query embeddings
+                                 (the memory tier is always on).
+            retrieval_mode: "dense" (ChromaDB only) or "hybrid" (ChromaDB
+                            fused with the BM25 index built at ingest).
+            client: Anthropic client for generation (or a wrapper with the
+                    same messages.create()). Created on first use if omitted.
+            response_cache: Optional on-disk generation response cache
+                            (off by default).
+            trace_exporter: Optional exporter that also writes each query's
+                            stage spans as OpenTelemetry OTLP/JSON.
+            log_sink: Optional buffered, rotating writer for log entries
+                      to log_sink.path. Entries for any other log path are
+                      written synchronously.
+            compact_logs: Log reranked chunks as id + text_hash references
+                          with the collection's corpus hash instead of
+                          their text (see src.rag.chunk_store).
+        """
+        self.db_path = db_path
+        self.collection_name = collection_name
+        self.embedding_model = embedding_model
+        self.reranker_model = reranker_model
+        self.model = model
+        self.log_path = log_path
+        self.rerank_cache = rerank_cache if rerank_cache is not None else RerankScoreCache()
+        self.embedding_cache_dir = embedding_cache_dir
+        self.retrieval_mode = retrieval_mode
+        self.response_cache = response_cache
+        self.trace_exporter = trace_exporter
+        self.log_sink = log_sink
+        self.compact_logs = compact_logs
+
+        self._corpus_hash = None
+        self._embedder = None
+        self._lexical_index = None
+        self._collection = None
+        self._reranker = None
+        self._client = client
+        # Serializes embedding/reranking so threads can share one warm model
+        self._model_lock = threading.RLock()
+
+    @property
+    def embedder(self) -> "CachedSentenceTransformerEmbeddingFunction":
+        """Query embedding function with its embedding cache (loaded once)."""
+        if self._embedder is None:
+            with span("load", component="embedder"):
+                from src.rag.embedding_cache import CachedSentenceTransformerEmbeddingFunction
+
+                self._embedder = CachedSentenceTransformerEmbeddingFunction(
+                    model_name=self.embedding_model,
+                    cache_dir=self.embedding_cache_dir,
+                )
+        return self._embedder
+
+    @property
+    def corpus_hash(self) -> Optional[str]:
+        """Ingest corpus hash of the collection, for compact log entries (read once)."""
+        if self._corpus_hash is None:
+            from src.ingest.ingest import corpus_hash
+
+            self._corpus_hash = corpus_hash(self.db_path, self.collection_name) or ""
+        return self._corpus_hash or None
+
+    @property
+    def collection(self):
+        """ChromaDB collection with its embedding function (loaded once)."""
+        if self._collection is None:
+            # Load the embedder first so its time is not counted twice
+            embedder = self.embedder
+            with span("load", component="collection"):
+                from src.rag.retriever import get_collection
+
+                self._collection = get_collection(
+                    self.db_path,
+                    self.collection_name,
+                    self.embedding_model,
+                    embedding_function=embedder,
+                )
+        return self._collection
+
+    @property
+    def lexical_index(self) -> Optional[BM25Index]:
+        """BM25 index for hybrid retrieval (loaded once; None in dense mode)."""
+        if self.retrieval_mode != "hybrid":
+            return None
+        if self._lexical_index is None:
+            path = get_lexical_index_path(self.db_path, self.collection_name)
+            if not path.exists():
+                raise FileNotFoundError(
+                    f"BM25 index not found at {path}. Run python -m src.ingest.ingest first."
+                )
+            with span("load", component="lexical_index"):
+                self._lexical_index = BM25Index.load(path)
+        return self._lexical_index
+
+    @property
+    def reranker(self):
+        """Cross-encoder model (loaded once)."""
+        if self._reranker is None:
+            with span("load", component="reranker"):
+                self._reranker = get_reranker(self.reranker_model)
+        return self._reranker
+
+    @property
+    def client(self):
+        """Anthropic API client (created once)."""
+        if self._client is None:
+            with span("load", component="client"):
+                self._client = get_client()
+        return self._client
+
+    def warmup(self, rerank: bool = True, client: bool = True) -> "RAGPipeline":
+        """Eagerly load every component so the first query is not a cold start.
+
+        Also runs one throwaway query so the embedding model and the HNSW
+        index are paged in.
+
+        Args:
+            rerank: Also load the cross-encoder.
+            client: Also create the Anthropic client (requires API key).
+
+        Returns:
+            self, so calls can be chained.
+        """
+        self.collection.query(
+            query_embeddings=self.embedder(["warmup"]), n_results=1
+        )
+        self.lexical_index
+        if rerank:
+            self.reranker
+        if client:
+            self.client
+        return self
+
+    def flush(self):
+        """Persist new query embeddings to the disk cache tier, if enabled,
+        and wait for queued log entries to be written."""
+        if self._embedder is not None:
+            self._embedder.flush()
+        if self.log_sink is not None:
+            self.log_sink.flush()
+
+    def retrieve_many(
+        self,
+        queries: list[str],
+        n_retrieve: int = 20,
+        where: Optional[dict] = None,
+    ) -> list[list[dict]]:
+        """Retrieve candidates for several queries in one batched call.
+
+        Returns:
+            One list of retrieved chunk dicts per query.
+        """
+        from src.rag.retriever import retrieve_many
+
+        with self._model_lock:
+            return retrieve_many(
+                queries, self.collection, n_results=n_retrieve, where=where,
+                embedding_function=self.embedder,
+                mode=self.retrieval_mode, lexical_index=self.lexical_index,
+            )
+
+    def retrieve(
+        self,
+        query: str,
+        n_retrieve: int = 20,
+        where: Optional[dict] = None,
+    ) -> list[dict]:
+        """Run the retrieval stage for a single query."""
+        from src.rag.retriever import retrieve
+
+        with self._model_lock:
+            retrieved = retrieve(
+                query, self.collection, n_results=n_retrieve, where=where,
+                embedding_function=self.embedder,
+                mode=self.retrieval_mode, lexical_index=self.lexical_index,
+            )
+        print(f"  Retrieved {len(retrieved)} chunks")
+        return retrieved
+
+    def rerank(
+        self,
+        query: str,
+        retrieved: list[dict],
+        n_rerank: int = 10,
+        skip_rerank: bool = False,
+    ) -> list[dict]:
+        """Run the reranking stage (or keep retrieval order if skip_rerank)."""
+        if skip_rerank:
+            reranked = retrieved[:n_rerank]
+            for chunk in reranked:
+                chunk["rerank_score"] = None
+            print(f"  Skipped reranking, using top {len(reranked)} by embedding distance")
+        else:
+            reranker = self.reranker
+            with self._model_lock, span("rerank", candidates=len(retrieved)):
+                reranked = rerank(
+                    query,
+                    retrieved,
+                    top_k=n_rerank,
+                    model_name=self.reranker_model,
+                    reranker=reranker,
+                    cache=self.rerank_cache,
+                )
+            print(f"  Reranked to top {len(reranked)} chunks")
+        return reranked
+
+    def retrieve_and_rerank(
+        self,
+        query: str,
+        n_retrieve: int = 20,
+        n_rerank: int = 10,
+        where: Optional[dict] = None,
+        skip_rerank: bool = False,
+        retrieved: Optional[list[dict]] = None,
+    ) -> tuple[list[dict], list[dict]]:
+        """Run the retrieval and reranking stages for a single query.
+
+        Args:
+            retrieved: Candidates already fetched (e.g. by retrieve_many).
+                       If given, the retrieval stage is skipped.
+
+        Returns:
+            Tuple of (retrieved chunks, chunks to pass to the LLM).
+        """
+        # 1. Retrieve
+        if retrieved is None:
+            retrieved = self.retrieve(query, n_retrieve=n_retrieve, where=where)
+        else:
+            print(f"  Using {len(retrieved)} pre-retrieved chunks")
+
+        # 2. Rerank (or skip)
+        reranked = self.rerank(query, retrieved, n_rerank=n_rerank, skip_rerank=skip_rerank)
+
+        return retrieved, reranked
+
+    def query(
+        self,
+        query: str,
+        n_retrieve: int = 20,
+        n_rerank: int = 10,
+        where: Optional[dict] = None,
+        model: Optional[str] = None,
+        max_tokens: int = 2048,
+        log_path: Optional[str | Path] = None,
+        skip_rerank: bool = False,
+        metadata: Optional[dict] = None,
+        retrieved: Optional[list[dict]] = None,
+    ) -> dict:
+        """Run the full RAG pipeline for a single query.
+
+        Args:
+            query: Natural language research question.
+            n_retrieve: Number of chunks to retrieve from ChromaDB.
+            n_rerank: Number of top chunks to keep after reranking.
+            where: Optional metadata filter for retrieval.
+            model: Anthropic model override (defaults to self.model).
+            max_tokens: Max generation tokens.
+            log_path: JSONL log path override (defaults to self.log_path).
+            skip_rerank: If True, skip reranking (use retrieval order).
+            metadata: Optional extra metadata for the log entry.
+            retrieved: Pre-retrieved candidates (skips the retrieval stage).
+
+        Returns:
+            Dict with keys:
+                answer: Generated text with citations.
+                chunks_used: List of chunk dicts that were passed to the LLM.
+                log_entry: The full log entry dict.
+        """
+        trace = Trace()
+
+        # 1-2. Retrieve and rerank
+        with trace.active():
+            retrieved, reranked = self.retrieve_and_rerank(
+                query,
+                n_retrieve=n_retrieve,
+                n_rerank=n_rerank,
+                where=where,
+                skip_rerank=skip_rerank,
+                retrieved=retrieved,
+            )
+
+        # 3-4. Generate and log
+        return self.generate_and_log(
+            query,
+            retrieved,
+            reranked,
+            model=model,
+            max_tokens=max_tokens,
+            log_path=log_path,
+            metadata=metadata,
+            trace=trace,
+        )
+
+    def query_stream(
+        self,
+        query: str,
+        n_retrieve: int = 20,
+        n_rerank: int = 10,
+        where: Optional[dict] = None,
+        model: Optional[str] = None,
+        max_tokens: int = 2048,
+        log_path: Optional[str | Path] = None,
+        skip_rerank: bool = False,
+        metadata: Optional[dict] = None,
+        retrieved: Optional[list[dict]] = None,
+    ) -> Iterator[dict]:
+        """Streaming form of query(); same arguments.
+
+        Yields event dicts in order:
+            {"type": "retrieval", "chunks": [...]}   retrieved candidates
+            {"type": "rerank", "chunks": [...]}      chunks passed to the LLM
+            {"type": "token", "text": "..."}         one per answer text delta
+            {"type": "log", "answer", "chunks_used", "log_entry"}
+                                                     same fields as query()
+        """
+        trace = Trace()
+        start_time = trace.start
+        log_path = log_path or self.log_path
+
+        # The trace is only active around each stage, never across a yield,
+        # so it does not leak into the consumer's code
+
+        # 1. Retrieve
+        if retrieved is None:
+            with trace.active():
+                retrieved = self.retrieve(query, n_retrieve=n_retrieve, where=where)
+        yield {"type": "retrieval", "chunks": retrieved}
+
+        # 2. Rerank (or skip)
+        with trace.active():
+            reranked = self.rerank(query, retrieved, n_rerank=n_rerank, skip_rerank=skip_rerank)
+        yield {"type": "rerank", "chunks": reranked}
+
+        # 3. Generate, forwarding text deltas as they arrive (the stream
+        # records its own "generate" span)
+        with trace.active():
+            stream = generate_stream(
+                query,
+                reranked,
+                model=model or self.model,
+                max_tokens=max_tokens,
+                client=self.client,
+                cache=self.response_cache,
+            )
+        first_token_time = None
+        for text in stream:
+            if first_token_time is None:
+                first_token_time = time.perf_counter()
+            yield {"type": "token", "text": text}
+        gen_result = stream.result
+        end_time = time.perf_counter()
+        self.print_generated(gen_result, newline=True)
+
+        # 4. Log
+        result = self.log_result(
+            query, retrieved, reranked, gen_result, log_path, metadata,
+            timing=self._timing(start_time, first_token_time or end_time, end_time, True),
+            trace=trace,
+        )
+        yield {"type": "log", **result}
+
+    @staticmethod
+    def _timing(start: float, first_token: float, end: float, streamed: bool) -> dict:
+        """Latency fields for the log entry (seconds from the start of the query)."""
+        return {
+            "time_to_first_token_seconds": round(first_token - start, 4),
+            "total_seconds": round(end - start, 4),
+            "streamed": streamed,
+        }
+
+    @staticmethod
+    def print_generated(gen_result: dict, newline: bool = False):
+        """Print the generated-answer summary line (newline: end streamed text first)."""
+        cached = gen_result.get("cache", {}).get("status") == "hit"
+        prompt_cache_read = gen_result["usage"].get("cache_read_input_tokens", 0)
+        prefix = "\n" if newline else ""
+        print(f"{prefix}  Generated answer ({gen_result['usage']['output_tokens']} tokens"
+              f"{f', {prompt_cache_read} prompt tokens read from cache' if prompt_cache_read else ''}"
+              f"{', from response cache' if cached else ''})")
+
+    def log_result(
+        self,
+        query: str,
+        retrieved: list[dict],
+        reranked: list[dict],
+        gen_result: dict,
+        log_path: str | Path,
+        metadata: Optional[dict],
+        timing: dict,
+        trace: Optional[Trace] = None,
+    ) -> dict:
+        """Write the query log entry, finish and export the trace.
+
+        Shared by query(), query_stream() and AsyncRAGPipeline. The write
+        is blocking (a locked file append without a log_sink).
+
+        Returns:
+            Dict with keys answer, chunks_used and log_entry.
+        """
+        log_entry = log_query(
+            query=query,
+            retrieved_chunks=retrieved,
+            reranked_chunks=reranked,
+            generation_result=gen_result,
+            log_path=log_path,
+            metadata=metadata,
+            timing=timing,
+            trace=trace,
+            sink=(
+                self.log_sink
+                if self.log_sink is not None and Path(log_path) == self.log_sink.path
+                else None
+            ),
+            compact=self.compact_logs,
+            corpus_hash=self.corpus_hash if self.compact_logs else None,
+        )
+        print(f"  Logged to {log_path}")
+
+        if trace is not None:
+            trace.finish()
+            if self.trace_exporter is not None:
+                self.trace_exporter.export(trace, {
+                    "rag.query": query,
+                    "rag.model": gen_result.get("model", ""),
+                    "rag.total_seconds": timing["total_seconds"],
+                    "rag.time_to_first_token_seconds": timing["time_to_first_token_seconds"],
+                })
+
+        return {
+            "answer": gen_result["answer"],
+            "chunks_used": reranked,
+            "log_entry": log_entry,
+        }
+
+    def generate_and_log(
+        self,
+        query: str,
+        retrieved: list[dict],
+        reranked: list[dict],
+        model: Optional[str] = None,
+        max_tokens: int = 2048,
+        log_path: Optional[str | Path] = None,
+        metadata: Optional[dict] = None,
+        start_time: Optional[float] = None,
+        trace: Optional[Trace] = None,
+    ) -> dict:
+        """Run the generation and logging stages on already-ranked chunks.
+
+        Args:
+            start_time: time.perf_counter() value the logged latencies are
+                        measured from (default: the trace start, or now,
+                        i.e. generation only).
+            trace: Trace holding the spans of earlier stages. A new one is
+                   started if omitted.
+
+        Returns:
+            Same dict as query().
+        """
+        log_path = log_path or self.log_path
+        if trace is None:
+            trace = Trace(start=start_time)
+        if start_time is None:
+            start_time = trace.start
+
+        # 3. Generate
+        with trace.active():
+            gen_result = generate(
+                query,
+                reranked,
+                model=model or self.model,
+                max_tokens=max_tokens,
+                client=self.client,
+                cache=self.response_cache,
+            )
+        end_time = time.perf_counter()
+        self.print_generated(gen_result)
+
+        # 4. Log (without streaming, the first token arrives with the whole answer)
+        return self.log_result(
+            query, retrieved, reranked, gen_result, log_path, metadata,
+            timing=self._timing(start_time, end_time, end_time, False),
+            trace=trace,
+        )
+
+    def rerank_many(
+        self,
+        queries: list[str],
+        chunk_lists: list[list[dict]],
+        n_rerank: int = 10,
+        batch_size: int = 64,
+    ) -> list[list[dict]]:
+        """Rerank candidates for several queries in one cross-encoder call.
+
+        Returns:
+            One top-n_rerank list per query.
+        """
+        reranker = self.reranker
+        with self._model_lock, span("rerank", candidates=sum(map(len, chunk_lists))):
+            return rerank_many(
+                queries,
+                chunk_lists,
+                top_k=n_rerank,
+                model_name=self.reranker_model,
+                reranker=reranker,
+                batch_size=batch_size,
+                cache=self.rerank_cache,
+            )
+
+    def query_many(
+        self,
+        queries: list[str],
+        n_retrieve: int = 20,
+        n_rerank: int = 10,
+        where: Optional[dict] = None,
+        skip_rerank: bool = False,
+        **kwargs,
+    ) -> list[dict]:
+        """Run the full pipeline for several queries, reusing loaded components.
+
+        Retrieval for all queries runs as one batched ChromaDB call and
+        reranking as one batched cross-encoder call; generation and
+        logging then run per query.
+
+        Args:
+            queries: List of research questions.
+            n_retrieve: Number of chunks to retrieve per query.
+            n_rerank: Number of top chunks to keep per query after reranking.
+            where: Optional metadata filter applied to every query.
+            skip_rerank: If True, skip reranking (use retrieval order).
+            **kwargs: Passed through to generate_and_log() (model,
+                      max_tokens, log_path, metadata).
+
+        Returns:
+            List of result dicts in the same order as queries.
+        """
+        batch = Trace()
+        with batch.active():
+            retrieved_lists = self.retrieve_many(queries, n_retrieve=n_retrieve, where=where)
+        print(f"  Retrieved candidates for {len(queries)} queries in one batch")
+
+        if skip_rerank:
+            reranked_lists = [r[:n_rerank] for r in retrieved_lists]
+            for reranked in reranked_lists:
+                for chunk in reranked:
+                    chunk["rerank_score"] = None
+        else:
+            with batch.active():
+                reranked_lists = self.rerank_many(queries, retrieved_lists, n_rerank=n_rerank)
+            print(f"  Reranked {len(queries)} queries in one batch")
+
+        results = []
+        for q, retrieved, reranked in zip(queries, retrieved_lists, reranked_lists):
+            # Each query's trace starts with the shared batch stages; its
+            # logged latency still covers generation only
+            trace = Trace(start=batch.start)
+            trace.add_spans(batch.spans, batch_size=len(queries))
+            results.append(self.generate_and_log(
+                q, retrieved, reranked, start_time=time.perf_counter(), trace=trace, **kwargs
+            ))
+        return results
+
+
+# Module-level cache so repeated run_query() calls share one warm pipeline,
+# with the RAGPipeline arguments each was created with
+_pipelines: dict[tuple[str, str], RAGPipeline] = {}
+_pipeline_kwargs: dict[tuple[str, str], dict] = {}
+
+
+def get_pipeline(
+    db_path: str | Path = "data/chromadb",
+    collection_name: str = "space_debris_rag",
+    **kwargs,
+) -> RAGPipeline:
+    """Return the shared RAGPipeline for a collection (created on first call).
+
+    Args:
+        db_path: Path to ChromaDB storage.
+        collection_name: ChromaDB collection name.
+        **kwargs: Extra RAGPipeline arguments (e.g. rerank_cache). Later
+                  calls may omit them to get the shared pipeline as
+                  configured; passing different ones is an error.
+
+    Raises:
+        ValueError: If kwargs differ from the shared pipeline's. Build a
+                    RAGPipeline directly for a separately configured one.
+    """
+    key = (str(db_path), collection_name)
+    if key not in _pipelines:
+        _pipelines[key] = RAGPipeline(
+            db_path=db_path, collection_name=collection_name, **kwargs
+        )
+        _pipeline_kwargs[key] = kwargs
+    elif kwargs and kwargs != _pipeline_kwargs[key]:
+        changed = sorted(
+            name for name in kwargs.keys() | _pipeline_kwargs[key].keys()
+            if kwargs.get(name) != _pipeline_kwargs[key].get(name)
+        )
+        raise ValueError(
+            f"Shared pipeline for {key} was created with different settings "
+            f"({', '.join(changed)}); build a RAGPipeline for a separate configuration"
+        )
+    return _pipelines[key]
 
 
 def run_query(
@@ -27,9 +693,13 @@ def run_query(
     log_path: str | Path = "logs/rag_queries.jsonl",
     skip_rerank: bool = False,
     metadata: Optional[dict] = None,
+    retrieved: Optional[list[dict]] = None,
 ) -> dict:
     """Run the full RAG pipeline for a single query.
 
+    Thin wrapper over a shared RAGPipeline (see get_pipeline), so the
+    collection, models and API client are only built on the first call.
+
     Args:
         query: Natural language research question.
         db_path: Path to ChromaDB storage.
@@ -42,6 +712,7 @@ def run_query(
         log_path: Path for JSONL log output.
         skip_rerank: If True, skip reranking (use retrieval order).
         metadata: Optional extra metadata for the log entry.
+        retrieved: Pre-retrieved candidates (skips the retrieval stage).
 
     Returns:
         Dict with keys:
@@ -49,38 +720,54 @@ def run_query(
             chunks_used: List of chunk dicts that were passed to the LLM.
             log_entry: The full log entry dict.
     """
-    # 1. Retrieve
-    collection = get_collection(db_path, collection_name)
-    retrieved = retrieve(query, collection, n_results=n_retrieve, where=where)
-    print(f"  Retrieved {len(retrieved)} chunks")
-
-    # 2. Rerank (or skip)
-    if skip_rerank:
-        reranked = retrieved[:n_rerank]
-        for chunk in reranked:
-            chunk["rerank_score"] = None
-        print(f"  Skipped reranking, using top {len(reranked)} by embedding distance")
-    else:
-        reranked = rerank(query, retrieved, top_k=n_rerank)
-        print(f"  Reranked to top {len(reranked)} chunks")
-
-    # 3. Generate
-    gen_result = generate(query, reranked, model=model, max_tokens=max_tokens)
-    print(f"  Generated answer ({gen_result['usage']['output_tokens']} tokens)")
-
-    # 4. Log
-    log_entry = log_query(
-        query=query,
-        retrieved_chunks=retrieved,
-        reranked_chunks=reranked,
-        generation_result=gen_result,
+    return get_pipeline(db_path, collection_name).query(
+        query,
+        n_retrieve=n_retrieve,
+        n_rerank=n_rerank,
+        where=where,
+        model=model,
+        max_tokens=max_tokens,
         log_path=log_path,
+        skip_rerank=skip_rerank,
         metadata=metadata,
+        retrieved=retrieved,
     )
-    print(f"  Logged to {log_path}")
 
-    return {
-        "answer": gen_result["answer"],
-        "chunks_used": reranked,
-        "log_entry": log_entry,
-    }
+
+def run_query_stream(
+    query: str,
+    db_path: str | Path = "data/chromadb",
+    collection_name: str = "space_debris_rag",
+    n_retrieve: int = 20,
+    n_rerank: int = 10,
+    where: Optional[dict] = None,
+    model: Optional[str] = None,
+    max_tokens: int = 2048,
+    log_path: str | Path = "logs/rag_queries.jsonl",
+    skip_rerank: bool = False,
+    metadata: Optional[dict] = None,
+    retrieved: Optional[list[dict]] = None,
+) -> Iterator[dict]:
+    """Streaming form of run_query(); same arguments.
+
+    Yields "retrieval", "rerank", then one "token" event per answer text
+    delta, then a "log" event carrying the run_query() result fields (see
+    RAGPipeline.query_stream).
+
+    Example:
+        for event in run_query_stream("What is the Kessler syndrome?"):
+            if event["type"] == "token":
+                print(event["text"], end="", flush=True)
+    """
+    return get_pipeline(db_path, collection_name).query_stream(
+        query,
+        n_retrieve=n_retrieve,
+        n_rerank=n_rerank,
+        where=where,
+        model=model,
+        max_tokens=max_tokens,
+        log_path=log_path,
+        skip_rerank=skip_rerank,
+        metadata=metadata,
+        retrieved=retrieved,
+    )
@@ -6,6 +6,13 @@ These prompts ensure the LLM:
   - Uses (source_id, chunk_id) citation format
   - Refuses to invent citations
   - Flags missing or conflicting evidence
+
+Requests are laid out for prompt caching: the static system prompt is sent
+first as its own text block, and the per-query evidence and question
+follow it in the user message. The block gets a cache_control marker only
+once it reaches the minimum cacheable length of the model it is sent to
+(see prefix_block). The current system prompt is far shorter than that for
+every model, so it is sent unmarked and prompt caching is not in effect.
 """
 
 SYSTEM_PROMPT = """\
@@ -29,6 +36,23 @@ once, formatted as: source_id — Title (Year).\
 
 PROMPT_VERSION = "v1.0"
 
+# Shortest prompt prefix Anthropic caches, by model name prefix (first match
+# wins). Models not listed get the largest value.
+MIN_CACHEABLE_TOKENS = (
+    ("claude-opus-4-6", 4096),
+    ("claude-opus-4-5", 4096),
+    ("claude-haiku-4-5", 4096),
+    ("claude-3-5-haiku", 2048),
+    ("claude-3-haiku", 2048),
+    ("claude-sonnet-4-5", 1024),
+    ("claude-sonnet-4", 1024),
+    ("claude-opus-4", 1024),
+    ("claude-3-7-sonnet", 1024),
+)
+
+# Rough characters per token for English prose, used to size prefixes
+CHARS_PER_TOKEN = 4
+
 
 def build_prompt(query: str, chunks: list[dict]) -> list[dict]:
     """Build the messages list for the Anthropic API.
@@ -75,6 +99,33 @@ def get_system_prompt() -> str:
     return SYSTEM_PROMPT
 
 
+def min_cacheable_tokens(model: str) -> int:
+    """Shortest prompt prefix, in tokens, that model can cache."""
+    for prefix, tokens in MIN_CACHEABLE_TOKENS:
+        if model.startswith(prefix):
+            return tokens
+    return max(tokens for _, tokens in MIN_CACHEABLE_TOKENS)
+
+
+def prefix_block(text: str, model: str) -> dict:
+    """Text content block for a static prompt prefix that starts the request.
+
+    Marked with cache_control only when the text is long enough for model
+    to cache it (min_cacheable_tokens, estimated at CHARS_PER_TOKEN); a
+    marker on a shorter prefix is accepted by the API but never produces a
+    hit.
+    """
+    block = {"type": "text", "text": text}
+    if len(text) >= min_cacheable_tokens(model) * CHARS_PER_TOKEN:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
+
+
+def get_system_blocks(model: str) -> list[dict]:
+    """Return the system prompt as a content block list (see prefix_block)."""
+    return [prefix_block(SYSTEM_PROMPT, model)]
+
+
 def get_prompt_version() -> str:
     """Return the current prompt version for logging."""
     return PROMPT_VERSION
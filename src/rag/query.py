@@ -9,6 +9,20 @@ Usage:
     python -m src.rag.query "What uncertainty quantification methods are used?" \
         --model claude-opus-4-6 --top-k 5
 
+    # Print the answer token by token as it is generated
+    python -m src.rag.query "What is the Kessler syndrome?" --stream
+
+    # Reuse identical earlier answers; --no-cache forces a fresh API call
+    python -m src.rag.query "What is the Kessler syndrome?" \
+        --response-cache data/cache/responses.sqlite
+
+    # Also write the stage spans as OpenTelemetry OTLP/JSON
+    python -m src.rag.query "What is the Kessler syndrome?" \
+        --trace-file logs/traces.otlp.jsonl
+
+    # Log chunk references (id + text hash) instead of chunk text
+    python -m src.rag.query "What is the Kessler syndrome?" --compact-log
+
 This satisfies the assignment acceptance test:
   "A single command produces: retrieval results, an answer with citations,
    and a saved log entry."
@@ -16,6 +30,7 @@ This satisfies the assignment acceptance test:
 
 import argparse
 import json
+import os
 import sys
 from pathlib import Path
 
@@ -28,8 +43,6 @@ from dotenv import load_dotenv
 load_dotenv(_PROJECT_ROOT / ".env", override=True)
 load_dotenv(_PROJECT_ROOT / "grader.env", override=True)
 
-from src.rag.pipeline import run_query
-
 
 def main():
     parser = argparse.ArgumentParser(
@@ -87,14 +100,94 @@ def main():
         action="store_true",
         help="Skip cross-encoder reranking (use embedding distance only)",
     )
+    parser.add_argument(
+        "--retrieval-mode",
+        choices=["dense", "hybrid"],
+        default="dense",
+        help="dense = ChromaDB only; hybrid = ChromaDB + BM25 fused with "
+             "reciprocal rank fusion (default: dense)",
+    )
+    parser.add_argument(
+        "--rerank-cache",
+        type=str,
+        default=None,
+        help="SQLite file for persistent rerank scores "
+             "(e.g. data/cache/rerank_scores.sqlite; default: in-memory only)",
+    )
+    parser.add_argument(
+        "--embedding-cache",
+        type=str,
+        default=None,
+        help="Directory for persistent query embeddings "
+             "(e.g. data/cache/embeddings; default: in-memory only)",
+    )
+    parser.add_argument(
+        "--response-cache",
+        type=str,
+        default=os.environ.get("RAG_RESPONSE_CACHE"),
+        help="SQLite file caching generation responses by prompt fingerprint "
+             "(e.g. data/cache/responses.sqlite; default: $RAG_RESPONSE_CACHE, "
+             "otherwise off)",
+    )
+    parser.add_argument(
+        "--cache-ttl-hours",
+        type=float,
+        default=168,
+        help="Response cache entry lifetime in hours (default: 168)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Bypass the response cache for this query, even if configured",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the answer as it is generated instead of all at once",
+    )
+    parser.add_argument(
+        "--trace-file",
+        type=str,
+        default=os.environ.get("RAG_TRACE_FILE"),
+        help="Append each query's stage spans as OpenTelemetry OTLP/JSON "
+             "(e.g. logs/traces.otlp.jsonl; default: $RAG_TRACE_FILE, otherwise off)",
+    )
+    parser.add_argument(
+        "--compact-log",
+        action="store_true",
+        help="Log reranked chunks as id + text hash references with the corpus "
+             "hash instead of their text (rehydrate with src.rag.chunk_store)",
+    )
 
     args = parser.parse_args()
 
+    # Imported after argument parsing so --help and usage errors stay fast;
+    # the pipeline itself defers chromadb, sentence-transformers and anthropic
+    from src.rag.pipeline import get_pipeline, run_query, run_query_stream
+    from src.rag.rerank_cache import RerankScoreCache
+    from src.rag.response_cache import ResponseCache
+    from src.rag.tracing import OTLPFileExporter, stage_durations
+
     print(f"\n{'='*70}")
     print(f"QUERY: {args.query}")
     print(f"{'='*70}\n")
 
-    result = run_query(
+    pipeline = get_pipeline(
+        args.db_path,
+        args.collection,
+        rerank_cache=RerankScoreCache(db_path=args.rerank_cache),
+        embedding_cache_dir=args.embedding_cache,
+        retrieval_mode=args.retrieval_mode,
+        response_cache=(
+            ResponseCache(args.response_cache, ttl_seconds=args.cache_ttl_hours * 3600)
+            if args.response_cache and not args.no_cache
+            else None
+        ),
+        trace_exporter=OTLPFileExporter(args.trace_file) if args.trace_file else None,
+        compact_logs=args.compact_log,
+    )
+
+    query_kwargs = dict(
         query=args.query,
         db_path=args.db_path,
         collection_name=args.collection,
@@ -106,11 +199,25 @@ def main():
         skip_rerank=args.no_rerank,
     )
 
-    # Print answer
-    print(f"\n{'='*70}")
-    print("ANSWER:")
-    print(f"{'='*70}\n")
-    print(result["answer"])
+    if args.stream:
+        result = None
+        for event in run_query_stream(**query_kwargs):
+            if event["type"] == "rerank":
+                print(f"\n{'='*70}")
+                print("ANSWER:")
+                print(f"{'='*70}\n")
+            elif event["type"] == "token":
+                print(event["text"], end="", flush=True)
+            elif event["type"] == "log":
+                result = event
+    else:
+        result = run_query(**query_kwargs)
+
+        # Print answer
+        print(f"\n{'='*70}")
+        print("ANSWER:")
+        print(f"{'='*70}\n")
+        print(result["answer"])
 
     # Print sources used
     print(f"\n{'='*70}")
@@ -125,6 +232,21 @@ def main():
             f"dist={chunk['distance']:.4f}{score_str}"
         )
 
+    pipeline.flush()
+    if not args.no_rerank:
+        stats = pipeline.rerank_cache.stats()
+        print(f"\nRerank cache: {stats['hits']} hits, {stats['misses']} misses")
+    cache_info = result["log_entry"]["generation"].get("cache")
+    if cache_info:
+        print(f"Response cache: {cache_info['status']}")
+    timing = result["log_entry"]["timing"]
+    print(f"Latency: first token {timing['time_to_first_token_seconds']:.2f}s, "
+          f"total {timing['total_seconds']:.2f}s")
+    stages = stage_durations(result["log_entry"]["trace"])
+    print("Stages: " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in stages.items()))
+    if args.trace_file:
+        print(f"Trace appended to: {args.trace_file}")
+
     print(f"\nLog saved to: {args.log_path}")
 
 
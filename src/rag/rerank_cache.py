@@ -0,0 +1,164 @@
+"""
+rerank_cache.py — Bounded cache of cross-encoder scores.
+
+The same ~20 candidates for a query get rescored whenever the query
+repeats (eval modes, reruns, user retries). RerankScoreCache stores each
+(query, chunk, model) score so CrossEncoder.predict only runs on pairs
+that have not been scored before.
+
+Two tiers:
+  - memory: LRU-evicted OrderedDict, bounded by max_entries
+  - disk (optional): SQLite table that survives across processes
+
+Keys are (normalized query text, composite chunk id, reranker model name).
+The composite id is source_id::chunk_id (see ingest.parser.build_composite_id).
+If chunk text changes at re-ingest, clear() the disk tier.
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from src.ingest.parser import build_composite_id
+
+
+CacheKey = tuple[str, str, str]
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text for cache lookups.
+
+    Collapses whitespace and lowercases. The default ms-marco MiniLM
+    cross-encoder uses an uncased tokenizer, so this does not change scores.
+    """
+    return " ".join(query.split()).lower()
+
+
+def chunk_key_id(chunk: dict) -> str:
+    """Return the composite source_id::chunk_id for a chunk dict."""
+    return chunk.get("id") or build_composite_id(
+        chunk.get("source_id", ""), chunk.get("chunk_id", "")
+    )
+
+
+class RerankScoreCache:
+    """LRU memory cache of rerank scores with an optional SQLite tier."""
+
+    def __init__(
+        self,
+        max_entries: int = 50_000,
+        db_path: Optional[str | Path] = None,
+    ):
+        """
+        Args:
+            max_entries: Maximum scores kept in memory before LRU eviction.
+            db_path: Optional SQLite file for the persistent tier.
+        """
+        self.max_entries = max_entries
+        self.db_path = Path(db_path) if db_path else None
+
+        self._memory: OrderedDict[CacheKey, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rerank_scores ("
+                " model TEXT NOT NULL,"
+                " query TEXT NOT NULL,"
+                " chunk_id TEXT NOT NULL,"
+                " score REAL NOT NULL,"
+                " PRIMARY KEY (model, query, chunk_id))"
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def make_key(query: str, chunk: dict, model_name: str) -> CacheKey:
+        """Build the (normalized query, composite id, model) cache key."""
+        return (normalize_query(query), chunk_key_id(chunk), model_name)
+
+    def get_many(self, keys: list[CacheKey]) -> dict[CacheKey, float]:
+        """Look up keys in memory, then on disk. Updates hit/miss counters.
+
+        Returns:
+            Dict of the keys that were found, mapped to their scores.
+        """
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                else:
+                    missing.append(key)
+
+            if missing and self._conn is not None:
+                for key in missing:
+                    row = self._conn.execute(
+                        "SELECT score FROM rerank_scores "
+                        "WHERE query = ? AND chunk_id = ? AND model = ?",
+                        key,
+                    ).fetchone()
+                    if row is not None:
+                        found[key] = row[0]
+                        self.disk_hits += 1
+                        self._remember(key, row[0])
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, scores: dict[CacheKey, float]):
+        """Store newly computed scores in memory and (if enabled) on disk."""
+        with self._lock:
+            for key, score in scores.items():
+                self._remember(key, score)
+            if self._conn is not None and scores:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO rerank_scores "
+                    "(query, chunk_id, model, score) VALUES (?, ?, ?, ?)",
+                    [(*key, score) for key, score in scores.items()],
+                )
+                self._conn.commit()
+
+    def _remember(self, key: CacheKey, score: float):
+        """Insert into the memory tier, evicting least-recently-used entries."""
+        self._memory[key] = score
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current memory size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def clear(self):
+        """Drop every cached score from both tiers and reset counters."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM rerank_scores")
+                self._conn.commit()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def close(self):
+        """Close the SQLite connection, if any."""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
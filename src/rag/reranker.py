@@ -7,17 +7,28 @@ query-chunk pair jointly for more accurate relevance ranking.
 
 Uses sentence-transformers CrossEncoder with ms-marco-MiniLM-L-6-v2
 (lightweight, good quality for academic text reranking).
+
+sentence_transformers (and torch) are imported on the first get_reranker()
+call, so importing this module is cheap and --no-rerank runs never load
+the cross-encoder.
 """
 
-from sentence_transformers import CrossEncoder
+from typing import TYPE_CHECKING
+
+from src.rag.rerank_cache import RerankScoreCache
+
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder
 
-# Module-level cache so the model loads once
-_reranker: CrossEncoder | None = None
+DEFAULT_RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Module-level cache so each model loads once
+_rerankers: dict[str, "CrossEncoder"] = {}
 
 
 def get_reranker(
-    model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
-) -> CrossEncoder:
+    model_name: str = DEFAULT_RERANKER_MODEL,
+) -> "CrossEncoder":
     """Load the cross-encoder model (cached after first call).
 
     Args:
@@ -26,19 +37,22 @@ def get_reranker(
     Returns:
         CrossEncoder instance.
     """
-    global _reranker
-    if _reranker is None:
+    if model_name not in _rerankers:
+        from sentence_transformers import CrossEncoder
+
         print(f"Loading reranker model: {model_name}")
-        _reranker = CrossEncoder(model_name)
+        _rerankers[model_name] = CrossEncoder(model_name)
         print("Reranker loaded.")
-    return _reranker
+    return _rerankers[model_name]
 
 
 def rerank(
     query: str,
     chunks: list[dict],
     top_k: int = 10,
-    model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+    model_name: str = DEFAULT_RERANKER_MODEL,
+    reranker: "CrossEncoder | None" = None,
+    cache: RerankScoreCache | None = None,
 ) -> list[dict]:
     """Rerank retrieved chunks using a cross-encoder.
 
@@ -47,23 +61,89 @@ def rerank(
         chunks: List of chunk dicts from retriever.retrieve().
         top_k: Number of top results to return after reranking.
         model_name: Cross-encoder model to use.
+        reranker: Already-loaded CrossEncoder (e.g. owned by RAGPipeline).
+                  Defaults to the cached model for model_name.
+        cache: Optional score cache; only uncached pairs are scored.
 
     Returns:
         Top-k chunks sorted by cross-encoder relevance score (descending).
         Each chunk dict gets an added 'rerank_score' field.
     """
-    if not chunks:
-        return []
+    return rerank_many(
+        [query], [chunks], top_k=top_k, model_name=model_name,
+        reranker=reranker, cache=cache,
+    )[0]
 
-    reranker = get_reranker(model_name)
 
-    # Build query-document pairs for the cross-encoder
-    pairs = [(query, chunk["text"]) for chunk in chunks]
-    scores = reranker.predict(pairs)
+def rerank_many(
+    queries: list[str],
+    chunk_lists: list[list[dict]],
+    top_k: int = 10,
+    model_name: str = DEFAULT_RERANKER_MODEL,
+    reranker: "CrossEncoder | None" = None,
+    batch_size: int = 64,
+    cache: RerankScoreCache | None = None,
+) -> list[list[dict]]:
+    """Rerank candidates for many queries with a single predict() call.
 
-    # Attach scores and sort
-    for chunk, score in zip(chunks, scores):
-        chunk["rerank_score"] = float(score)
+    Every (query, chunk) pair across all queries is flattened into one
+    list so the cross-encoder runs a few large batches instead of one
+    small batch per query. Scores are then split back per query.
 
-    ranked = sorted(chunks, key=lambda c: c["rerank_score"], reverse=True)
-    return ranked[:top_k]
+    Args:
+        queries: Query strings.
+        chunk_lists: One list of chunk dicts per query (same order).
+        top_k: Number of top results to keep per query.
+        model_name: Cross-encoder model to use.
+        reranker: Already-loaded CrossEncoder. Defaults to the cached model.
+        batch_size: Pairs per forward pass inside predict().
+        cache: Optional score cache. Pairs already scored for this model are
+               read from it; only the misses go through predict().
+
+    Returns:
+        One top-k list per query, sorted by 'rerank_score' (descending),
+        with the same semantics as rerank().
+    """
+    if len(queries) != len(chunk_lists):
+        raise ValueError(
+            f"Got {len(queries)} queries but {len(chunk_lists)} chunk lists"
+        )
+
+    flat = [
+        (query, chunk)
+        for query, chunks in zip(queries, chunk_lists)
+        for chunk in chunks
+    ]
+    if not flat:
+        return [[] for _ in queries]
+
+    # Fill in cached scores; only the misses go to the model
+    scores = [None] * len(flat)
+    if cache is not None:
+        keys = [cache.make_key(q, chunk, model_name) for q, chunk in flat]
+        cached = cache.get_many(keys)
+        for i, key in enumerate(keys):
+            scores[i] = cached.get(key)
+    todo = [i for i, score in enumerate(scores) if score is None]
+
+    if todo:
+        reranker = reranker or get_reranker(model_name)
+        pairs = [(flat[i][0], flat[i][1]["text"]) for i in todo]
+        predicted = reranker.predict(pairs, batch_size=batch_size)
+        for i, score in zip(todo, predicted):
+            scores[i] = float(score)
+        if cache is not None:
+            cache.put_many({keys[i]: scores[i] for i in todo})
+
+    # Split the flat score array back into per-query slices
+    results = []
+    offset = 0
+    for chunks in chunk_lists:
+        for chunk, score in zip(chunks, scores[offset:offset + len(chunks)]):
+            chunk["rerank_score"] = float(score)
+        offset += len(chunks)
+
+        ranked = sorted(chunks, key=lambda c: c["rerank_score"], reverse=True)
+        results.append(ranked[:top_k])
+
+    return results
@@ -3,19 +3,35 @@ retriever.py — Query ChromaDB for relevant chunks with optional metadata filte
 
 Handles embedding the query, searching the collection, and returning
 ranked results with metadata for downstream reranking and generation.
+
+Two retrieval modes:
+  - dense:  ChromaDB nearest-neighbour search on all-mpnet-base-v2 embeddings
+  - hybrid: dense results fused with BM25 (src.rag.lexical) using
+            reciprocal rank fusion, so exact technical terms are not missed
 """
 
 from pathlib import Path
 from typing import Optional
 
 import chromadb
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+import numpy as np
+
+from src.rag.embedding_cache import CachedSentenceTransformerEmbeddingFunction
+from src.rag.lexical import BM25Index
+from src.rag.tracing import span
+
+RETRIEVAL_MODES = ("dense", "hybrid")
+
+# Standard RRF constant: score = sum over rankers of 1 / (RRF_K + rank)
+RRF_K = 60
 
 
 def get_collection(
     db_path: str | Path = "data/chromadb",
     collection_name: str = "space_debris_rag",
     model_name: str = "all-mpnet-base-v2",
+    embedding_function: Optional[CachedSentenceTransformerEmbeddingFunction] = None,
+    embedding_cache_dir: Optional[str | Path] = None,
 ) -> chromadb.Collection:
     """Load an existing ChromaDB collection with its embedding function.
 
@@ -23,11 +39,16 @@ def get_collection(
         db_path: Path to ChromaDB persistent storage.
         collection_name: Name of the collection.
         model_name: Sentence-transformers model (must match what was used at ingest).
+        embedding_function: Already-built embedding function to attach.
+                            Defaults to a cached one for model_name.
+        embedding_cache_dir: Optional disk tier for the query-embedding cache.
 
     Returns:
         chromadb.Collection ready for queries.
     """
-    ef = SentenceTransformerEmbeddingFunction(model_name=model_name)
+    ef = embedding_function or CachedSentenceTransformerEmbeddingFunction(
+        model_name=model_name, cache_dir=embedding_cache_dir
+    )
     client = chromadb.PersistentClient(path=str(db_path))
     collection = client.get_collection(
         name=collection_name,
@@ -41,6 +62,9 @@ def retrieve(
     collection: chromadb.Collection,
     n_results: int = 20,
     where: Optional[dict] = None,
+    embedding_function: Optional[CachedSentenceTransformerEmbeddingFunction] = None,
+    mode: str = "dense",
+    lexical_index: Optional[BM25Index] = None,
 ) -> list[dict]:
     """Retrieve top-k chunks from ChromaDB for a query.
 
@@ -53,37 +77,214 @@ def retrieve(
                {"year": {"$gte": 2022}} or
                {"doc_type": "peer-reviewed"} or
                {"$and": [{"year": {"$gte": 2022}}, {"doc_type": "peer-reviewed"}]}
+        embedding_function: If given, the query is embedded with it (through
+                            its cache) and sent as query_embeddings.
+        mode: "dense" or "hybrid" (see retrieve_many).
+        lexical_index: BM25 index, required for mode="hybrid".
 
     Returns:
         List of dicts, each with keys:
             id, text, distance, source_id, chunk_id, section_id,
             section_title, year, doc_type, venue, authors
+        Hybrid mode also adds rrf_score and bm25_score.
+    """
+    return retrieve_many(
+        [query], collection, n_results=n_results, where=where,
+        embedding_function=embedding_function,
+        mode=mode, lexical_index=lexical_index,
+    )[0]
+
+
+def retrieve_many(
+    queries: list[str],
+    collection: chromadb.Collection,
+    n_results: int = 20,
+    where: Optional[dict] = None,
+    embedding_function: Optional[CachedSentenceTransformerEmbeddingFunction] = None,
+    mode: str = "dense",
+    lexical_index: Optional[BM25Index] = None,
+) -> list[list[dict]]:
+    """Retrieve top-k chunks for several queries with one ChromaDB call.
+
+    All queries are embedded in a single batched forward pass and searched
+    with one collection.query(), instead of one round trip per query.
+
+    Args:
+        queries: List of natural language query strings.
+        collection: ChromaDB collection to search.
+        n_results: Number of results to retrieve per query.
+        where: Optional ChromaDB metadata filter applied to every query.
+        embedding_function: If given, queries are embedded with it (cache
+                            hits skip the model) and sent as query_embeddings.
+        mode: "dense" for ChromaDB only, or "hybrid" to fuse the top
+              n_results from ChromaDB and from BM25 with reciprocal rank
+              fusion and keep the top n_results of the fused list.
+        lexical_index: BM25 index, required for mode="hybrid".
+
+    Returns:
+        One list of chunk dicts per query, in the same order as queries.
+        Each chunk dict has the same keys as retrieve() returns.
     """
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode {mode!r}; expected one of {RETRIEVAL_MODES}")
+    if not queries:
+        return []
+    if mode == "hybrid":
+        if lexical_index is None or embedding_function is None:
+            raise ValueError("Hybrid retrieval needs a lexical_index and an embedding_function")
+        return _retrieve_hybrid(
+            queries, collection, n_results, where, embedding_function, lexical_index
+        )
+
+    kwargs = {
+        "n_results": n_results,
+        "include": ["documents", "metadatas", "distances"],
+    }
+    if embedding_function is not None:
+        with span("embed", queries=len(queries)):
+            kwargs["query_embeddings"] = embedding_function(list(queries))
+    else:
+        kwargs["query_texts"] = list(queries)
+    if where:
+        kwargs["where"] = where
+
+    # Without an embedding_function ChromaDB embeds inside query(), so
+    # "search" then includes the embedding time
+    with span("search", mode="dense", n_results=n_results):
+        results = collection.query(**kwargs)
+
+    return [_format_results(results, q) for q in range(len(queries))]
+
+
+def _retrieve_hybrid(
+    queries: list[str],
+    collection: chromadb.Collection,
+    n_results: int,
+    where: Optional[dict],
+    embedding_function: CachedSentenceTransformerEmbeddingFunction,
+    lexical_index: BM25Index,
+) -> list[list[dict]]:
+    """Fuse dense and BM25 rankings with reciprocal rank fusion."""
+    with span("embed", queries=len(queries)):
+        query_embeddings = embedding_function(list(queries))
+
+    with span("search", mode="hybrid", n_results=n_results):
+        return _search_hybrid(
+            queries, query_embeddings, collection, n_results, where, lexical_index
+        )
+
+
+def _search_hybrid(
+    queries: list[str],
+    query_embeddings: list,
+    collection: chromadb.Collection,
+    n_results: int,
+    where: Optional[dict],
+    lexical_index: BM25Index,
+) -> list[list[dict]]:
+    """Dense + BM25 search and fusion for already-embedded queries."""
+
     kwargs = {
-        "query_texts": [query],
+        "query_embeddings": query_embeddings,
         "n_results": n_results,
         "include": ["documents", "metadatas", "distances"],
     }
     if where:
         kwargs["where"] = where
+    dense = collection.query(**kwargs)
+
+    # BM25 can't evaluate ChromaDB filters itself; ask ChromaDB which ids pass.
+    allowed_ids = None
+    if where:
+        allowed_ids = set(collection.get(where=where, include=[])["ids"])
+
+    fused_lists = []
+    bm25_lists = []
+    # Dense chunks per query: a chunk's distance is to that query only
+    known_lists = []
+    for q, query in enumerate(queries):
+        dense_chunks = _format_results(dense, q)
+        lexical = lexical_index.search(query, k=n_results, allowed_ids=allowed_ids)
+
+        fused = {}
+        known = {}
+        for rank, chunk in enumerate(dense_chunks, 1):
+            fused[chunk["id"]] = fused.get(chunk["id"], 0.0) + 1.0 / (RRF_K + rank)
+            known[chunk["id"]] = chunk
+        for rank, (doc_id, _) in enumerate(lexical, 1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank)
+
+        top = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)[:n_results]
+        fused_lists.append(top)
+        bm25_lists.append(dict(lexical))
+        known_lists.append(known)
+
+    # Fetch text, metadata and embeddings for lexical-only hits in one call
+    missing = sorted({
+        doc_id
+        for top, known in zip(fused_lists, known_lists)
+        for doc_id, _ in top
+        if doc_id not in known
+    })
+    missing_data = {}
+    if missing:
+        got = collection.get(ids=missing, include=["documents", "metadatas", "embeddings"])
+        for i, doc_id in enumerate(got["ids"]):
+            missing_data[doc_id] = (
+                got["documents"][i], got["metadatas"][i], np.asarray(got["embeddings"][i])
+            )
+
+    results = []
+    for q, (top, known) in enumerate(zip(fused_lists, known_lists)):
+        q_vec = np.asarray(query_embeddings[q], dtype=np.float32)
+        chunks = []
+        for doc_id, rrf_score in top:
+            if doc_id in known:
+                chunk = dict(known[doc_id])
+            elif doc_id in missing_data:
+                doc, meta, vec = missing_data[doc_id]
+                chunk = _make_chunk(doc_id, doc, meta, _cosine_distance(q_vec, vec))
+            else:
+                continue  # in the BM25 index but no longer in the collection
+            chunk["rrf_score"] = rrf_score
+            chunk["bm25_score"] = bm25_lists[q].get(doc_id)
+            chunks.append(chunk)
+        results.append(chunks)
+
+    return results
+
+
+def _cosine_distance(a: np.ndarray, b: np.ndarray) -> float:
+    """Cosine distance, matching the collection's hnsw:space='cosine'."""
+    denom = float(np.linalg.norm(a) * np.linalg.norm(b)) or 1.0
+    return 1.0 - float(np.dot(a, b)) / denom
+
+
+def _make_chunk(doc_id: str, text: str, meta: dict, distance: float) -> dict:
+    """Build the chunk dict returned by retrieve()."""
+    return {
+        "id": doc_id,
+        "text": text,
+        "distance": distance,
+        "source_id": meta.get("source_id", ""),
+        "chunk_id": meta.get("chunk_id", ""),
+        "section_id": meta.get("section_id", ""),
+        "section_title": meta.get("section_title", ""),
+        "year": meta.get("year", 0),
+        "doc_type": meta.get("doc_type", ""),
+        "venue": meta.get("venue", ""),
+        "authors": meta.get("authors", ""),
+    }
+
 
-    results = collection.query(**kwargs)
-
-    chunks = []
-    for i in range(len(results["ids"][0])):
-        meta = results["metadatas"][0][i]
-        chunks.append({
-            "id": results["ids"][0][i],
-            "text": results["documents"][0][i],
-            "distance": results["distances"][0][i],
-            "source_id": meta.get("source_id", ""),
-            "chunk_id": meta.get("chunk_id", ""),
-            "section_id": meta.get("section_id", ""),
-            "section_title": meta.get("section_title", ""),
-            "year": meta.get("year", 0),
-            "doc_type": meta.get("doc_type", ""),
-            "venue": meta.get("venue", ""),
-            "authors": meta.get("authors", ""),
-        })
-
-    return chunks
+def _format_results(results: dict, q: int) -> list[dict]:
+    """Convert the q-th query's ChromaDB results into chunk dicts."""
+    return [
+        _make_chunk(
+            results["ids"][q][i],
+            results["documents"][q][i],
+            results["metadatas"][q][i],
+            results["distances"][q][i],
+        )
+        for i in range(len(results["ids"][q]))
+    ]
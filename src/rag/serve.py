@@ -0,0 +1,375 @@
+"""
+serve.py — Long-running HTTP query service for the RAG pipeline.
+
+Loads the collection, embedding model, cross-encoder and API client once
+at startup, then answers queries over HTTP with the same semantics as
+run_query(), including one JSONL log entry per query.
+
+Endpoints:
+    POST /query     JSON body {"query": ..., optional "n_retrieve", "top_k",
+                    "where", "model", "max_tokens", "skip_rerank", "metadata",
+                    "stream"}. Returns {"answer", "chunks_used", "log_entry"}.
+                    With "stream": true the response is NDJSON: one line per
+                    run_query_stream() event (retrieval, rerank, token..., log).
+    GET  /healthz   Liveness plus what is loaded.
+    GET  /metrics   Prometheus text format counters and latency summaries.
+
+Usage:
+    python -m src.rag.serve --port 8000
+
+    curl -s localhost:8000/query -d '{"query": "What is the Kessler syndrome?"}'
+    curl -sN localhost:8000/query -d '{"query": "What is a CDM?", "stream": true}'
+
+    # No API key or network: answer with the in-process stub Messages API
+    python -m src.rag.serve --stub-generator
+
+    # Daily log files, gzip-compressed once rotated
+    python -m src.rag.serve --log-rotate-hours 24 --log-compression gzip
+
+    # Log chunk references instead of chunk text (see src.rag.chunk_store)
+    python -m src.rag.serve --compact-log
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add project root to path
+_PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(_PROJECT_ROOT))
+
+from dotenv import load_dotenv
+load_dotenv(_PROJECT_ROOT / ".env", override=True)
+load_dotenv(_PROJECT_ROOT / "grader.env", override=True)
+
+import numpy as np
+
+from src.rag.log_sink import COMPRESSIONS, LogSink
+from src.rag.pipeline import RAGPipeline, get_pipeline
+from src.rag.rerank_cache import RerankScoreCache
+from src.rag.response_cache import ResponseCache
+from src.rag.tracing import OTLPFileExporter
+
+
+# /query body fields and the RAGPipeline.query() arguments they map to
+QUERY_FIELDS = {
+    "n_retrieve": "n_retrieve",
+    "top_k": "n_rerank",
+    "where": "where",
+    "model": "model",
+    "max_tokens": "max_tokens",
+    "skip_rerank": "skip_rerank",
+    "metadata": "metadata",
+}
+
+
+class ServiceMetrics:
+    """Thread-safe request counters and recent latency windows for /metrics."""
+
+    def __init__(self, window: int = 1000):
+        """
+        Args:
+            window: Number of most recent queries the latency quantiles cover.
+        """
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests: dict[tuple[str, int], int] = {}
+        self.in_flight = 0
+        self.total_seconds: deque[float] = deque(maxlen=window)
+        self.ttft_seconds: deque[float] = deque(maxlen=window)
+        self.total_sum = 0.0
+        self.queries = 0
+
+    def record_request(self, path: str, status: int):
+        with self._lock:
+            self.requests[(path, status)] = self.requests.get((path, status), 0) + 1
+
+    def record_query(self, timing: dict):
+        with self._lock:
+            self.queries += 1
+            self.total_sum += timing["total_seconds"]
+            self.total_seconds.append(timing["total_seconds"])
+            self.ttft_seconds.append(timing["time_to_first_token_seconds"])
+
+    def adjust_in_flight(self, delta: int):
+        with self._lock:
+            self.in_flight += delta
+
+    def render(self, pipeline: RAGPipeline) -> str:
+        """Prometheus text exposition of the counters."""
+        with self._lock:
+            lines = [
+                "# TYPE rag_uptime_seconds gauge",
+                f"rag_uptime_seconds {time.time() - self.started:.1f}",
+                "# TYPE rag_http_requests_total counter",
+            ]
+            for (path, status), n in sorted(self.requests.items()):
+                lines.append(f'rag_http_requests_total{{path="{path}",status="{status}"}} {n}')
+            lines += [
+                "# TYPE rag_queries_in_flight gauge",
+                f"rag_queries_in_flight {self.in_flight}",
+            ]
+            for name, values in (
+                ("rag_query_latency_seconds", self.total_seconds),
+                ("rag_query_time_to_first_token_seconds", self.ttft_seconds),
+            ):
+                lines.append(f"# TYPE {name} summary")
+                if values:
+                    for q, v in zip((0.5, 0.95, 0.99),
+                                    np.percentile(list(values), [50, 95, 99])):
+                        lines.append(f'{name}{{quantile="{q}"}} {v:.4f}')
+                if name == "rag_query_latency_seconds":
+                    lines += [
+                        f"{name}_sum {self.total_sum:.4f}",
+                        f"{name}_count {self.queries}",
+                    ]
+
+        rerank = pipeline.rerank_cache.stats()
+        lines += [
+            "# TYPE rag_rerank_cache_hits_total counter",
+            f"rag_rerank_cache_hits_total {rerank['hits']}",
+            "# TYPE rag_rerank_cache_misses_total counter",
+            f"rag_rerank_cache_misses_total {rerank['misses']}",
+        ]
+        if pipeline.log_sink is not None:
+            sink = pipeline.log_sink.stats()
+            lines += [
+                "# TYPE rag_log_entries_written_total counter",
+                f"rag_log_entries_written_total {sink['written']}",
+                "# TYPE rag_log_write_seconds_total counter",
+                f"rag_log_write_seconds_total {sink['write_seconds']:.4f}",
+                "# TYPE rag_log_entries_dropped_total counter",
+                f"rag_log_entries_dropped_total {sink['dropped']}",
+                "# TYPE rag_log_queue_depth gauge",
+                f"rag_log_queue_depth {sink['queued']}",
+                "# TYPE rag_log_rotations_total counter",
+                f"rag_log_rotations_total {sink['rotations']}",
+            ]
+        if pipeline.response_cache is not None:
+            response = pipeline.response_cache.stats()
+            lines += [
+                "# TYPE rag_response_cache_hits_total counter",
+                f"rag_response_cache_hits_total {response['hits']}",
+                "# TYPE rag_response_cache_misses_total counter",
+                f"rag_response_cache_misses_total {response['misses']}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def make_handler(pipeline: RAGPipeline, metrics: ServiceMetrics):
+    """Build a request handler class bound to one warm pipeline."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body, content_type: str = "application/json"):
+            if content_type == "application/json":
+                payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            else:
+                payload = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("content-type", content_type)
+            self.send_header("content-length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            metrics.record_request(self.path.split("?", 1)[0], status)
+
+        def _error(self, status: int, message: str):
+            self._send(status, {"error": message})
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path == "/healthz":
+                self._send(200, {
+                    "status": "ok",
+                    "collection": pipeline.collection_name,
+                    "chunks": pipeline.collection.count(),
+                    "embedding_model": pipeline.embedding_model,
+                    "reranker_model": pipeline.reranker_model,
+                    "retrieval_mode": pipeline.retrieval_mode,
+                    "reranker_loaded": pipeline._reranker is not None,
+                    "uptime_seconds": round(time.time() - metrics.started, 1),
+                })
+            elif path == "/metrics":
+                self._send(200, metrics.render(pipeline), "text/plain; version=0.0.4")
+            else:
+                self._error(404, f"unknown path {path}")
+
+        def do_POST(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path != "/query":
+                self._error(404, f"unknown path {path}")
+                return
+
+            try:
+                length = int(self.headers.get("content-length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except (ValueError, json.JSONDecodeError) as e:
+                self._error(400, f"invalid JSON body: {e}")
+                return
+            if not isinstance(body, dict) or not isinstance(body.get("query"), str) \
+                    or not body["query"].strip():
+                self._error(400, 'body must be a JSON object with a non-empty "query"')
+                return
+
+            kwargs = {arg: body[field] for field, arg in QUERY_FIELDS.items() if field in body}
+            metrics.adjust_in_flight(1)
+            try:
+                if body.get("stream"):
+                    self._stream(body["query"], kwargs)
+                else:
+                    try:
+                        result = pipeline.query(body["query"], **kwargs)
+                    except Exception as e:
+                        self._error(500, f"{type(e).__name__}: {e}")
+                        return
+                    metrics.record_query(result["log_entry"]["timing"])
+                    self._send(200, result)
+            finally:
+                metrics.adjust_in_flight(-1)
+
+        def _stream(self, query: str, kwargs: dict):
+            """Write query_stream() events as NDJSON lines until the log event."""
+            self.send_response(200)
+            self.send_header("content-type", "application/x-ndjson")
+            self.send_header("cache-control", "no-cache")
+            self.end_headers()
+            status = 200
+            try:
+                for event in pipeline.query_stream(query, **kwargs):
+                    self.wfile.write(
+                        (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+                    )
+                    self.wfile.flush()
+                    if event["type"] == "log":
+                        metrics.record_query(event["log_entry"]["timing"])
+            except (BrokenPipeError, ConnectionResetError):
+                status = 499
+            except Exception as e:
+                # Headers are already sent; report the failure as a final event
+                status = 500
+                self.wfile.write((json.dumps({
+                    "type": "error", "error": f"{type(e).__name__}: {e}",
+                }) + "\n").encode("utf-8"))
+            metrics.record_request("/query", status)
+
+    return Handler
+
+
+def start_stub_api(latency: float = 0.2) -> str:
+    """Run the stub Messages API on a free local port in a daemon thread.
+
+    Returns:
+        Its base URL, for an Anthropic client's base_url.
+    """
+    from src.bench.stub_messages_api import StubState, make_handler as make_stub_handler
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_stub_handler(StubState(latency, 0.0, 0))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve RAG queries over HTTP from one warm pipeline"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="Port (default: 8000)")
+    parser.add_argument("--db-path", default="data/chromadb",
+                        help="Path to ChromaDB storage (default: data/chromadb)")
+    parser.add_argument("--collection", default="space_debris_rag",
+                        help="ChromaDB collection name (default: space_debris_rag)")
+    parser.add_argument("--model", default=None,
+                        help="Default Anthropic model (default: claude-sonnet-4-5-20250929)")
+    parser.add_argument("--log-path", default="logs/rag_queries.jsonl",
+                        help="Path for JSONL log file (default: logs/rag_queries.jsonl)")
+    parser.add_argument("--log-rotate-mb", type=float, default=None,
+                        help="Rotate the log when it would exceed this many MB (default: off)")
+    parser.add_argument("--log-rotate-hours", type=float, default=None,
+                        help="Start a new log file every N hours (default: off)")
+    parser.add_argument("--log-compression", choices=[c for c in COMPRESSIONS if c],
+                        default=None,
+                        help="Compress rotated log segments (zstd needs zstandard)")
+    parser.add_argument("--compact-log", action="store_true",
+                        help="Log reranked chunks as id + text hash references with the "
+                             "corpus hash instead of their text")
+    parser.add_argument("--retrieval-mode", choices=["dense", "hybrid"], default="dense",
+                        help="dense = ChromaDB only; hybrid = ChromaDB + BM25 (default: dense)")
+    parser.add_argument("--rerank-cache", default=None,
+                        help="SQLite file for persistent rerank scores (default: in-memory only)")
+    parser.add_argument("--embedding-cache", default=None,
+                        help="Directory for persistent query embeddings (default: in-memory only)")
+    parser.add_argument("--response-cache", default=os.environ.get("RAG_RESPONSE_CACHE"),
+                        help="SQLite file caching generation responses "
+                             "(default: $RAG_RESPONSE_CACHE, otherwise off)")
+    parser.add_argument("--cache-ttl-hours", type=float, default=168,
+                        help="Response cache entry lifetime in hours (default: 168)")
+    parser.add_argument("--trace-file", default=os.environ.get("RAG_TRACE_FILE"),
+                        help="Append each query's stage spans as OpenTelemetry OTLP/JSON "
+                             "(default: $RAG_TRACE_FILE, otherwise off)")
+    parser.add_argument("--stub-generator", action="store_true",
+                        help="Generate with the in-process stub Messages API "
+                             "(no API key or network; for local testing)")
+    args = parser.parse_args()
+
+    client = None
+    if args.stub_generator:
+        import anthropic
+        base_url = start_stub_api()
+        client = anthropic.Anthropic(api_key="stub", base_url=base_url)
+        print(f"Using stub Messages API at {base_url}")
+
+    pipeline = get_pipeline(
+        args.db_path,
+        args.collection,
+        model=args.model,
+        log_path=args.log_path,
+        rerank_cache=RerankScoreCache(db_path=args.rerank_cache),
+        embedding_cache_dir=args.embedding_cache,
+        retrieval_mode=args.retrieval_mode,
+        client=client,
+        response_cache=(
+            ResponseCache(args.response_cache, ttl_seconds=args.cache_ttl_hours * 3600)
+            if args.response_cache else None
+        ),
+        trace_exporter=OTLPFileExporter(args.trace_file) if args.trace_file else None,
+        # Requests log from many threads; a background writer keeps disk I/O
+        # off the request path
+        log_sink=LogSink(
+            args.log_path,
+            rotate_bytes=int(args.log_rotate_mb * 1_000_000) if args.log_rotate_mb else None,
+            rotate_seconds=args.log_rotate_hours * 3600 if args.log_rotate_hours else None,
+            compression=args.log_compression,
+        ),
+        compact_logs=args.compact_log,
+    )
+
+    start = time.perf_counter()
+    pipeline.warmup()
+    print(f"Loaded collection ({pipeline.collection.count()} chunks), embedder and "
+          f"reranker in {time.perf_counter() - start:.1f}s")
+
+    metrics = ServiceMetrics()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(pipeline, metrics))
+    print(f"Serving on http://{args.host}:{args.port} (POST /query, GET /healthz, GET /metrics)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pipeline.flush()
+        pipeline.log_sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+tracing.py — Per-stage latency spans for RAG queries.
+
+A Trace collects timed spans for one query: load, embed, search, rerank,
+prompt_build, generate and log_write. The pipeline starts a trace per
+query and activates it, and library code records spans with the
+module-level span() helper without the trace being passed around:
+
+    trace = Trace()
+    with trace.active():
+        with span("embed"):
+            vectors = embed(texts)
+
+span() is a no-op when no trace is active, so the retriever, reranker
+and generator behave exactly as before when called outside the pipeline.
+
+The log entry stores trace.to_dict(): spans as offsets from the start of
+the query in milliseconds. log_write, the append of the entry itself, is
+recorded after the line is written, so it is only in the exported trace.
+OTLPFileExporter writes the same trace as OpenTelemetry OTLP/JSON (one
+ExportTraceServiceRequest per line, the format of the OpenTelemetry
+Collector file exporter), so it can be loaded by any OTLP-aware tool
+without an OpenTelemetry dependency here.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+# Stage names in pipeline order (also the column order of the stage report)
+STAGES = ("load", "embed", "search", "rerank", "prompt_build", "generate", "log_write")
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar(
+    "rag_trace", default=None
+)
+
+
+class Span:
+    """One timed stage; times are time.perf_counter() values."""
+
+    __slots__ = ("name", "start", "end", "attributes")
+
+    def __init__(self, name: str, start: float, end: float, attributes: dict):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.attributes = attributes
+
+
+class Trace:
+    """Spans recorded for one query."""
+
+    def __init__(self, name: str = "rag.query", start: Optional[float] = None):
+        """
+        Args:
+            name: Root span name (used by the OTLP exporter).
+            start: perf_counter() value the query started at (default: now).
+        """
+        now = time.perf_counter()
+        self.name = name
+        self.trace_id = os.urandom(16).hex()
+        self.start = now if start is None else start
+        self.start_unix_ns = time.time_ns() - int((now - self.start) * 1e9)
+        self.end: Optional[float] = None
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, end: float, **attributes):
+        """Record a span from explicit perf_counter() start/end times."""
+        with self._lock:
+            self.spans.append(Span(name, start, end, attributes))
+
+    def add_spans(self, spans: list[Span], **attributes):
+        """Copy spans recorded on another trace (e.g. a shared batch stage)."""
+        with self._lock:
+            self.spans.extend(
+                Span(s.name, s.start, s.end, {**s.attributes, **attributes}) for s in spans
+            )
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[dict]:
+        """Time the body as a span; the yielded dict can add attributes."""
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            self.add(name, start, time.perf_counter(), **attributes)
+
+    @contextmanager
+    def active(self) -> Iterator["Trace"]:
+        """Make this the current trace for span() calls in the body."""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+    def finish(self):
+        """Mark the end of the query at the current time.
+
+        The exporter treats a trace that was never finished as ending with
+        its last span.
+        """
+        self.end = time.perf_counter()
+
+    def to_dict(self) -> dict:
+        """Log-entry form: span offsets and durations in milliseconds."""
+        return {
+            "trace_id": self.trace_id,
+            "spans": [
+                {
+                    "name": s.name,
+                    "start_ms": round((s.start - self.start) * 1000, 3),
+                    "duration_ms": round((s.end - s.start) * 1000, 3),
+                    **({"attributes": s.attributes} if s.attributes else {}),
+                }
+                for s in self.spans
+            ],
+        }
+
+    def unix_ns(self, perf: float) -> int:
+        """Convert a perf_counter() value to Unix epoch nanoseconds."""
+        return self.start_unix_ns + int((perf - self.start) * 1e9)
+
+
+def current_trace() -> Optional[Trace]:
+    """The active trace, or None."""
+    return _current.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[dict]:
+    """Time the body as a span of the active trace (no-op without one)."""
+    trace = _current.get()
+    if trace is None:
+        yield attributes
+        return
+    with trace.span(name, **attributes) as attrs:
+        yield attrs
+
+
+def stage_durations(trace: dict) -> dict[str, float]:
+    """Total milliseconds per stage name from a logged trace (trace.to_dict()).
+
+    Stages recorded more than once (e.g. several "load" spans) are summed.
+    """
+    totals: dict[str, float] = {}
+    for s in trace.get("spans", []):
+        totals[s["name"]] = totals.get(s["name"], 0.0) + s["duration_ms"]
+    return totals
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPFileExporter:
+    """Append traces to a local file as OTLP/JSON ExportTraceServiceRequests.
+
+    Each trace becomes one root span (the query) with one child span per
+    stage. Safe to share between threads.
+    """
+
+    def __init__(self, path: str | Path, service_name: str = "space-debris-rag"):
+        self.path = Path(path)
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def to_otlp(self, trace: Trace, attributes: Optional[dict] = None) -> dict:
+        """Build the ExportTraceServiceRequest JSON for one trace."""
+        end = trace.end or max((s.end for s in trace.spans), default=trace.start)
+        root_id = os.urandom(8).hex()
+        spans = [{
+            "traceId": trace.trace_id,
+            "spanId": root_id,
+            "name": trace.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(trace.start_unix_ns),
+            "endTimeUnixNano": str(trace.unix_ns(end)),
+            "attributes": [
+                {"key": k, "value": _otlp_value(v)} for k, v in (attributes or {}).items()
+            ],
+        }]
+        for s in trace.spans:
+            spans.append({
+                "traceId": trace.trace_id,
+                "spanId": os.urandom(8).hex(),
+                "parentSpanId": root_id,
+                "name": s.name,
+                "kind": 1,
+                "startTimeUnixNano": str(trace.unix_ns(s.start)),
+                "endTimeUnixNano": str(trace.unix_ns(s.end)),
+                "attributes": [
+                    {"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()
+                ],
+            })
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}},
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "src.rag.tracing"},
+                    "spans": spans,
+                }],
+            }]
+        }
+
+    def export(self, trace: Trace, attributes: Optional[dict] = None):
+        """Append one trace (with optional root-span attributes) to the file."""
+        line = json.dumps(self.to_otlp(trace, attributes)) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
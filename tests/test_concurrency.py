@@ -0,0 +1,81 @@
+"""
+ThrottledClient retries the transient errors the SDK's own retries cover.
+"""
+
+import threading
+from http.server import ThreadingHTTPServer
+
+import anthropic
+import pytest
+
+from src.bench.stub_messages_api import StubState, make_handler
+from src.eval.concurrency import ThrottledClient
+
+
+@pytest.fixture
+def stub():
+    """Stub Messages API answering every request with a 503."""
+    state = StubState(latency=0.0, error_rate=1.0, seed=0, error_statuses=(503,))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield state, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def create(client: ThrottledClient):
+    return client.messages.create(
+        model="stub", max_tokens=16, messages=[{"role": "user", "content": "hi"}]
+    )
+
+
+def test_503_is_retried_until_it_succeeds(stub):
+    state, base_url = stub
+    sdk = anthropic.Anthropic(api_key="stub", base_url=base_url, max_retries=0)
+    client = ThrottledClient(sdk, max_retries=3, base_delay=0.0)
+
+    original = sdk.messages.create
+
+    def recover_after_first(**kwargs):
+        try:
+            return original(**kwargs)
+        finally:
+            state.error_rate = 0.0
+
+    sdk.messages.create = recover_after_first
+    response = create(client)
+
+    assert response.content[0].text
+    assert client.stats()["retries"] == 1
+    assert state.errors == 1
+
+
+def test_503_raises_after_max_retries(stub):
+    _, base_url = stub
+    sdk = anthropic.Anthropic(api_key="stub", base_url=base_url, max_retries=0)
+    client = ThrottledClient(sdk, max_retries=2, base_delay=0.0)
+
+    with pytest.raises(anthropic.InternalServerError):
+        create(client)
+    assert client.stats()["retries"] == 2
+
+
+def test_connection_error_is_retried():
+    sdk = anthropic.Anthropic(api_key="stub", base_url="http://127.0.0.1:9", max_retries=0)
+    client = ThrottledClient(sdk, max_retries=1, base_delay=0.0)
+
+    with pytest.raises(anthropic.APIConnectionError):
+        create(client)
+    assert client.stats()["retries"] == 1
+
+
+def test_bad_request_is_not_retried(stub):
+    state, base_url = stub
+    state.error_statuses = (400,)
+    sdk = anthropic.Anthropic(api_key="stub", base_url=base_url, max_retries=0)
+    client = ThrottledClient(sdk, max_retries=3, base_delay=0.0)
+
+    with pytest.raises(anthropic.BadRequestError):
+        create(client)
+    assert client.stats()["retries"] == 0
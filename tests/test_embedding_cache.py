@@ -0,0 +1,73 @@
+"""
+Embedding cache disk tier: rows and keys stay paired after a partial flush.
+"""
+
+import numpy as np
+
+from src.rag.embedding_cache import EmbeddingCache, _append_rows
+
+
+def vec(value: float) -> np.ndarray:
+    return np.full(4, value, dtype=np.float32)
+
+
+def lookup(cache_dir, key: str) -> np.ndarray:
+    """Look a key up through a fresh cache, so it comes from disk."""
+    return EmbeddingCache("model", cache_dir=cache_dir).get_many([key])[key]
+
+
+def flushed(cache_dir, vectors: dict[str, np.ndarray]) -> EmbeddingCache:
+    cache = EmbeddingCache("model", cache_dir=cache_dir)
+    cache.put_many(vectors)
+    cache.flush()
+    return cache
+
+
+def test_orphan_rows_are_dropped_before_the_next_flush(tmp_path):
+    cache = flushed(tmp_path, {"a": vec(1)})
+    # Crash after the rows were appended, before their keys were written
+    _append_rows(cache.dir / "vectors.npy", np.stack([vec(9)]))
+
+    flushed(tmp_path, {"b": vec(2)})
+
+    np.testing.assert_array_equal(lookup(tmp_path, "a"), vec(1))
+    np.testing.assert_array_equal(lookup(tmp_path, "b"), vec(2))
+    assert np.load(cache.dir / "vectors.npy").shape == (2, 4)
+
+
+def test_partial_key_line_and_rows_are_dropped(tmp_path):
+    cache = flushed(tmp_path, {"a": vec(1)})
+    _append_rows(cache.dir / "vectors.npy", np.stack([vec(9), vec(9)]))
+    with open(cache.dir / "keys.txt", "a", encoding="utf-8") as f:
+        f.write("orph")  # key write cut off mid-line
+
+    flushed(tmp_path, {"b": vec(2)})
+
+    assert (cache.dir / "keys.txt").read_text(encoding="utf-8") == "a\nb\n"
+    np.testing.assert_array_equal(lookup(tmp_path, "b"), vec(2))
+
+
+def test_header_counting_unwritten_rows_is_repaired(tmp_path):
+    cache = flushed(tmp_path, {"a": vec(1)})
+    path = cache.dir / "vectors.npy"
+    # Crash after the header was grown, before the row data was written
+    _append_rows(path, np.stack([vec(9)]))
+    with open(path, "r+b") as f:
+        f.truncate(path.stat().st_size - vec(9).nbytes)
+
+    flushed(tmp_path, {"b": vec(2)})
+
+    np.testing.assert_array_equal(lookup(tmp_path, "a"), vec(1))
+    np.testing.assert_array_equal(lookup(tmp_path, "b"), vec(2))
+
+
+def test_flush_picks_up_rows_another_writer_added(tmp_path):
+    stale = EmbeddingCache("model", cache_dir=tmp_path)  # loaded before the other flush
+    flushed(tmp_path, {"a": vec(1)})
+
+    stale.put_many({"a": vec(1), "b": vec(2)})
+    stale.flush()
+
+    assert (stale.dir / "keys.txt").read_text(encoding="utf-8") == "a\nb\n"
+    np.testing.assert_array_equal(lookup(tmp_path, "a"), vec(1))
+    np.testing.assert_array_equal(lookup(tmp_path, "b"), vec(2))
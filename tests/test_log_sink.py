@@ -0,0 +1,48 @@
+"""
+LogSink: the writer thread survives bad entries and write errors.
+"""
+
+import threading
+
+from src.rag.log_sink import LogSink, iter_log_entries
+
+
+def flush_within(sink: LogSink, seconds: float = 5.0) -> bool:
+    """flush() in a helper thread; False if it is still blocked after seconds."""
+    thread = threading.Thread(target=sink.flush, daemon=True)
+    thread.start()
+    thread.join(seconds)
+    return not thread.is_alive()
+
+
+def test_lone_surrogate_is_written_and_reads_back(tmp_path):
+    sink = LogSink(tmp_path / "log.jsonl")
+    sink.write({"query": "\ud800"})
+    sink.write({"query": "after"})
+    assert flush_within(sink)
+    sink.close()
+
+    assert [e["query"] for e in iter_log_entries(tmp_path / "log.jsonl")] == ["\ud800", "after"]
+    assert sink.stats()["errors"] == 0
+
+
+def test_writer_keeps_running_after_an_unexpected_error(tmp_path, monkeypatch):
+    sink = LogSink(tmp_path / "log.jsonl")
+    write_batch = sink._write_batch
+    calls = []
+
+    def fail_once(lines):
+        calls.append(lines)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        write_batch(lines)
+
+    monkeypatch.setattr(sink, "_write_batch", fail_once)
+    sink.write({"n": 1})
+    assert flush_within(sink)
+    sink.write({"n": 2})
+    assert flush_within(sink)
+    sink.close()
+
+    assert sink.stats()["errors"] == 1
+    assert [e["n"] for e in iter_log_entries(tmp_path / "log.jsonl")] == [2]
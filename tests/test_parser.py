@@ -0,0 +1,64 @@
+"""
+Parity of parse_chunked_document() with the legacy two-pass parser.
+
+The legacy implementation is the reference kept in src/bench/bench_parser.py.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from src.bench.bench_parser import _legacy_parse_chunked_file, _legacy_parse_header_metadata
+from src.ingest.parser import parse_chunked_document
+
+PROCESSED = Path(__file__).resolve().parent.parent / "data" / "processed"
+CHUNKED_FILES = sorted(PROCESSED.glob("*_chunked.md"))
+
+
+def _malformed_report(path: Path, malformed: list[tuple[int, str]]) -> str:
+    return "\n".join(f"{path.name}:{line_no}: {line[:80]}" for line_no, line in malformed)
+
+
+def test_corpus_present():
+    assert CHUNKED_FILES, f"no *_chunked.md files in {PROCESSED}"
+
+
+@pytest.mark.parametrize("path", CHUNKED_FILES, ids=lambda p: p.name)
+def test_matches_legacy_parser(path):
+    doc = parse_chunked_document(path)
+    report = _malformed_report(path, doc["malformed"])
+
+    assert doc["chunks"] == _legacy_parse_chunked_file(path), \
+        f"chunks differ from the legacy parser\nmalformed lines:\n{report}"
+    assert doc["metadata"] == _legacy_parse_header_metadata(path), \
+        f"header metadata differs from the legacy parser\nmalformed lines:\n{report}"
+
+
+@pytest.mark.parametrize("path", CHUNKED_FILES, ids=lambda p: p.name)
+def test_malformed_line_numbers(path):
+    lines = path.read_text(encoding="utf-8").split("\n")
+    for line_no, line in parse_chunked_document(path)["malformed"]:
+        assert lines[line_no - 1] == line, f"{path.name}:{line_no} does not hold {line!r}"
+
+
+def test_reports_malformed_lines(tmp_path):
+    path = tmp_path / "demo2024_chunked.md"
+    path.write_text(
+        "# demo2024 -- Demo\n"
+        "\n"
+        "## sec1 -- Intro\n"
+        "\n"
+        "[sec1_p1] A well-formed chunk.\n"
+        "[sec1_p2]missing space after the id\n"
+        "[sec1 p3] bad id\n"
+        "[sec1_p4] Another chunk.\n",
+        encoding="utf-8",
+    )
+    doc = parse_chunked_document(path)
+
+    assert [c["chunk_id"] for c in doc["chunks"]] == ["sec1_p1", "sec1_p4"]
+    assert doc["malformed"] == [
+        (6, "[sec1_p2]missing space after the id"),
+        (7, "[sec1 p3] bad id"),
+    ]
+    assert doc["chunks"] == _legacy_parse_chunked_file(path)
@@ -0,0 +1,28 @@
+"""
+Prompt-cache markers: the cacheable length depends on the model.
+"""
+
+from src.rag.prompts import (
+    CHARS_PER_TOKEN,
+    get_system_blocks,
+    min_cacheable_tokens,
+    prefix_block,
+)
+
+
+def test_min_cacheable_tokens_by_model():
+    assert min_cacheable_tokens("claude-sonnet-4-5-20250929") == 1024
+    assert min_cacheable_tokens("claude-opus-4-6") == 4096
+    assert min_cacheable_tokens("claude-opus-4-1") == 1024
+    assert min_cacheable_tokens("some-unknown-model") == 4096
+
+
+def test_prefix_block_marks_only_past_the_model_threshold():
+    text = "x" * (2048 * CHARS_PER_TOKEN)
+    assert "cache_control" in prefix_block(text, "claude-sonnet-4-5")
+    assert "cache_control" not in prefix_block(text, "claude-opus-4-6")
+
+
+def test_system_prompt_is_sent_unmarked():
+    for model in ("claude-sonnet-4-5-20250929", "claude-opus-4-6"):
+        assert "cache_control" not in get_system_blocks(model)[0]
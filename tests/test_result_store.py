@@ -0,0 +1,36 @@
+"""
+ResultStore: run status of stored records, including pending judge scores.
+"""
+
+from src.eval.result_store import ResultStore, run_key
+
+
+def test_status_of_ok_error_and_pending_records(tmp_path):
+    store = ResultStore(tmp_path / "eval.jsonl")
+    store.add({"run_key": "ok", "answer": "a", "groundedness_score": 4})
+    store.add({"run_key": "failed", "error": "boom"})
+    store.add({"run_key": "waiting", "answer": "a", "judge_pending": True})
+
+    reloaded = ResultStore(tmp_path / "eval.jsonl")
+    assert reloaded.status("ok") == "ok"
+    assert reloaded.status("failed") == "error"
+    assert reloaded.status("waiting") == "pending"
+    assert reloaded.status("never") is None
+
+
+def test_scored_record_supersedes_pending_one(tmp_path):
+    store = ResultStore(tmp_path / "eval.jsonl")
+    store.add({"run_key": "k", "answer": "a", "judge_pending": True})
+    store.add({"run_key": "k", "answer": "a", "groundedness_score": 3})
+
+    assert store.compact() == 1
+    assert ResultStore(tmp_path / "eval.jsonl").status("k") == "ok"
+
+
+def test_run_key_depends_on_retrieval_settings():
+    base = ("D01", "rerank", "gen", "v1", "judge", "abc")
+    dense = run_key(*base, "dense", 20, 10)
+    assert dense == run_key(*base, "dense", 20, 10)
+    assert dense != run_key(*base, "hybrid", 20, 10)
+    assert dense != run_key(*base, "dense", 40, 10)
+    assert dense != run_key(*base, "dense", 20, 5)
@@ -0,0 +1,81 @@
+"""
+Hybrid retrieval: batched retrieve_many() must match one call per query.
+"""
+
+import uuid
+
+import chromadb
+import pytest
+
+from src.rag.lexical import BM25Index
+from src.rag.retriever import retrieve_many
+
+DOCS = {
+    "a": ("alpha particles", [1.0, 0.0, 0.0]),
+    "b": ("beta decay", [0.0, 1.0, 0.0]),
+    "c": ("gamma rays", [0.0, 0.0, 1.0]),
+}
+QUERY_VECTORS = {
+    "x alpha": [1.0, 0.0, 0.0],
+    "y beta": [0.0, 1.0, 0.0],
+    "y beta alpha": [0.0, 1.0, 0.0],
+}
+
+
+def embed(texts: list[str]) -> list[list[float]]:
+    return [QUERY_VECTORS[t] for t in texts]
+
+
+@pytest.fixture
+def collection():
+    client = chromadb.EphemeralClient()
+    collection = client.create_collection(
+        name=f"test_{uuid.uuid4().hex}",
+        configuration={"hnsw": {"space": "cosine"}},
+        embedding_function=None,
+    )
+    collection.add(
+        ids=list(DOCS),
+        documents=[text for text, _ in DOCS.values()],
+        embeddings=[vec for _, vec in DOCS.values()],
+        metadatas=[{"source_id": doc_id} for doc_id in DOCS],
+    )
+    yield collection
+    client.delete_collection(collection.name)
+
+
+@pytest.fixture
+def lexical_index():
+    return BM25Index.build(list(DOCS), [text for text, _ in DOCS.values()])
+
+
+def _by_id(chunks: list[dict]) -> dict[str, dict]:
+    return {c["id"]: c for c in chunks}
+
+
+def test_batched_hybrid_keeps_per_query_distances(collection, lexical_index):
+    queries = ["x alpha", "y beta"]
+    batched = retrieve_many(queries, collection, n_results=3, mode="hybrid",
+                            embedding_function=embed, lexical_index=lexical_index)
+
+    # Every doc is in both queries' dense results, so a shared lookup
+    # would give each one the last query's distance
+    for query, chunks in zip(queries, batched):
+        solo = retrieve_many([query], collection, n_results=3, mode="hybrid",
+                             embedding_function=embed, lexical_index=lexical_index)[0]
+        assert chunks == solo
+
+    assert _by_id(batched[0])["a"]["distance"] == pytest.approx(0.0, abs=1e-6)
+    assert _by_id(batched[1])["a"]["distance"] == pytest.approx(1.0, abs=1e-6)
+    assert _by_id(batched[1])["b"]["distance"] == pytest.approx(0.0, abs=1e-6)
+
+
+def test_batched_hybrid_lexical_only_hit_uses_own_query(collection, lexical_index):
+    # "a" is the first query's top dense hit; the second query reaches it
+    # through BM25 ("alpha"), so its distance must be to the second query
+    batched = retrieve_many(["x alpha", "y beta alpha"], collection, n_results=2,
+                            mode="hybrid", embedding_function=embed,
+                            lexical_index=lexical_index)
+
+    second = _by_id(batched[1])
+    assert second["a"]["distance"] == pytest.approx(1.0, abs=1e-6)